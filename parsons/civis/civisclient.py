@@ -1,6 +1,22 @@
 import civis
+import itertools
+import logging
+import petl
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from petl.io.sources import GzipSource
+from parsons.etl.csv_writer import write_csv
 from parsons.etl.table import Table
-from parsons.utilities import check_env
+from parsons.utilities import check_env, files
+from parsons.utilities.compression import ParallelCompressedFile
+
+logger = logging.getLogger(__name__)
+
+# The number of rows in each file uploaded by table_import
+PART_ROWS = 500000
+
+# The number of files uploaded at once
+UPLOAD_WORKERS = 4
 
 
 class CivisClient(object):
@@ -31,13 +47,13 @@ class CivisClient(object):
         """  # noqa: E501
 
     def query(self, sql, preview_rows=10, polling_interval=None, hidden=True,
-              wait=True):
+              wait=True, stream=False):
         """
         Execute a SQL statement as a Civis query.
 
         Run a query that may return no results or where only a small
         preview is required. To execute a query that returns a large number
-        of rows, see :func:`~civis.io.read_civis_sql`.
+        of rows, set ``stream`` to ``True``.
 
         `Args`
             sql: str
@@ -52,11 +68,18 @@ class CivisClient(object):
             wait: boolean
                 If ``True``, will wait for query to finish executing before exiting
                 the method.
+            stream: boolean
+                If ``True``, return all of the rows rather than a preview. The results are
+                exported to a gzipped CSV, which is downloaded and read lazily as the table
+                is used, so they don't need to fit in memory. The query always waits.
         `Returns`
             Parsons Table
                 See :ref:`parsons-table` for output options.
         """
 
+        if stream:
+            return self._query_stream(sql, polling_interval, hidden)
+
         fut = civis.io.query_civis(sql, self.db, preview_rows=preview_rows, polling_interval=None)
 
         if not wait:
@@ -73,12 +96,27 @@ class CivisClient(object):
 
         return Table(result['result_rows'])
 
+    def _query_stream(self, sql, polling_interval, hidden):
+
+        path = files.create_temp_file(suffix='.csv.gz')
+        fut = civis.io.civis_to_csv(path, sql, self.db, client=self.client, compression='gzip',
+                                    polling_interval=polling_interval, hidden=hidden)
+        fut.result()
+
+        return Table(petl.fromcsv(GzipSource(path), encoding='utf-8'))
+
     def table_import(self, table_obj, table, max_errors=None,
                      existing_table_rows='fail', diststyle=None, distkey=None,
-                     sortkey1=None, sortkey2=None, wait=True, **civisargs):
+                     sortkey1=None, sortkey2=None, wait=True, part_rows=None,
+                     max_workers=None, **civisargs):
         """
         Write the table to a Civis Redshift cluster. Additional key word
-        arguments can passed to `civis.io.dataframe_to_civis()  <https://civis-python.readthedocs.io/en/v1.9.0/generated/civis.io.dataframe_to_civis.html#civis.io.dataframe_to_civis>`_ # noqa: E501
+        arguments can passed to `civis.io.civis_file_to_table()  <https://civis-python.readthedocs.io/en/stable/generated/civis.io.civis_file_to_table.html>`_ # noqa: E501
+
+        The table is written out as gzipped CSV files of ``part_rows`` rows each, which are
+        uploaded to Civis while the next files are written, and then imported together.
+        Only a few files are kept on disk at once, so the table doesn't need to fit in
+        memory or on disk.
 
         `Args`
             table_obj: obj
@@ -104,17 +142,69 @@ class CivisClient(object):
                 The second column in a compound sortkey for the table.
             wait: boolean
                 Wait for write job to complete before exiting method.
+            part_rows: int
+                The number of rows in each uploaded file. Defaults to 500,000.
+            max_workers: int
+                The number of files to upload at once. Defaults to 4.
         `Returns`
             ``None``
         """ # noqa: E501,E261
 
-        fut = civis.io.dataframe_to_civis(table_obj.to_dataframe(), database=self.db,
-                                          table=table, max_errors=max_errors,
-                                          existing_table_rows=existing_table_rows,
-                                          diststyle=diststyle, distkey=distkey,
-                                          sortkey1=sortkey1, sortkey2=sortkey2,
-                                          headers=True, **civisargs)
+        file_ids = self._upload_parts(table_obj, part_rows or PART_ROWS,
+                                      max_workers or UPLOAD_WORKERS)
+
+        logger.info(f'Importing {len(file_ids)} files to {table}.')
+        fut = civis.io.civis_file_to_table(file_ids, self.db, table, client=self.client,
+                                           max_errors=max_errors,
+                                           existing_table_rows=existing_table_rows,
+                                           diststyle=diststyle, distkey=distkey,
+                                           sortkey1=sortkey1, sortkey2=sortkey2,
+                                           delimiter=',', headers=True, **civisargs)
 
         if wait:
 
             fut.result()
+
+    def _upload_part(self, path, name):
+
+        try:
+            return civis.io.file_to_civis(path, name, client=self.client)
+        finally:
+            files.close_temp_file(path)
+
+    def _upload_parts(self, table_obj, part_rows, max_workers):
+        # Write the table to gzipped CSV files, uploading each to Civis while the next is
+        # written. Only max_workers files are waiting to upload at once, which bounds the
+        # disk space used. Returns the Civis file ids, in order.
+
+        it = iter(table_obj.table)
+        header = tuple(next(it, ()))
+
+        file_ids = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for index in itertools.count():
+                rows = itertools.islice(it, part_rows)
+                first = next(rows, None)
+
+                # Always upload at least one file, so an empty table creates a table
+                if first is None and index > 0:
+                    break
+
+                path = files.create_temp_file(suffix='.csv.gz')
+                with ParallelCompressedFile(path, 'gzip') as f:
+                    part = itertools.chain([header], [first] if first is not None else [], rows)
+                    write_csv(part, f, encoding='utf-8')
+
+                pending.append(executor.submit(self._upload_part, path,
+                                               f'parsons_import_{index}.csv.gz'))
+                while len(pending) >= max_workers:
+                    file_ids.append(pending.popleft().result())
+
+                if first is None:
+                    break
+
+            while pending:
+                file_ids.append(pending.popleft().result())
+
+        return file_ids
@@ -81,13 +81,9 @@ class CrowdTangle(object):
         if ParsonsTable.num_rows == 0:
             return None
 
-        first_count = len(ParsonsTable.columns)
-        second_count = first_count + 1
-
-        while second_count > first_count:
-            first_count = len(ParsonsTable.columns)
-            self.base_unpack(ParsonsTable)
-            second_count = len(ParsonsTable.columns)
+        # Flatten all levels of nested dicts in a single pass
+        ParsonsTable.flatten()
+        logger.debug(f'There are now {len(ParsonsTable.columns)} columns...')
 
         return ParsonsTable
 
@@ -1,7 +1,8 @@
 from parsons.etl.table import Table
-from parsons.databases.redshift.rs_copy_table import RedshiftCopyTable
+from parsons.databases.redshift.rs_copy_table import RedshiftCopyTable, S3_TEMP_KEY_PREFIX
 from parsons.databases.redshift.rs_create_table import RedshiftCreateTable
-from parsons.databases.redshift.rs_table_utilities import RedshiftTableUtilities
+from parsons.databases.redshift.rs_table_utilities import (
+    CATALOG_CACHE_TTL, RedshiftTableUtilities)
 from parsons.databases.redshift.rs_schema import RedshiftSchema
 from parsons.utilities import files
 import psycopg2
@@ -11,17 +12,101 @@ import logging
 import json
 import pickle
 import petl
+from petl.io.sources import GzipSource
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import decimal
+import gzip
+import re
+import uuid
 
 # Max number of rows that we query at a time, so we can avoid loading huge
 # data sets into memory.
 # 100k rows per batch at ~1k bytes each = ~100MB per batch.
 QUERY_BATCH_SIZE = 100000
 
+# The estimated result size, in bytes, above which Table.from_redshift unloads the results
+# to S3 rather than fetching them through the leader node
+UNLOAD_THRESHOLD = 500 * 1024 * 1024
+
+# The number of unloaded files downloaded at once
+UNLOAD_DOWNLOAD_WORKERS = 8
+
+# Eg. XN Seq Scan on my_table  (cost=0.00..1.50 rows=150 width=20)
+_PLAN_ESTIMATE = re.compile(r'rows=(?P<rows>\d+) width=(?P<width>\d+)')
+
+_ORDER_BY = re.compile(r'\border\s+by\b', re.IGNORECASE)
+
+# Written in place of nulls by unload_query, so they can be told apart from empty strings
+_UNLOAD_NULL = '__parsons_null__'
+
+# Eg. 2020-01-02 03:04:05.5+00, as Redshift writes timestamps and times
+_TIMESTAMP = re.compile(r'^(?:(?P<date>\d{4}-\d{2}-\d{2}) )?(?P<time>\d{2}:\d{2}:\d{2})'
+                        r'(?:\.(?P<fraction>\d+))?'
+                        r'(?:(?P<tz_sign>[+-])(?P<tz_hours>\d{2})(?::?(?P<tz_minutes>\d{2}))?)?$')
+
 logger = logging.getLogger(__name__)
 
 
+def _parse_timestamp(value):
+    # Parses a timestamp, timestamptz or time in Redshift's text format
+
+    match = _TIMESTAMP.match(value)
+    if not match:
+        raise ValueError(f'Invalid timestamp: {value}')
+
+    date = match.group('date') or '1900-01-01'
+    dt = datetime.datetime.strptime(f"{date} {match.group('time')}", '%Y-%m-%d %H:%M:%S')
+    dt = dt.replace(microsecond=int((match.group('fraction') or '0').ljust(6, '0')[:6]))
+
+    if match.group('tz_sign'):
+        offset = datetime.timedelta(hours=int(match.group('tz_hours')),
+                                    minutes=int(match.group('tz_minutes') or 0))
+        if match.group('tz_sign') == '-':
+            offset = -offset
+        dt = dt.replace(tzinfo=datetime.timezone(offset))
+
+    return dt if match.group('date') else dt.timetz()
+
+
+# Converters from unloaded text back to the values a query returns, by the Postgres type
+# OID of the column. Other types are returned as strings.
+_UNLOAD_CONVERTERS = {
+    16: lambda v: v in ('t', 'true', '1'),
+    20: int,
+    21: int,
+    23: int,
+    700: float,
+    701: float,
+    1700: decimal.Decimal,
+    1082: lambda v: datetime.datetime.strptime(v, '%Y-%m-%d').date(),
+    1083: _parse_timestamp,
+    1114: _parse_timestamp,
+    1184: _parse_timestamp,
+    1266: _parse_timestamp,
+}
+
+
+def _unload_converter(type_code):
+    # Returns a function converting an unloaded value, or None for text columns
+
+    convert = _UNLOAD_CONVERTERS.get(type_code)
+    if convert is None:
+        return None
+
+    def converter(value):
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (ValueError, decimal.InvalidOperation):
+            # Eg. 'infinity', which has no Python equivalent
+            return value
+
+    return converter
+
+
 class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, RedshiftSchema):
     """
     A Redshift class to connect to database.
@@ -43,10 +128,14 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
             Name of the S3 bucket that will be used for storing data during bulk transfers.
             Required if you intend to perform bulk data transfers (eg. the copy_s3 method),
             and env variable ``S3_TEMP_BUCKET`` is not populated.
+        catalog_cache_ttl: int
+            Seconds to cache catalog lookups for, such as whether a table exists or its
+            columns. Statements run through this class which change a table clear the
+            cache. Set to ``0`` to turn the cache off.
     """
 
     def __init__(self, username=None, password=None, host=None, db=None, port=None,
-                 timeout=10, s3_temp_bucket=None):
+                 timeout=10, s3_temp_bucket=None, catalog_cache_ttl=CATALOG_CACHE_TTL):
 
         try:
             self.username = username or os.environ['REDSHIFT_USERNAME']
@@ -64,6 +153,7 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
         self.dialect = 'postgresql'
 
         self.s3_temp_bucket = s3_temp_bucket or os.environ.get('S3_TEMP_BUCKET')
+        self.catalog_cache_ttl = catalog_cache_ttl
 
     @contextmanager
     def connection(self):
@@ -84,10 +174,16 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
         conn = psycopg2.connect(user=self.username, password=self.password,
                                 host=self.host, dbname=self.db, port=self.port,
                                 connect_timeout=self.timeout)
-        yield conn
-
-        conn.commit()
-        conn.close()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            # The transaction is rolled back, so catalog lookups made within it may be
+            # wrong
+            self.clear_catalog_cache()
+            raise
+        finally:
+            conn.close()
 
     @contextmanager
     def cursor(self, connection):
@@ -166,10 +262,17 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
         with self.cursor(connection) as cursor:
 
             logger.debug(f'SQL Query: {sql}')
-            cursor.execute(sql, parameters)
+            try:
+                cursor.execute(sql, parameters)
+                self._clear_catalog_cache_for(sql)
 
-            if commit:
-                connection.commit()
+                if commit:
+                    connection.commit()
+            except Exception:
+                # A failed statement aborts the transaction, rolling back any earlier
+                # statements in it which lookups since may have seen
+                self.clear_catalog_cache()
+                raise
 
             # If the cursor is empty, don't cause an error
             if not cursor.description:
@@ -229,7 +332,8 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
             csv_delimiter: str
                 The delimiter of the ``csv``. Only relevant if data_type is ``csv``.
             compression: str
-                If specified (``gzip``), will attempt to decompress the file.
+                If specified (``gzip``, ``bzip2`` or ``zstd``), will attempt to decompress
+                the file.
             if_exists: str
                 If the table already exists, either ``fail``, ``append``, ``drop``
                 or ``truncate`` the table.
@@ -450,7 +554,7 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
     def unload(self, sql, bucket, key_prefix, manifest=True, header=True, compression='gzip',
                add_quotes=True, null_as=None, escape=True, allow_overwrite=True,
                parallel=True, max_file_size='6.2 GB', aws_region=None,
-               aws_access_key_id=None, aws_secret_access_key=None):
+               aws_access_key_id=None, aws_secret_access_key=None, data_type=None):
         """
         Unload Redshift data to S3 Bucket. This is a more efficient method than running a query
         to export data as it can export in parallel and directly into an S3 bucket. Consider
@@ -500,6 +604,9 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
         aws_secret_access_key:
             An AWS secret access key granted to the bucket where the file is located. Not
             required if keys are stored as environmental variables.
+        data_type: str
+            Set to ``csv`` to unload standard CSV files. It can't be combined with
+            ``add_quotes`` or ``escape``.
         """  # NOQA W605
 
         statement = f"""
@@ -508,6 +615,8 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
                      PARALLEL {parallel} \n
                      MAXFILESIZE {max_file_size}
                      """
+        if data_type:
+            statement += f"FORMAT AS {data_type.upper()} \n"
         if manifest:
             statement += "MANIFEST \n"
         if header:
@@ -530,6 +639,123 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
 
         return self.query(statement)
 
+    def estimate_query_size(self, sql):
+        """
+        Estimate the size of the results of a query, from the row count and row width in
+        the query plan. The estimate is only as good as the table statistics, which are
+        updated by ``ANALYZE``.
+
+        `Args:`
+            sql: str
+                A ``SELECT`` statement
+        `Returns:`
+            int
+                The estimated number of bytes, or ``None`` if the plan couldn't be read
+        """
+
+        plan = self.query(f'EXPLAIN {sql}')
+        if not plan or plan.num_rows == 0:
+            return None
+
+        # The first line describes the final step of the plan, and so the results
+        match = _PLAN_ESTIMATE.search(str(plan[0][plan.columns[0]]))
+        if not match:
+            return None
+
+        return int(match.group('rows')) * int(match.group('width'))
+
+    def unload_query(self, sql, max_workers=None, aws_access_key_id=None,
+                     aws_secret_access_key=None):
+        """
+        Run a query by unloading its results to gzipped CSV files in the S3 temp bucket,
+        then downloading the files at the same time. For large results, this is much faster
+        than :meth:`query`, which fetches every row through the leader node. The files
+        are removed from S3 once they are downloaded.
+
+        The query is first run without returning any rows, to find the type of each
+        column, and the unloaded values are converted back to the types :meth:`query`
+        returns. Values of types without a converter, such as ``SUPER``, are returned as
+        strings. If the query has an ``ORDER BY``, the unload is run serially so the order
+        is kept. ``UNLOAD`` doesn't allow a ``LIMIT`` in the outer ``SELECT``.
+
+        `Args:`
+            sql: str
+                A ``SELECT`` statement
+            max_workers: int
+                The number of files to download at once
+            aws_access_key_id:
+                An AWS access key granted to the temp bucket. Not required if keys are
+                stored as environmental variables.
+            aws_secret_access_key:
+                An AWS secret access key granted to the temp bucket. Not required if keys
+                are stored as environmental variables.
+        `Returns:`
+            Parsons Table
+                See :ref:`parsons-table` for output options.
+        """
+
+        from parsons.aws.s3 import S3
+
+        if not self.s3_temp_bucket:
+            raise KeyError(("Missing S3_TEMP_BUCKET, needed for unloading data from Redshift. "
+                            "Must be specified as env vars or kwargs"))
+
+        s3 = S3(aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
+        bucket = self.s3_temp_bucket
+        key_prefix = f'{S3_TEMP_KEY_PREFIX}/unload_{uuid.uuid4().hex}/'
+
+        # UNLOAD takes the query as a string literal, which can't end with a semicolon
+        sql = sql.strip().rstrip(';')
+        unload_sql = sql.replace("'", "''")
+        parallel = not _ORDER_BY.search(sql)
+
+        converters = [_unload_converter(type_code) for type_code in self._query_types(sql)]
+
+        try:
+            self.unload(unload_sql, bucket, key_prefix, manifest=False, header=True,
+                        compression='gzip', add_quotes=False, null_as=f"AS '{_UNLOAD_NULL}'",
+                        escape=False, parallel=parallel, aws_access_key_id=aws_access_key_id,
+                        aws_secret_access_key=aws_secret_access_key, data_type='csv')
+
+            # The parts are numbered, so sorting them keeps the order of a serial unload
+            keys = sorted(s3.list_keys(bucket, key_prefix))
+            logger.info(f'Downloading {len(keys)} unloaded files.')
+
+            def download(key):
+                local_path = files.create_temp_file(suffix='.csv.gz')
+                # Unlike the boto3 resource, the client is thread safe
+                s3.client.download_file(bucket, key, local_path)
+                # Slices without any rows can write empty files, without a header
+                with gzip.open(local_path, 'rb') as f:
+                    return local_path if f.read(1) else None
+
+            with ThreadPoolExecutor(max_workers=max_workers or UNLOAD_DOWNLOAD_WORKERS) as pool:
+                paths = list(pool.map(download, keys))
+
+        finally:
+            for key in s3.list_keys(bucket, key_prefix):
+                s3.remove_file(bucket, key)
+
+        # Each file has its own header, and petl reads them lazily, one after another
+        parts = [petl.fromcsv(GzipSource(path), encoding='utf-8') for path in paths if path]
+        tbl = petl.cat(*parts) if parts else petl.empty()
+        tbl = petl.replaceall(tbl, _UNLOAD_NULL, None)
+
+        converters = {i: convert for i, convert in enumerate(converters) if convert}
+        if parts and converters:
+            tbl = petl.convert(tbl, converters)
+
+        return Table(tbl)
+
+    def _query_types(self, sql):
+        # The Postgres type OID of each column a query returns, found by running it without
+        # returning any rows
+
+        with self.connection() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(f'SELECT * FROM ({sql}) AS parsons_query LIMIT 0')
+                return [column[1] for column in cursor.description]
+
     def generate_manifest(self, buckets, aws_access_key_id=None, aws_secret_access_key=None,
                           mandatory=True, prefix=None, manifest_bucket=None, manifest_key=None,
                           path=None):
@@ -672,39 +898,70 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
                 self.query_with_connection(f'VACUUM {target_table};', connection)
                 logger.info(f'{target_table} vacuumed.')
 
-    def alter_varchar_column_widths(self, tbl, table_name):
+    def alter_varchar_column_widths(self, tbl, table_name, dry_run=False):
         """
         Alter the width of a varchar columns in a Redshift table to match the widths
         of a Parsons table. The columns are matched by column name and not their
         index.
 
+        The Parsons table is read once to find the width of every matching column, and
+        the columns are then altered one after another on a single connection. Redshift
+        can't alter a column type inside a transaction block, so each ``ALTER`` is
+        committed as it runs.
+
         `Args:`
             tbl: obj
                 A Parsons table
             table_name:
                 The target table name (e.g. ``my_schema.my_table``)
+            dry_run: boolean
+                Return the changes that would be made without altering the table
         `Returns:`
-            ``None``
+            Parsons Table
+                The columns which were (or, for a dry run, would be) widened, with their
+                ``column``, ``current_width`` and ``new_width``.
         """
 
-        # Make the Parsons table column names match valid Redshift names
-        tbl.table = petl.setheader(tbl.table, self.column_name_validate(tbl.columns))
-
-        # Create a list of column names and max width for string values.
-        pc = {c: tbl.get_column_max_width(c) for c in tbl.columns}
+        # Match the Parsons table column names to valid Redshift names, which Redshift
+        # stores in lowercase
+        names = {c: v.lower() for c, v in zip(tbl.columns, self.column_name_validate(tbl.columns))}
 
         # Determine the max width of the varchar columns in the Redshift table
         s, t = self.split_full_table_name(table_name)
         cols = self.get_columns(s, t)
         rc = {k: v['max_length'] for k, v in cols.items() if v['data_type'] == 'character varying'} # noqa: E501, E261
 
+        # Find the max width of the matching Parsons table columns, in one pass
+        pc = tbl.get_columns_max_width([c for c, name in names.items() if name in rc])
+
         # Figure out if any of the destination table varchar columns are smaller than the
         # associated Parsons table columns. If they are, then alter column types to expand
         # their width.
-        for c in set(rc.keys()).intersection(set(pc.keys())):
-            if rc[c] < pc[c]:
-                logger.info(f'{c} not wide enough. Expanding column width.')
-                self.alter_table_column_type(table_name, c, 'varchar', varchar_width=pc[c])
+        changes = [{'column': names[c], 'current_width': rc[names[c]], 'new_width': width}
+                   for c, width in pc.items() if rc[names[c]] < width]
+
+        if changes and not dry_run:
+            with self.connection() as connection:
+                connection.set_session(autocommit=True)
+                for change in changes:
+                    logger.info(f"{change['column']} not wide enough. Expanding column width.")
+                    sql = self._alter_column_type_sql(table_name, change['column'], 'varchar',
+                                                      change['new_width'])
+                    self.query_with_connection(sql, connection)
+
+            logger.info(f'Altered {len(changes)} columns in {table_name}.')
+
+        return Table(changes) if changes else Table([['column', 'current_width', 'new_width']])
+
+    @staticmethod
+    def _alter_column_type_sql(table_name, column_name, data_type, varchar_width=None):
+
+        sql = f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {data_type}"
+
+        if varchar_width:
+            sql += f"({varchar_width})"
+
+        return sql
 
     def alter_table_column_type(self, table_name, column_name, data_type, varchar_width=None):
         """
@@ -720,10 +977,7 @@ class Redshift(RedshiftCreateTable, RedshiftCopyTable, RedshiftTableUtilities, R
             The new width of the column if of type varchar.
         """
 
-        sql = f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {data_type}"
-
-        if varchar_width:
-            sql += f"({varchar_width})"
+        sql = self._alter_column_type_sql(table_name, column_name, data_type, varchar_width)
 
         with self.connection() as connection:
             connection.set_session(autocommit=True)
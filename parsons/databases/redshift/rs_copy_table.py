@@ -7,6 +7,9 @@ logger = logging.getLogger(__name__)
 
 S3_TEMP_KEY_PREFIX = "Parsons_RedshiftCopyTable"
 
+# The compression types that COPY can decompress
+COPY_COMPRESSION_TYPES = ('gzip', 'bzip2', 'zstd')
+
 
 class RedshiftCopyTable(object):
 
@@ -66,8 +69,8 @@ class RedshiftCopyTable(object):
         else:
             raise TypeError('Invalid data type specified.')
 
-        if compression == 'gzip':
-            sql += 'gzip \n'
+        if compression in COPY_COMPRESSION_TYPES:
+            sql += f'{compression} \n'
 
         sql += ';'
 
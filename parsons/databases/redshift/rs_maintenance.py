@@ -0,0 +1,290 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import psycopg2
+
+from parsons.etl.table import Table
+
+logger = logging.getLogger(__name__)
+
+# The number of steps run at once when the WLM slots can't be looked up. It's the
+# concurrency of Redshift's default queue.
+DEFAULT_MAINTENANCE_WORKERS = 5
+
+# The number of times a step is retried after a serialization error, and the number of
+# seconds to wait before the first retry. The wait doubles after each retry.
+SERIALIZATION_RETRIES = 3
+RETRY_WAIT = 2
+
+# Serialization errors are reported by Postgres with this SQLSTATE, and by Redshift with
+# error 1023 and this message
+_SERIALIZATION_PGCODE = '40001'
+_SERIALIZATION_MESSAGE = 'serializable isolation violation'
+
+
+def is_serialization_error(error):
+    """
+    Returns whether a database error is a serialization error, which is safe to retry.
+
+    `Args:`
+        error: Exception
+            The error
+    `Returns:`
+        bool
+    """
+
+    if not isinstance(error, psycopg2.Error):
+        return False
+
+    return (error.pgcode == _SERIALIZATION_PGCODE
+            or _SERIALIZATION_MESSAGE in str(error).lower())
+
+
+def _to_datetime(timestamp):
+
+    return datetime.datetime.fromtimestamp(timestamp) if timestamp else None
+
+
+class _Step(object):
+
+    def __init__(self, name, func, args, kwargs, depends_on):
+
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.depends_on = depends_on
+        self.status = 'pending'
+        self.attempts = 0
+        self.started = None
+        self.finished = None
+        self.seconds = None
+        self.error = None
+
+
+class RedshiftMaintenanceJob(object):
+    """
+    Runs a series of table operations, such as ``duplicate_table``, ``union_tables``,
+    ``VACUUM`` and ``ANALYZE``, running steps which don't depend on each other at the
+    same time. Each step runs on its own connection. Create one with
+    :meth:`Redshift.maintenance_job`.
+
+    .. code-block:: python
+
+        job = rs.maintenance_job()
+        job.add('stage', rs.populate_table_from_query, 'select ...', 'my_schema.stage',
+                if_exists='drop')
+        job.add('final', rs.duplicate_table, 'my_schema.stage', 'my_schema.final',
+                if_exists='drop', depends_on=['stage'])
+        job.add('totals', 'insert into my_schema.totals select ...', depends_on=['final'])
+        job.add_vacuum('vacuum', 'my_schema.final', depends_on=['final'])
+        job.add_analyze('analyze', 'my_schema.final', depends_on=['vacuum'])
+        timings = job.run()
+
+    A step which fails is not retried, unless it hit a serialization error, and the
+    steps which depend on it are skipped. Other steps still run.
+
+    `Args:`
+        redshift: Redshift
+            The Redshift connector to run the steps with
+        max_workers: int
+            The number of steps to run at once. Defaults to the number of WLM slots in the
+            largest manual WLM queue, or 5 if that can't be found.
+        retries: int
+            The number of times to retry a step after a serialization error
+    """
+
+    def __init__(self, redshift, max_workers=None, retries=SERIALIZATION_RETRIES):
+
+        self.redshift = redshift
+        self.max_workers = max_workers
+        self.retries = retries
+        self._steps = {}
+
+    def add(self, name, operation, *args, depends_on=None, **kwargs):
+        """
+        Add a step to the job.
+
+        `Args:`
+            name: str
+                A unique name for the step
+            operation: str or callable
+                Either a SQL statement, or a function to call, such as
+                ``rs.duplicate_table``
+            \*args:
+                The arguments to call the function with
+            depends_on: list
+                The names of steps which must finish first. They must already have been
+                added.
+            \**kwargs:
+                The keyword arguments to call the function with
+        `Returns:`
+            The job, so calls can be chained
+        """  # noqa: W605
+
+        if name in self._steps:
+            raise ValueError(f'A step named {name} has already been added.')
+
+        depends_on = list(depends_on or [])
+        missing = [d for d in depends_on if d not in self._steps]
+        if missing:
+            raise ValueError(f'Step {name} depends on steps which have not been added: '
+                             f'{", ".join(missing)}')
+
+        if isinstance(operation, str):
+            if args or kwargs:
+                raise ValueError('Arguments can only be passed with a function.')
+            func, args = self.redshift.query, (operation,)
+        else:
+            func = operation
+
+        self._steps[name] = _Step(name, func, args, kwargs, depends_on)
+        return self
+
+    def _autocommit(self, sql):
+        # VACUUM can't be run inside a transaction block
+
+        with self.redshift.connection() as connection:
+            connection.set_session(autocommit=True)
+            self.redshift.query_with_connection(sql, connection)
+
+    def add_vacuum(self, name, table_name, option=None, depends_on=None):
+        """
+        Add a step which vacuums a table.
+
+        `Args:`
+            name: str
+                A unique name for the step
+            table_name: str
+                The schema and table name
+            option: str
+                A vacuum option, eg. ``SORT ONLY`` or ``DELETE ONLY``
+            depends_on: list
+                The names of steps which must finish first
+        `Returns:`
+            The job, so calls can be chained
+        """
+
+        sql = f'VACUUM {option} {table_name};' if option else f'VACUUM {table_name};'
+        return self.add(name, self._autocommit, sql, depends_on=depends_on)
+
+    def add_analyze(self, name, table_name, depends_on=None):
+        """
+        Add a step which updates the statistics for a table.
+
+        `Args:`
+            name: str
+                A unique name for the step
+            table_name: str
+                The schema and table name
+            depends_on: list
+                The names of steps which must finish first
+        `Returns:`
+            The job, so calls can be chained
+        """
+
+        return self.add(name, self._autocommit, f'ANALYZE {table_name};', depends_on=depends_on)
+
+    def _get_max_workers(self):
+
+        if self.max_workers:
+            return self.max_workers
+
+        sql = """
+            select max(num_query_tasks) as slots
+            from stv_wlm_service_class_config
+            where service_class between 6 and 13
+        """
+
+        try:
+            slots = self.redshift.query(sql)[0]['slots']
+        except (psycopg2.Error, TypeError, IndexError) as error:
+            logger.debug(f'Unable to look up the WLM slots: {error}')
+            slots = None
+
+        # Automatic WLM doesn't have a fixed number of slots
+        return slots if slots and slots > 0 else DEFAULT_MAINTENANCE_WORKERS
+
+    def _run_step(self, step):
+
+        step.started = time.time()
+        wait_seconds = RETRY_WAIT
+
+        try:
+            while True:
+                step.attempts += 1
+                try:
+                    step.func(*step.args, **step.kwargs)
+                    return
+                except Exception as error:
+                    if step.attempts > self.retries or not is_serialization_error(error):
+                        raise
+                    logger.info(f'Step {step.name} hit a serialization error. Retrying in '
+                                f'{wait_seconds} seconds.')
+                    time.sleep(wait_seconds)
+                    wait_seconds *= 2
+        finally:
+            step.finished = time.time()
+
+    def run(self):
+        """
+        Run the steps.
+
+        `Returns:`
+            Parsons Table
+                One row per step, in the order they were added, with the step ``name``,
+                its ``status`` (``succeeded``, ``failed`` or ``skipped``), the number of
+                ``attempts``, the ``started`` and ``finished`` times, the number of
+                ``seconds`` it took and any ``error``.
+        """
+
+        steps = self._steps
+        for step in steps.values():
+            step.status = 'pending'
+            step.attempts = 0
+            step.started = step.finished = step.seconds = step.error = None
+
+        max_workers = self._get_max_workers()
+        logger.info(f'Running {len(steps)} maintenance steps, {max_workers} at a time.')
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                for step in steps.values():
+                    if step.status != 'pending':
+                        continue
+                    statuses = {steps[d].status for d in step.depends_on}
+                    if statuses & {'failed', 'skipped'}:
+                        step.status = 'skipped'
+                        logger.info(f'Skipping step {step.name}, as a step it depends on '
+                                    f'failed.')
+                    elif statuses <= {'succeeded'}:
+                        step.status = 'running'
+                        running[executor.submit(self._run_step, step)] = step
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    step.seconds = round(step.finished - step.started, 3)
+                    error = future.exception()
+                    if error is None:
+                        step.status = 'succeeded'
+                        logger.info(f'Step {step.name} finished in {step.seconds} seconds.')
+                    else:
+                        step.status = 'failed'
+                        step.error = str(error)
+                        logger.error(f'Step {step.name} failed: {error}')
+
+        return Table([{'name': step.name,
+                       'status': step.status,
+                       'attempts': step.attempts,
+                       'started': _to_datetime(step.started),
+                       'finished': _to_datetime(step.finished),
+                       'seconds': step.seconds,
+                       'error': step.error}
+                      for step in steps.values()])
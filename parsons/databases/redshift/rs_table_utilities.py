@@ -1,13 +1,108 @@
 import logging
+import re
+import threading
+import time
+
+from parsons.databases.redshift.rs_maintenance import (
+    RedshiftMaintenanceJob, SERIALIZATION_RETRIES)
 
 logger = logging.getLogger(__name__)
 
+# The number of seconds catalog lookups (eg. whether a table exists, or its columns) are
+# cached for
+CATALOG_CACHE_TTL = 300
+
+# Statements which can't change a table, so don't need to clear the catalog cache
+_READ_ONLY_SQL = re.compile(r'^\s*(select|with|show|explain)\b', re.IGNORECASE)
+
+
+class CatalogCache(object):
+    """
+    A thread-safe cache of catalog lookups, which expire after a number of seconds.
+
+    `Args:`
+        ttl: int
+            The number of seconds to keep each lookup for. ``0`` or ``None`` turns the cache
+            off.
+    """
+
+    def __init__(self, ttl=CATALOG_CACHE_TTL):
+
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a tuple of whether the key was found, and its value.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                return False, None
+            return True, value
+
+    def set(self, key, value):
+
+        if not self.ttl:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def lookup(self, key, func):
+        """
+        Returns the cached value for a key, calling ``func`` to fill it if it's missing.
+        """
+
+        found, value = self.get(key)
+        if not found:
+            value = func()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
 
 class RedshiftTableUtilities(object):
 
     def __init__(self):
         pass
 
+    @property
+    def catalog_cache(self):
+        # Created lazily, since the mixins' __init__ isn't called by Redshift
+        cache = self.__dict__.get('_catalog_cache')
+        if cache is None:
+            cache = self._catalog_cache = CatalogCache(
+                getattr(self, 'catalog_cache_ttl', CATALOG_CACHE_TTL))
+        return cache
+
+    def clear_catalog_cache(self):
+        """
+        Clear the cached catalog lookups. Statements run through Parsons which can change a
+        table (anything but a ``SELECT``) clear the cache automatically, as do failed
+        statements and transactions rolled back by an error in a ``connection`` block.
+        You'll need to call this if tables are changed by another client within the cache's
+        TTL, or after rolling back a transaction yourself.
+        """
+
+        self.catalog_cache.clear()
+
+    def _clear_catalog_cache_for(self, sql):
+        # Called after each statement, to drop lookups the statement may have made stale
+
+        if not _READ_ONLY_SQL.match(sql):
+            self.clear_catalog_cache()
+
     def table_exists(self, table_name, view=True):
         """
         Check if a table or view exists in the database.
@@ -26,6 +121,11 @@ class RedshiftTableUtilities(object):
             return self.table_exists_with_connection(table_name, connection, view)
 
     def table_exists_with_connection(self, table_name, connection, view=True):
+        key = ('exists', table_name.lower(), view)
+        return self.catalog_cache.lookup(
+            key, lambda: self._table_exists_with_connection(table_name, connection, view))
+
+    def _table_exists_with_connection(self, table_name, connection, view=True):
         table_name = table_name.lower().split('.')
 
         # Check in pg tables for the table
@@ -287,6 +387,25 @@ class RedshiftTableUtilities(object):
 
         logger.info(f"Created {new_table_name} from {', '.join(tables)}")
 
+    def maintenance_job(self, max_workers=None, retries=SERIALIZATION_RETRIES):
+        """
+        Create a job which runs a series of table operations, such as
+        :meth:`duplicate_table`, :meth:`union_tables`, ``VACUUM`` and ``ANALYZE``. Steps
+        which don't depend on each other run at the same time, on separate connections.
+        See :class:`~parsons.databases.redshift.rs_maintenance.RedshiftMaintenanceJob`.
+
+        `Args:`
+            max_workers: int
+                The number of steps to run at once. Defaults to the number of WLM slots in
+                the largest manual WLM queue, or 5 if that can't be found.
+            retries: int
+                The number of times to retry a step after a serialization error
+        `Returns:`
+            RedshiftMaintenanceJob
+        """
+
+        return RedshiftMaintenanceJob(self, max_workers=max_workers, retries=retries)
+
     def get_tables(self, schema=None, table_name=None):
         """
         List the tables in a schema including metadata.
@@ -344,7 +463,9 @@ class RedshiftTableUtilities(object):
 
     def get_columns(self, schema, table_name):
         """
-        Gets the column names (and some other column info) for a table.
+        Gets the column names (and some other column info) for a table. The result is
+        cached; see :meth:`describe_schema` to fetch the columns of every table in a schema
+        at once.
 
         If you just need the column names, you can treat the return value like a list, eg:
 
@@ -379,17 +500,77 @@ class RedshiftTableUtilities(object):
             order by ordinal_position
         """
 
+        def columns():
+            return {row['column_name']: self._column_info(row)
+                    for row in (self.query(query) or [])}
+
+        # Copy, so callers can't change the cached value
+        return dict(self.catalog_cache.lookup(('columns', schema, table_name), columns))
+
+    @staticmethod
+    def _column_info(row):
+
         return {
-            row['column_name']: {
-                'data_type': row['data_type'],
-                'max_length': row['max_length'],
-                'max_precision': row['max_precision'],
-                'max_scale': row['max_scale'],
-                'is_nullable': row['is_nullable'] == 'YES',
-            }
-            for row in self.query(query)
+            'data_type': row['data_type'],
+            'max_length': row['max_length'],
+            'max_precision': row['max_precision'],
+            'max_scale': row['max_scale'],
+            'is_nullable': row['is_nullable'] == 'YES',
         }
 
+    def describe_schema(self, schema):
+        """
+        Gets the tables and views in a schema, along with their columns, in a single query.
+        The results fill the catalog cache, so later calls to :meth:`get_columns`,
+        :meth:`table_exists`, :meth:`is_table` and :meth:`is_view` for objects in the schema
+        don't need to query the database.
+
+        `Args:`
+            schema: str
+                The schema name
+        `Returns:`
+            A dict mapping each table name to a dict with format
+            ``{'type': 'table' or 'view', 'columns': dict}``, where ``columns`` is in the
+            same format as the return value of :meth:`get_columns`.
+        """
+
+        sql = f"""
+            select c.table_name,
+                   t.table_type,
+                   c.ordinal_position,
+                   c.column_name,
+                   c.data_type,
+                   c.character_maximum_length as max_length,
+                   c.numeric_precision as max_precision,
+                   c.numeric_scale as max_scale,
+                   c.is_nullable
+            from information_schema.columns c
+            join information_schema.tables t
+                on t.table_schema = c.table_schema
+                and t.table_name = c.table_name
+            where c.table_schema = '{schema}'
+            order by c.table_name, c.ordinal_position
+        """
+
+        tables = {}
+        for row in (self.query(sql) or []):
+            table = tables.setdefault(row['table_name'], {
+                'type': 'view' if row['table_type'] == 'VIEW' else 'table',
+                'columns': {},
+            })
+            table['columns'][row['column_name']] = self._column_info(row)
+
+        cache = self.catalog_cache
+        for table_name, table in tables.items():
+            full_name = f'{schema}.{table_name}'
+            cache.set(('columns', schema, table_name), dict(table['columns']))
+            cache.set(('object_type', full_name), table['type'])
+            cache.set(('exists', full_name.lower(), True), True)
+            cache.set(('exists', full_name.lower(), False), table['type'] == 'table')
+
+        logger.info(f'Found {len(tables)} tables and views in {schema}.')
+        return tables
+
     def get_views(self, schema=None, view=None):
         """
         List views.
@@ -490,7 +671,7 @@ class RedshiftTableUtilities(object):
 
     def get_object_type(self, object_name):
         """
-        Get object type.
+        Get object type. The result is cached.
 
         One of `view`, `table`, `index`, `sequence`, or `TOAST table`.
 
@@ -515,13 +696,16 @@ class RedshiftTableUtilities(object):
                 on c.relnamespace = n.oid
             where objname='{object_name}'
         """
-        tbl = self.query(sql_obj_type)
 
-        if tbl.num_rows == 0:
+        def object_type():
+            tbl = self.query(sql_obj_type)
+            return tbl[0]['object_name'] if tbl.num_rows else None
+
+        obj_type = self.catalog_cache.lookup(('object_type', object_name), object_type)
+        if obj_type is None:
             logger.info(f"{object_name} doesn't exist.")
-            return None
 
-        return tbl[0]['object_name']
+        return obj_type
 
     def is_view(self, object_name):
         """
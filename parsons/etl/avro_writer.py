@@ -0,0 +1,231 @@
+"""
+Writes petl tables as Avro object container files with ``fastavro``, for ``to_avro`` and
+the BigQuery loader.
+
+Avro files carry an explicit, typed schema, so unlike a CSV they can be loaded without
+type inference on the other end. The schema is built from the Python types found in
+each column. Every field is nullable. Decimals are written with the ``decimal`` logical
+type, so they keep their precision, with a precision and scale wide enough for every
+value sampled from the column. Blocks are compressed with deflate, which all Avro
+readers support.
+
+See the `Avro specification <https://avro.apache.org/docs/1.8.2/spec.html>`_.
+"""
+
+import datetime
+import decimal
+import itertools
+import json
+import re
+
+import fastavro
+import petl
+
+# The number of rows profiled to build a schema
+SAMPLE_SIZE = 1000
+
+_INVALID_NAME_CHARS = re.compile(r'[^A-Za-z0-9_]')
+
+# The Avro type for each Python type. Types which aren't listed are written as strings.
+_AVRO_TYPES = {
+    bool: 'boolean',
+    int: 'long',
+    float: 'double',
+    decimal.Decimal: 'decimal',
+    str: 'string',
+    datetime.datetime: {'type': 'long', 'logicalType': 'timestamp-micros'},
+    datetime.date: {'type': 'int', 'logicalType': 'date'},
+}
+
+
+def _to_text(value):
+
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+
+    return str(value)
+
+
+def _decimal_digits(value):
+    # The number of digits before and after the point in a finite Decimal
+
+    _, digits, exponent = value.as_tuple()
+    return max(len(digits) + exponent, 0), max(-exponent, 0)
+
+
+def _to_decimal(value):
+
+    if isinstance(value, decimal.Decimal):
+        return value
+
+    return decimal.Decimal(value)
+
+
+def _to_utc(value):
+    # fastavro writes naive datetimes in local time, so mark them as UTC
+
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+
+    return value
+
+
+def _value_converter(avro_type):
+    # Returns a function which converts a (non-null) value to one fastavro writes with the
+    # given type, or None if values are written as they are
+
+    if isinstance(avro_type, dict):
+        avro_type = avro_type['logicalType']
+
+    if avro_type == 'decimal':
+        return _to_decimal
+
+    if avro_type == 'timestamp-micros':
+        return _to_utc
+
+    if avro_type == 'string':
+        return _to_text
+
+    return None
+
+
+def _field_name(column, seen):
+    # Avro names may only hold letters, numbers and underscores, and can't start with
+    # a number
+
+    name = _INVALID_NAME_CHARS.sub('_', str(column)) or '_'
+    if name[0].isdigit():
+        name = '_' + name
+
+    unique = name
+    i = 1
+    while unique in seen:
+        unique = f'{name}_{i}'
+        i += 1
+    seen.add(unique)
+
+    return unique
+
+
+def _avro_type(types, digits=None):
+    # Picks a single Avro type for the set of Python types found in a column. digits
+    # holds the most digits before and after the point of any decimal in the column, or
+    # None if one of them isn't finite.
+
+    types = types - {type(None)}
+
+    if not types:
+        return 'string'
+
+    avro_types = [_AVRO_TYPES.get(t, 'string') for t in types]
+
+    if 'decimal' in avro_types and all(t in ('decimal', 'long') for t in avro_types):
+        if digits is None:
+            return 'string'
+        integer_digits, scale = digits
+        return {'type': 'bytes', 'logicalType': 'decimal',
+                'precision': max(integer_digits + scale, 1), 'scale': scale}
+
+    if all(t == avro_types[0] for t in avro_types):
+        return avro_types[0]
+
+    if set(avro_types) <= {'long', 'double'}:
+        return 'double'
+
+    return 'string'
+
+
+def avro_schema(table, name='parsons_table', sample_size=SAMPLE_SIZE):
+    """
+    Build an Avro record schema from the Python types in each column of a petl table.
+    Every field is nullable. Numeric columns holding both ints and floats become
+    ``double``, columns of decimals and ints become ``decimal`` and other mixed columns
+    become ``string``.
+
+    The types are found from the first ``sample_size`` rows. Writing a later value which
+    doesn't fit its column's type raises an error, so pass ``sample_size=None`` to
+    profile the whole table when the first rows aren't representative.
+
+    `Args:`
+        table: petl table
+            The table to profile
+        name: str
+            The name of the record
+        sample_size: int
+            The number of rows to profile. If ``None``, reads the whole table.
+    `Returns:`
+        dict
+            The Avro schema
+    """
+
+    it = iter(table)
+    hdr = list(next(it))
+    types = [set() for _ in hdr]
+    digits = [(0, 0)] * len(hdr)
+
+    for row in itertools.islice(it, sample_size):
+        for i, value in enumerate(row[:len(hdr)]):
+            types[i].add(type(value))
+            if isinstance(value, int) and not isinstance(value, bool):
+                if digits[i] is not None:
+                    digits[i] = (max(digits[i][0], len(str(abs(value)))), digits[i][1])
+            elif isinstance(value, decimal.Decimal) and digits[i] is not None:
+                if value.is_finite():
+                    integer_digits, scale = _decimal_digits(value)
+                    digits[i] = (max(digits[i][0], integer_digits), max(digits[i][1], scale))
+                else:
+                    digits[i] = None
+
+    seen = set()
+    fields = [{'name': _field_name(column, seen),
+               'type': ['null', _avro_type(column_types, column_digits)],
+               'default': None}
+              for column, column_types, column_digits in zip(hdr, types, digits)]
+
+    return {'type': 'record', 'name': name, 'fields': fields}
+
+
+def write_avro(table, file, schema=None, compression_level=6):
+    """
+    Write a petl table to a binary file as an Avro object container file.
+
+    `Args:`
+        table: petl table
+            The table to write
+        file: file object
+            A file open in binary mode
+        schema: dict
+            The Avro record schema, with one nullable field per column. If ``None``, built
+            by :func:`avro_schema`.
+        compression_level: int
+            The deflate compression level
+    `Returns:`
+        int
+            The number of rows written
+    """
+
+    schema = schema or avro_schema(table)
+
+    names = []
+    converters = []
+    for field in schema['fields']:
+        field_type = field['type']
+        if isinstance(field_type, list):
+            field_type = [t for t in field_type if t != 'null'][0]
+        names.append(field['name'])
+        converters.append(_value_converter(field_type))
+
+    count = 0
+
+    def records():
+        nonlocal count
+        for row in petl.data(table):
+            count += 1
+            yield {name: value if value is None or convert is None else convert(value)
+                   for name, value, convert
+                   in itertools.zip_longest(names, row[:len(names)], converters)}
+
+    fastavro.writer(file, schema, records(), codec='deflate',
+                    codec_compression_level=compression_level)
+
+    return count
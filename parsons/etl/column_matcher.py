@@ -0,0 +1,183 @@
+"""
+Resolve column names against a set of known names and their aliases, used by
+``match_columns``, ``map_columns`` and the Facebook Ads key mapping.
+
+The aliases are normalized once, when the matcher is built, into a dict from each
+normalized alias to the name it maps to, so matching a column is a single lookup rather
+than a scan over every alias. Columns which don't match exactly can optionally be
+matched to the closest alias within a maximum edit distance. Those lookups are cached,
+and only aliases of a similar length are compared.
+"""
+
+
+def normalize_column_name(column_name):
+    """
+    Returns a column name with whitespace removed, non-alphanumeric characters removed, and
+    everything lowercased.
+
+    `Args:`
+        column_name: str
+            The column name
+    `Returns:`
+        str
+            Normalized column name
+    """
+
+    return ''.join(c for c in column_name.lower().strip() if c.isalnum())
+
+
+def edit_distance(a, b, max_distance=None):
+    """
+    Returns the Levenshtein distance between two strings: the number of single character
+    insertions, deletions and substitutions needed to turn one into the other.
+
+    `Args:`
+        a: str
+            The first string
+        b: str
+            The second string
+        max_distance: int
+            Stop early once the distance is known to be more than this, returning
+            ``max_distance + 1``
+    `Returns:`
+        int
+    """
+
+    if len(a) < len(b):
+        a, b = b, a
+
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+
+class ColumnMatcher(object):
+    """
+    Matches column names to a set of target names.
+
+    .. code-block:: python
+
+        matcher = ColumnMatcher({'first_name': ['fn', 'first', 'first name'],
+                                 'last_name': ['ln', 'last', 'last name']})
+
+        matcher.match('First Name')
+        >> 'first_name'
+
+        matcher.rename_map(['FN', 'LN', 'dob'])
+        >> {'FN': 'first_name', 'LN': 'last_name'}
+
+    `Args:`
+        targets: dict or list
+            A dict mapping each target name to a list of its aliases, or a list of target
+            names which each match themselves. A target name in a dict only matches itself
+            if it is one of its own aliases. If an alias is given for more than one target,
+            it matches the first.
+        normalize: bool
+            Whether to normalize names before comparing them, with
+            :func:`normalize_column_name`. Eg. With this set, "FIRST NAME" matches
+            "first_name".
+        max_distance: int
+            If set, a column which doesn't match any name exactly matches the closest name
+            within this edit distance, after normalizing.
+    """
+
+    def __init__(self, targets, normalize=True, max_distance=None):
+
+        self.normalize = normalize
+        self.max_distance = max_distance
+
+        if not isinstance(targets, dict):
+            targets = {target: [target] for target in targets}
+
+        self._index = {}
+        for target, aliases in targets.items():
+            for name in aliases:
+                self._index.setdefault(self._key(name), target)
+
+        # Index the names by length, so fuzzy matches only compare names that could be
+        # within the maximum distance
+        self._by_length = {}
+        for key, target in self._index.items():
+            self._by_length.setdefault(len(key), []).append((key, target))
+
+        self._fuzzy_cache = {}
+
+    def _key(self, name):
+
+        return normalize_column_name(name) if self.normalize else name
+
+    def _fuzzy_match(self, key):
+
+        if key in self._fuzzy_cache:
+            return self._fuzzy_cache[key]
+
+        best = None
+        best_distance = self.max_distance + 1
+        for length in range(len(key) - self.max_distance, len(key) + self.max_distance + 1):
+            for name, target in self._by_length.get(length, []):
+                distance = edit_distance(key, name, best_distance - 1)
+                if distance < best_distance:
+                    best, best_distance = target, distance
+
+        self._fuzzy_cache[key] = best
+        return best
+
+    def match(self, column):
+        """
+        Returns the target name a column matches, or ``None`` if it doesn't match any.
+
+        `Args:`
+            column: str
+                The column name
+        `Returns:`
+            str
+        """
+
+        key = self._key(column)
+        target = self._index.get(key)
+
+        if target is None and self.max_distance:
+            target = self._fuzzy_match(key)
+
+        return target
+
+    def match_all(self, columns):
+        """
+        Returns the target name each column matches, or ``None`` for columns which don't
+        match any.
+
+        `Args:`
+            columns: list
+                The column names
+        `Returns:`
+            list
+        """
+
+        return [self.match(column) for column in columns]
+
+    def rename_map(self, columns):
+        """
+        Returns a dict mapping each column which matches a different target name to that
+        target name.
+
+        `Args:`
+            columns: list
+                The column names
+        `Returns:`
+            dict
+        """
+
+        return {column: target for column, target in zip(columns, self.match_all(columns))
+                if target is not None and target != column}
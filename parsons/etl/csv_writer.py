@@ -0,0 +1,145 @@
+"""
+A batch CSV writer for the default (excel) CSV dialect, used by ``to_csv`` and
+``append_csv`` when no custom dialect arguments are given.
+
+Rather than formatting a row at a time, rows are read in batches and formatted a column
+at a time, choosing a formatter for each column from the types of its values. Numbers,
+dates and other values whose string form can't contain a delimiter are converted
+without any escaping. Text columns are only escaped if the batch contains a special
+character, which is checked with a single regex search over the whole column. Each
+batch is then joined and encoded into a single large write.
+
+The output is identical to ``csv.writer`` with the default dialect.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import itertools
+import locale
+import re
+
+# The number of rows formatted at a time
+BATCH_SIZE = 10000
+
+_NONE_TYPE = type(None)
+
+# Types whose string form never needs quoting
+_SAFE_TYPES = {int, float, bool, decimal.Decimal, datetime.date, datetime.datetime,
+               datetime.time}
+
+# Types with few distinct values in a typical column, which are cheaper to look up than
+# to format again
+_MEMO_TYPES = {datetime.date, datetime.datetime}
+
+_SPECIAL = re.compile('[,"\r\n]')
+
+_LINE_TERMINATOR = '\r\n'
+
+
+def _quote(value):
+
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _format_text(column):
+    # Text only needs escaping if the batch contains a special character
+
+    if _SPECIAL.search(''.join(column)) is None:
+        return column
+
+    search = _SPECIAL.search
+    return [_quote(v) if search(v) else v for v in column]
+
+
+def _format_column(column):
+    # Converts a column of a batch to a list of CSV fields
+
+    types = set(map(type, column))
+    has_none = _NONE_TYPE in types
+    types.discard(_NONE_TYPE)
+
+    if types <= {str}:
+        if has_none:
+            column = ['' if v is None else v for v in column]
+        return _format_text(column)
+
+    if types <= _MEMO_TYPES:
+        memo = {v: str(v) for v in set(column)}
+        memo[None] = ''
+        return list(map(memo.__getitem__, column))
+
+    if types <= _SAFE_TYPES:
+        if has_none:
+            return ['' if v is None else str(v) for v in column]
+        return list(map(str, column))
+
+    return _format_text(['' if v is None else str(v) for v in column])
+
+
+def _format_rows(rows):
+    # Ragged rows can't be formatted by column, so use the csv module
+
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+def _format_batch(rows, width):
+
+    if not width or any(len(row) != width for row in rows):
+        return _format_rows(rows)
+
+    columns = [_format_column(column) for column in zip(*rows)]
+
+    if width == 1:
+        # The csv module quotes an empty value on its own, so the row isn't blank
+        return _LINE_TERMINATOR.join(v or '""' for v in columns[0]) + _LINE_TERMINATOR
+
+    return _LINE_TERMINATOR.join(map(','.join, zip(*columns))) + _LINE_TERMINATOR
+
+
+def write_csv(table, file, encoding=None, errors='strict', write_header=True,
+              batch_size=None):
+    """
+    Write a petl table to a binary file as a CSV, using the default CSV dialect.
+
+    `Args:`
+        table: petl table
+            The table to write
+        file: file object
+            A file open in binary mode
+        encoding: str
+            The text encoding. Defaults to the system's preferred encoding, as with
+            ``open()``.
+        errors: str
+            The encoding error handling
+        write_header: boolean
+            Include the header in the output
+        batch_size: int
+            The number of rows to format at a time
+    `Returns:`
+        int
+            The number of rows written, not counting the header
+    """
+
+    encoding = encoding or locale.getpreferredencoding(False)
+    batch_size = batch_size or BATCH_SIZE
+
+    it = iter(table)
+    hdr = tuple(next(it))
+    width = len(hdr)
+
+    if write_header:
+        file.write(_format_batch([hdr], width).encode(encoding, errors))
+
+    count = 0
+    while True:
+        rows = list(itertools.islice(it, batch_size))
+        if not rows:
+            break
+        count += len(rows)
+        file.write(_format_batch(rows, width).encode(encoding, errors))
+
+    return count
@@ -1,5 +1,6 @@
 import petl
 import logging
+from parsons.etl.column_matcher import ColumnMatcher, normalize_column_name
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +68,30 @@ class ETL(object):
 
         return self
 
+    def rename_columns(self, column_map):
+        """
+        Rename several columns at once. This replaces the header in a single step, rather
+        than adding a layer to the table for each column.
+
+        `Args:`
+            column_map: dict
+                A dictionary mapping current column names to new column names
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        header = [column_map.get(c, c) for c in self.columns]
+
+        seen = set()
+        for column in header:
+            if column in seen:
+                raise ValueError(f"Column {column} already exists")
+            seen.add(column)
+
+        self.table = petl.setheader(self.table, header)
+
+        return self
+
     def fill_column(self, column_name, fill_value):
         """
         Fill a column in a table
@@ -159,6 +184,35 @@ class ETL(object):
 
         return max_width
 
+    def get_columns_max_width(self, columns=None):
+        """
+        Return the maximum width of several columns, reading the table once.
+
+        `Args:`
+            columns: list
+                The column names. Defaults to all of the columns.
+        `Returns:`
+            dict
+                The maximum width of each column, by column name
+        """
+
+        it = iter(self.table)
+        header = list(next(it, []))
+
+        if columns is None:
+            columns = header
+        indexes = [(column, header.index(column)) for column in columns]
+        widths = {column: 0 for column in columns}
+
+        for row in it:
+            for column, index in indexes:
+                if index < len(row):
+                    width = len(str(row[index]))
+                    if width > widths[column]:
+                        widths[column] = width
+
+        return widths
+
     def convert_columns_to_str(self):
         """
         Convenience function to convert all non-string or mixed columns in a
@@ -246,13 +300,8 @@ class ETL(object):
             >> {{first_name: 'Jane', last_name: 'Doe', 'date_of_birth': '1908-01-01'}}
         """
 
-        for c in self.columns:
-            for k, v in column_map.items():
-                for i in v:
-                    if c == i:
-                        self.rename_column(c, k)
-
-        return self
+        matcher = ColumnMatcher(column_map, normalize=False)
+        return self.rename_columns(matcher.rename_map(self.columns))
 
     def get_column_types(self, column):
         """
@@ -327,18 +376,28 @@ class ETL(object):
                 set to column name.
         """
 
-        if prepend:
-            if prepend_value is None:
-                prepend_value = column
+        if not prepend:
+            self.table = petl.unpackdict(
+                self.table, column, keys=keys, includeoriginal=include_original,
+                samplesize=sample_size, missing=missing)
+            return self
+
+        from parsons.etl.flatten import PrependHeaderView
 
-            self.table = petl.convert(
-                self.table,
-                column,
-                lambda v: self._prepend_dict(v, prepend_value))
+        if prepend_value is None:
+            prepend_value = column
 
-        self.table = petl.unpackdict(
+        # Rather than renaming the keys of every dict, unpack them as is and then prepend
+        # to the new column names in the header.
+        if keys:
+            prefix = prepend_value + '_'
+            keys = [k[len(prefix):] if k.startswith(prefix) else k for k in keys]
+
+        start = len(self.columns) - (0 if include_original else 1)
+        unpacked = petl.unpackdict(
             self.table, column, keys=keys, includeoriginal=include_original,
             samplesize=sample_size, missing=missing)
+        self.table = PrependHeaderView(unpacked, start, prepend_value)
 
         return self
 
@@ -415,13 +474,17 @@ class ETL(object):
         """
         Unpack list or dict values from one column into separate rows.
         Not recommended for JSON columns (i.e. lists of dicts), but can handle columns
-        with any mix of types. Makes use of PETL's `melt()` method.
+        with any mix of types.
+
+        Each unpacked row is given a ``uid`` made up of the parent row's key and the
+        position of the value within it (e.g. ``'15_2'``).
 
         `Args:`
             column: str
                 The column name to unpack
             key: str
-                The column to use as a key when unpacking. Defaults to `id`
+                The column to use as a key when unpacking. Defaults to `id`. If the column
+                doesn't exist, the row number is used.
             expand_original: boolean or int
                 If `True`: Add resulting unpacked rows (with all other columns) to original
                 If `int`: Add to original unless the max added per key is above the given number
@@ -432,85 +495,20 @@ class ETL(object):
             Otherwise, standalone table with key column and unpacked values only
         """
 
-        if isinstance(expand_original, int) and expand_original is not True:
-            lengths = {len(row[column]) for row in self if isinstance(row[column], (dict, list))}
-            max_len = sorted(lengths, reverse=True)[0]
-            if max_len > expand_original:
-                expand_original = False
-
-        if expand_original:
-            # Include all columns and filter out other non-dict types in table_list
-            table = self
-            table_list = table.select_rows(lambda row: isinstance(row[column], list))
-        else:
-            # Otherwise, include only key and column, but keep all non-dict types in table_list
-            table = self.cut(key, column)
-            table_list = table.select_rows(lambda row: not isinstance(row[column], dict))
-
-        # All the columns other than column to ignore while melting
-        ignore_cols = table.columns
-        ignore_cols.remove(column)
-
-        # Unpack lists as separate columns
-        table_list.unpack_list(column, replace=True)
-
-        # Rename the columns to retain only the number
-        for col in table_list.columns:
-            if f'{column}_' in col:
-                table_list.rename_column(col, col.replace(f'{column}_', ""))
-
-        # Filter dicts and unpack as separate columns
-        table_dict = table.select_rows(lambda row: isinstance(row[column], dict))
-        table_dict.unpack_dict(column, prepend=False)
-
         from parsons.etl.table import Table
+        from parsons.etl.flatten import NestedRowsView
 
-        # Use melt to pivot both sets of columns into their own Tables and clean out None values
-        melted_list = Table(petl.melt(table_list.table, ignore_cols))
-        melted_dict = Table(petl.melt(table_dict.table, ignore_cols))
-
-        melted_list.remove_null_rows('value')
-        melted_dict.remove_null_rows('value')
+        if not isinstance(expand_original, bool) and isinstance(expand_original, int):
+            max_len = max((len(v) for v in petl.values(self.table, column)
+                           if isinstance(v, (dict, list))), default=0)
+            expand_original = bool(expand_original) and max_len <= expand_original
 
-        melted_list.rename_column('variable', column)
-        melted_dict.rename_column('variable', column)
+        output = Table(NestedRowsView(self.table, column, key=key,
+                                      expand_original=expand_original))
 
-        # Combine the list and dict Tables
-        melted_list.concat(melted_dict)
-
-        import hashlib
-
-        if expand_original:
-            # Add unpacked rows to the original table (minus packed rows)
-            orig = self.select_rows(lambda row: not isinstance(row[column], (dict, list)))
-            orig.concat(melted_list)
-            # Add unique id column by hashing all the other fields
-            if 'uid' not in self.columns:
-                orig.add_column('uid', lambda row: hashlib.md5(
-                    str.encode(
-                        ''.join([str(x) for x in row])
-                        )
-                    ).hexdigest())
-                orig.move_column('uid', 0)
-
-            # Rename value column in case this is done again to this Table
-            orig.rename_column('value', f'{column}_value')
+        if not expand_original:
+            self.remove_column(column)
 
-            # Keep column next to column_value
-            orig.move_column(column, -1)
-            output = orig
-        else:
-            orig = self.remove_column(column)
-            # Add unique id column by hashing all the other fields
-            melted_list.add_column('uid', lambda row: hashlib.md5(
-                str.encode(
-                    ''.join([str(x) for x in row])
-                    )
-                ).hexdigest())
-            melted_list.move_column('uid', 0)
-            output = melted_list
-
-        self = orig
         return output
 
     def long_table(self, key, column, key_rename=None, retain_original=False,
@@ -563,15 +561,14 @@ class ETL(object):
                 The new long table
         """
 
+        from parsons.etl.table import Table
+        from parsons.etl.flatten import LongTableView
+
         if type(key) == str:
             key = [key]
 
-        lt = self.cut(*key, column)  # Create a table of key and column
-        lt.unpack_list(column, replace=True)  # Unpack the list
-        lt.table = petl.melt(lt.table, key)  # Melt into a long table
-        lt = lt.cut(*key, 'value')  # Get rid of column names created in unpack
-        lt.rename_column('value', column)  # Rename 'value' to old column name
-        lt.remove_null_rows(column)  # Remove null values
+        # One row per list item, with the key columns repeated and null items removed
+        lt = Table(LongTableView(self.table, key, column))
 
         # If a new key name is specified, rename
         if key_rename:
@@ -587,6 +584,89 @@ class ETL(object):
 
         return lt
 
+    def flatten(self, max_depth=None, sep='_', sample_size=1000, missing=None):
+        """
+        Flatten nested dicts in all columns into separate columns, in a single pass. Nested
+        column names are joined with ``sep``, and the new columns take the place of the
+        column they were unpacked from. Lists are left as is; use :meth:`flatten_tables`
+        to split them out into long tables.
+
+        .. code-block:: python
+
+            tbl = Table([{'id': 1, 'address': {'city': 'Austin', 'geo': {'lat': 30.3}}}])
+
+            tbl.flatten()
+            >> {'id': 1, 'address_city': 'Austin', 'address_geo_lat': 30.3}
+
+        `Args:`
+            max_depth: int
+                The number of levels of nested dicts to flatten. If ``None``, flattens all
+                levels.
+            sep: str
+                The separator used to join nested column names
+            sample_size: int
+                The number of rows to sample to discover the nested keys. If ``None``, the
+                whole table is scanned, so no keys are missed.
+            missing:
+                The value to use when a row is missing a nested key
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        from parsons.etl.flatten import FlattenView
+
+        self.table = FlattenView(self.table, max_depth=max_depth, sep=sep,
+                                 sample_size=sample_size, missing=missing)
+
+        return self
+
+    def flatten_tables(self, key, max_depth=None, sep='_'):
+        """
+        Flatten nested dicts into separate columns and split lists out into long tables, in
+        a single pass over the data.
+
+        Each list found, whether in a top level column or a nested dict, is removed from
+        this table and returned as a long table with a row per list item, along with the
+        ``key`` columns. Dicts within the lists are flattened too. Every key seen is
+        included, so no sampling is needed, but the tables are loaded into memory.
+
+        .. code-block:: python
+
+            tbl = Table([{'id': 1,
+                          'name': {'first': 'Jane'},
+                          'emails': [{'type': 'home', 'address': 'jane@mail.com'}]}])
+
+            emails = tbl.flatten_tables('id')['emails']
+
+            print(tbl)
+            >> {'id': 1, 'name_first': 'Jane'}
+            print(emails)
+            >> {'id': 1, 'emails_type': 'home', 'emails_address': 'jane@mail.com'}
+
+        `Args:`
+            key: str or list
+                The column or columns to include in each long table
+            max_depth: int
+                The number of levels of nested dicts to flatten. If ``None``, flattens all
+                levels.
+            sep: str
+                The separator used to join nested column names
+        `Returns:`
+            dict
+                The long Parsons Tables, keyed by the flattened name of the list column.
+                Also updates self to the flattened table.
+        """
+
+        from parsons.etl.table import Table
+        from parsons.etl.flatten import flatten_tables
+
+        if isinstance(key, str):
+            key = [key]
+
+        self.table, children = flatten_tables(self.table, key, max_depth=max_depth, sep=sep)
+
+        return {name: Table(child) for name, child in children.items()}
+
     def cut(self, *columns):
         """
         Return a table of selection of columns
@@ -660,17 +740,6 @@ class ETL(object):
 
         return self
 
-    def _prepend_dict(self, dict_obj, prepend):
-        # Internal method to rename dict keys
-
-        new_dict = {}
-
-        for k, v in dict_obj.items():
-
-            new_dict[prepend + '_' + k] = v
-
-        return new_dict
-
     def stack(self, *tables, missing=None):
         """
         Stack Parsons tables on top of one another.
@@ -742,8 +811,7 @@ class ETL(object):
                 Normalized column name
         """
 
-        column_name = column_name.lower().strip()
-        return ''.join(c for c in column_name if c.isalnum())
+        return normalize_column_name(column_name)
 
     def match_columns(self, desired_columns, fuzzy_match=True, if_extra_columns='remove',
                       if_missing_columns='add'):
@@ -771,65 +839,53 @@ class ETL(object):
             `Parsons Table` and also updates self
         """
 
-        from parsons import Table  # Just trying to avoid recursive imports.
-
-        normalize_fn = Table.get_normalized_column_name if fuzzy_match else (lambda s: s)
-
-        desired_columns_normalized = {
-            normalize_fn(col): col for col in desired_columns
-        }
-
-        # Check for extra columns in the Table.
-        for orig_col in self.columns:
-            normalized_col = normalize_fn(orig_col)
-            if normalized_col not in desired_columns_normalized:
+        if if_extra_columns not in ('remove', 'ignore', 'fail'):
+            raise TypeError(f"Invalid option {if_extra_columns} for "
+                            "argument `if_extra_columns`")
+        if if_missing_columns not in ('add', 'ignore', 'fail'):
+            raise TypeError(f"Invalid option {if_missing_columns} for "
+                            "argument `if_missing_columns`")
+
+        desired_columns = list(desired_columns)
+        columns = self.columns
+        matcher = ColumnMatcher(desired_columns, normalize=fuzzy_match)
+
+        # Resolve every column in one pass. The first column to match each desired column
+        # is used, and any later ones are extra columns.
+        matched = {}
+        extra = []
+        for index, (column, target) in enumerate(zip(columns, matcher.match_all(columns))):
+            if target is None or target in matched:
                 if if_extra_columns == 'fail':
-                    raise TypeError(f"Table has extra column {orig_col}")
-                elif if_extra_columns == 'remove':
-                    self.remove_column(orig_col)
-                elif if_extra_columns != 'ignore':
-                    raise TypeError(f"Invalid option {if_extra_columns} for "
-                                    "argument `if_extra_columns`")
+                    raise TypeError(f"Table has extra column {column}")
+                extra.append(index)
             else:
-                # We matched a desired column. Remove it from our list, so if there is another
-                # column in our Table that has the same normalized name, we consider it an
-                # extra column.
-                desired_columns_normalized.pop(normalized_col)
-
-        # Regenerate the desired columns normalized dict, since we removed any matches
-        # from it above.
-        # Note we reverse the desired columns here, to make reordering easier later.
-        # Cast desired_columns to a list in case someone gave us a dict or other iterable
-        # that can't be reversed.
-        desired_columns_normalized = {
-            normalize_fn(col): col for col in reversed(list(desired_columns))
-        }
-
-        tbl_columns_normalized = {
-            normalize_fn(col): col for col in self.columns
-        }
-
-        # Check for missing columns
-        for normalized_col, orig_col in desired_columns_normalized.items():
-            if normalized_col not in tbl_columns_normalized:
-                if if_missing_columns == 'fail':
-                    raise TypeError(f"Table is missing column {orig_col}")
-                elif if_missing_columns == 'add':
-                    self.add_column(orig_col)
-                    tbl_columns_normalized[normalized_col] = orig_col
-                elif if_missing_columns != 'ignore':
-                    raise TypeError(f"Invalid option {if_missing_columns} for "
-                                    "argument `if_missing_columns`")
-
-        # Change column ordering and names to match the desired columns
-        for desired_normalized_col, desired_orig_col in desired_columns_normalized.items():
-            # Note that we ignore any desired columns still not in the Table, given
-            # that we already checked what the caller wanted to do above.
-            if desired_normalized_col in tbl_columns_normalized:
-                tbl_orig_col = tbl_columns_normalized[desired_normalized_col]
-                if tbl_orig_col != desired_orig_col:
-                    self.rename_column(tbl_orig_col, desired_orig_col)
-                self.move_column(desired_orig_col, 0)
+                matched[target] = index
+
+        missing = [col for col in desired_columns if col not in matched]
+        if missing and if_missing_columns == 'fail':
+            raise TypeError(f"Table is missing column {missing[0]}")
+
+        # Build the new table with a single cut and header change, followed by the desired
+        # columns in order and then any extra columns that are kept
+        fields = [col for col in desired_columns
+                  if col in matched or if_missing_columns == 'add']
+        indexes = [matched[col] for col in fields if col in matched]
+        header = [col for col in fields if col in matched]
+        if if_extra_columns == 'ignore':
+            indexes += extra
+            header += [columns[i] for i in extra]
+
+        if indexes:
+            table = petl.setheader(petl.cut(self.table, *indexes), header)
+        else:
+            table = petl.cutout(self.table, *columns)
+
+        for position, col in enumerate(fields):
+            if col not in matched:
+                table = table.addfield(col, None, position)
+
+        self.table = table
 
         return self
 
@@ -896,18 +952,231 @@ class ETL(object):
                 should match the length of the list returned by the reduce
                 function.
             presorted: bool
-                If false, the row will be sorted.
+                If false, the rows will be sorted first with :meth:`sort`. Pass
+                ``buffersize`` and ``tempdir`` to control how much of the table is sorted
+                in memory.
         `Returns:`
             `Parsons Table` and also updates self
 
         """ # noqa: E501,E261
 
+        if not presorted:
+            self.sort(columns, buffersize=kwargs.pop('buffersize', None),
+                      tempdir=kwargs.pop('tempdir', None))
+
         self.table = petl.rowreduce(
             self.table,
             columns,
             reduce_func,
             header=headers,
-            presorted=presorted,
+            presorted=True,
             **kwargs)
 
         return self
+
+    def sort(self, columns=None, reverse=False, buffersize=None, tempdir=None):
+        """
+        Sort the rows of the table.
+
+        Uses an external merge sort, so large tables can be sorted without loading them
+        into memory. Rows are sorted in chunks of ``buffersize`` rows, and each sorted chunk
+        is written to a temporary file before the files are merged back together. The sort
+        is stable, so rows with equal keys keep their original order.
+
+        `Args:`
+            columns: str or list
+                The column or columns to sort by. If ``None``, sorts by all of the columns.
+            reverse: boolean
+                Sort in descending order
+            buffersize: int
+                The number of rows to hold in memory before spilling to disk. Defaults to
+                100,000.
+            tempdir: str
+                The directory to write temporary files to. Defaults to the system temp
+                directory.
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        from parsons.etl.external_sort import ExternalSortView
+
+        self.table = ExternalSortView(self.table, columns, reverse=reverse,
+                                      buffersize=buffersize, tempdir=tempdir)
+
+        return self
+
+    def join(self, right_table, left_on, right_on=None, buffersize=None, tempdir=None):
+        """
+        Inner join another table onto this table. Only rows with a match in both tables are
+        kept.
+
+        The right table is loaded into an in-memory hash table and this table is streamed
+        past it, so put the smaller table on the right. If the right table has more than
+        ``buffersize`` rows, a sort-merge join which spills to disk is used instead, and the
+        rows will be returned sorted by the join columns.
+
+        .. code-block:: python
+
+            voters = Table([{'id': 1, 'name': 'Jane'}, {'id': 2, 'name': 'Bob'}])
+            emails = Table([{'voter_id': 1, 'email': 'jane@mail.com'}])
+
+            voters.join(emails, 'id', right_on='voter_id')
+            >> {'id': 1, 'name': 'Jane', 'email': 'jane@mail.com'}
+
+        `Args:`
+            right_table: Parsons Table
+                The table to join
+            left_on: str or list
+                The column or columns in this table to join on
+            right_on: str or list
+                The column or columns in the right table to join on. If ``None``, defaults
+                to ``left_on``. These columns are not included in the output.
+            buffersize: int
+                The maximum number of rows to hold in memory before spilling to disk.
+                Defaults to 1,000,000.
+            tempdir: str
+                The directory to spill to. Defaults to the system temp directory.
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        return self._hash_join(right_table, left_on, right_on, 'inner', buffersize=buffersize,
+                               tempdir=tempdir)
+
+    def left_join(self, right_table, left_on, right_on=None, missing=None, buffersize=None,
+                  tempdir=None):
+        """
+        Left join another table onto this table. All rows in this table are kept, and rows
+        without a match are filled with the ``missing`` value.
+
+        See :meth:`join` for details on memory use.
+
+        `Args:`
+            right_table: Parsons Table
+                The table to join
+            left_on: str or list
+                The column or columns in this table to join on
+            right_on: str or list
+                The column or columns in the right table to join on. If ``None``, defaults
+                to ``left_on``. These columns are not included in the output.
+            missing:
+                The value to fill the right table's columns with when there is no match
+            buffersize: int
+                The maximum number of rows to hold in memory before spilling to disk.
+                Defaults to 1,000,000.
+            tempdir: str
+                The directory to spill to. Defaults to the system temp directory.
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        return self._hash_join(right_table, left_on, right_on, 'left', missing=missing,
+                               buffersize=buffersize, tempdir=tempdir)
+
+    def anti_join(self, right_table, left_on, right_on=None, buffersize=None, tempdir=None):
+        """
+        Keep only the rows in this table which do not have a match in another table.
+        No columns are added from the right table.
+
+        See :meth:`join` for details on memory use.
+
+        `Args:`
+            right_table: Parsons Table
+                The table to compare against
+            left_on: str or list
+                The column or columns in this table to join on
+            right_on: str or list
+                The column or columns in the right table to join on. If ``None``, defaults
+                to ``left_on``.
+            buffersize: int
+                The maximum number of rows to hold in memory before spilling to disk.
+                Defaults to 1,000,000.
+            tempdir: str
+                The directory to spill to. Defaults to the system temp directory.
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        return self._hash_join(right_table, left_on, right_on, 'anti', buffersize=buffersize,
+                               tempdir=tempdir)
+
+    def _hash_join(self, right_table, left_on, right_on, how, **kwargs):
+        # Internal method shared by the join methods
+
+        from parsons.etl.relational import HashJoinView, _as_list
+
+        left_on = _as_list(left_on)
+        right_on = _as_list(right_on) or left_on
+
+        if len(left_on) != len(right_on):
+            raise ValueError("left_on and right_on must have the same number of columns")
+
+        self.table = HashJoinView(self.table, right_table.table, left_on, right_on, how=how,
+                                  **kwargs)
+
+        return self
+
+    def deduplicate(self, keys=None, buffersize=None, tempdir=None):
+        """
+        Remove duplicate rows, keeping the first row for each key.
+
+        Rows are streamed in their original order, keeping the keys seen so far in memory.
+        Once more than ``buffersize`` distinct keys have been seen, the remaining rows are
+        deduplicated with a sort that spills to disk, and are returned sorted by key after
+        the rows already streamed.
+
+        `Args:`
+            keys: str or list
+                The column or columns which identify a duplicate. If ``None``, rows must
+                match on every column to be considered duplicates.
+            buffersize: int
+                The maximum number of keys to hold in memory before spilling to disk.
+                Defaults to 1,000,000.
+            tempdir: str
+                The directory to spill to. Defaults to the system temp directory.
+        `Returns:`
+            `Parsons Table` and also updates self
+        """
+
+        from parsons.etl.relational import HashDistinctView, _as_list
+
+        self.table = HashDistinctView(self.table, _as_list(keys), buffersize=buffersize,
+                                      tempdir=tempdir)
+
+        return self
+
+    def group_by(self, columns, buffersize=None, tempdir=None):
+        """
+        Group rows by one or more columns. Call ``agg()`` on the result to return a new
+        table with one row per group.
+
+        .. code-block:: python
+
+            tbl = Table([{'state': 'TX', 'age': 30},
+                         {'state': 'TX', 'age': 50},
+                         {'state': 'MA', 'age': 40}])
+
+            tbl.group_by('state').agg(count=('age', len), max_age=('age', max))
+            >> {'state': 'TX', 'count': 2, 'max_age': 50}
+            >> {'state': 'MA', 'count': 1, 'max_age': 40}
+
+        Groups are built in an in-memory hash table and returned in the order they were first
+        seen. If the table has more than ``buffersize`` groups, a sort-based group by which
+        spills to disk is used instead, and the groups will be returned sorted.
+
+        `Args:`
+            columns: str or list
+                The column or columns to group by
+            buffersize: int
+                The maximum number of groups to hold in memory before spilling to disk.
+                Defaults to 1,000,000.
+            tempdir: str
+                The directory to spill to. Defaults to the system temp directory.
+        `Returns:`
+            GroupBy
+                Call ``agg()`` on it to return a Parsons Table
+        """
+
+        from parsons.etl.relational import GroupBy, _as_list
+
+        return GroupBy(self, _as_list(columns), buffersize=buffersize, tempdir=tempdir)
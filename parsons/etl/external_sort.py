@@ -0,0 +1,131 @@
+"""
+An external merge sort for petl tables.
+
+Rows are read in chunks of ``buffersize`` rows. Each chunk is sorted in memory and,
+if the table doesn't fit in a single chunk, written to a temporary file as a sorted
+"run". The runs are stored as pickled batches of rows, which are far more compact and
+faster to read back than pickling one row at a time. The runs are then combined
+with a k-way heap merge, so only one batch per run is held in memory at a time.
+"""
+
+import heapq
+import itertools
+import logging
+import pickle
+import tempfile
+
+import petl
+from petl.comparison import comparable_itemgetter
+
+logger = logging.getLogger(__name__)
+
+# The number of rows pickled together in a run file
+RUN_BATCH_SIZE = 1000
+
+# The maximum number of runs merged at once. If there are more, runs are merged in
+# multiple passes to avoid running out of file handles.
+MERGE_FAN_IN = 128
+
+
+class ExternalSortView(petl.Table):
+    """
+    Sorts a petl table, holding at most ``buffersize`` rows in memory at a time.
+    The sort is stable, and ``None`` and mixed types are ordered the same way as
+    petl's own sort.
+
+    `Args:`
+        source: petl table
+        key: str or list
+            The column or columns to sort by. If ``None``, sorts by the entire row.
+        reverse: boolean
+            Sort in descending order
+        buffersize: int
+            The number of rows to sort in memory before spilling to disk. Defaults
+            to petl's ``sort_buffersize`` config.
+        tempdir: str
+            The directory to write sorted runs to. Defaults to the system temp directory.
+    """
+
+    def __init__(self, source, key=None, reverse=False, buffersize=None, tempdir=None):
+
+        self.source = source
+        self.key = [key] if isinstance(key, str) else key
+        self.reverse = reverse
+        self.buffersize = buffersize or petl.config.sort_buffersize
+        self.tempdir = tempdir
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = next(it)
+        yield tuple(hdr)
+
+        if self.key is None:
+            getkey = comparable_itemgetter(*range(len(hdr)))
+        else:
+            getkey = comparable_itemgetter(*[list(hdr).index(k) for k in self.key])
+
+        runs = []
+
+        try:
+            while True:
+                chunk = list(itertools.islice(it, self.buffersize))
+                chunk.sort(key=getkey, reverse=self.reverse)
+
+                # If the whole table fits in memory, we don't need to touch the disk
+                if not runs and len(chunk) < self.buffersize:
+                    yield from (tuple(row) for row in chunk)
+                    return
+
+                if chunk:
+                    runs.append(self._write_run(chunk))
+
+                if len(chunk) < self.buffersize:
+                    break
+
+            logger.debug(f'Merging {len(runs)} sorted runs.')
+
+            while len(runs) > MERGE_FAN_IN:
+                merged = []
+                for i in range(0, len(runs), MERGE_FAN_IN):
+                    group = runs[i:i + MERGE_FAN_IN]
+                    merged.append(self._write_run(self._merge(group, getkey)))
+                    for run in group:
+                        run.close()
+                runs = merged
+
+            yield from (tuple(row) for row in self._merge(runs, getkey))
+
+        finally:
+            for run in runs:
+                run.close()
+
+    def _write_run(self, rows):
+        # Write sorted rows to an anonymous temp file, which is deleted once closed
+
+        run = tempfile.TemporaryFile(dir=self.tempdir)
+        rows = iter(rows)
+
+        while True:
+            batch = list(itertools.islice(rows, RUN_BATCH_SIZE))
+            if not batch:
+                break
+            pickle.dump(batch, run, protocol=pickle.HIGHEST_PROTOCOL)
+
+        run.flush()
+        return run
+
+    def _merge(self, runs, getkey):
+
+        return heapq.merge(*[_read_run(run) for run in runs], key=getkey, reverse=self.reverse)
+
+
+def _read_run(run):
+
+    run.seek(0)
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
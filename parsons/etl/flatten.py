@@ -0,0 +1,333 @@
+"""
+Single pass views for flattening nested JSON-like values (dicts and lists) in a
+petl table. Used by the ``ETL`` mixin's ``flatten``, ``flatten_tables``,
+``long_table`` and ``unpack_dict`` methods.
+"""
+
+import itertools
+
+import petl
+
+
+def _flatten_value(value, path, depth, max_depth, out):
+    # Recursively walk nested dicts, adding each leaf value to the `out` dict keyed
+    # by its path, a tuple of the dict keys leading to it.
+
+    if isinstance(value, dict) and (max_depth is None or depth < max_depth):
+        for k, v in value.items():
+            _flatten_value(v, path + (k,), depth + 1, max_depth, out)
+    else:
+        out[path] = value
+
+
+def _column_name(column, path, sep):
+
+    return sep.join([str(column)] + [str(k) for k in path])
+
+
+class FlattenView(petl.Table):
+    """
+    Flattens nested dicts in every column of a petl table into their own columns,
+    named by joining the column name and the nested keys with ``sep``. New columns
+    take the place of the column they were unpacked from. Lists are left as is.
+
+    The columns are discovered from the first ``sample_size`` rows. If ``sample_size``
+    is ``None``, the whole table is scanned first, so no keys are missed.
+
+    `Args:`
+        source: petl table
+        max_depth: int
+            The number of levels of nested dicts to flatten. If ``None``, flattens all
+            levels.
+        sep: str
+            The separator used to join nested column names
+        sample_size: int
+            The number of rows to sample to discover the columns
+        missing:
+            The value to use when a row is missing a nested key
+    """
+
+    def __init__(self, source, max_depth=None, sep='_', sample_size=1000, missing=None):
+
+        self.source = source
+        self.max_depth = max_depth
+        self.sep = sep
+        self.sample_size = sample_size
+        self.missing = missing
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = next(it)
+
+        if self.sample_size is None:
+            schemas = self._discover(petl.data(self.source), len(hdr))
+        else:
+            sample = list(itertools.islice(it, self.sample_size))
+            schemas = self._discover(sample, len(hdr))
+            it = itertools.chain(sample, it)
+
+        outhdr = []
+        for column, paths in zip(hdr, schemas):
+            outhdr.extend(_column_name(column, path, self.sep) for path in paths)
+        yield tuple(outhdr)
+
+        for row in it:
+            outrow = []
+            for value, paths in zip(row, schemas):
+                # Most columns aren't nested, so skip the walk for them
+                if paths == [()]:
+                    outrow.append(value)
+                    continue
+                flat = {}
+                _flatten_value(value, (), 0, self.max_depth, flat)
+                outrow.extend(flat.get(path, self.missing) for path in paths)
+            yield tuple(outrow)
+
+    def _discover(self, rows, width):
+        # Returns a list of the ordered paths found in each column
+
+        schemas = [{} for _ in range(width)]
+
+        for row in rows:
+            for value, paths in zip(row, schemas):
+                if not isinstance(value, dict):
+                    if value is not None:
+                        paths[()] = None
+                    continue
+                flat = {}
+                _flatten_value(value, (), 0, self.max_depth, flat)
+                for path in flat:
+                    paths[path] = None
+
+        # Columns that were empty in the sample are kept as is
+        return [list(paths) or [()] for paths in schemas]
+
+
+class LongTableView(petl.Table):
+    """
+    Creates a long table from a column of lists, with one row per list item and the
+    key columns repeated. Values that aren't lists are treated as a list of one item,
+    and ``None`` items are dropped.
+
+    `Args:`
+        source: petl table
+        key: list
+            The columns to repeat on each row
+        column: str
+            The column of lists
+    """
+
+    def __init__(self, source, key, column):
+
+        self.source = source
+        self.key = key
+        self.column = column
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = list(next(it))
+        key_indexes = [hdr.index(k) for k in self.key]
+        col_index = hdr.index(self.column)
+        yield tuple(self.key) + (self.column,)
+
+        for row in it:
+            values = row[col_index]
+            if not isinstance(values, list):
+                values = [values]
+            key_values = tuple(row[i] for i in key_indexes)
+            for value in values:
+                if value is not None:
+                    yield key_values + (value,)
+
+
+class PrependHeaderView(petl.Table):
+    """
+    Prepends a value to every column name from position ``start`` onwards. Only the
+    header is touched, so this is much cheaper than renaming keys in each row.
+    """
+
+    def __init__(self, source, start, prepend, sep='_'):
+
+        self.source = source
+        self.start = start
+        self.prepend = prepend
+        self.sep = sep
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = list(next(it))
+        hdr[self.start:] = [f'{self.prepend}{self.sep}{c}' for c in hdr[self.start:]]
+        yield tuple(hdr)
+        yield from it
+
+
+class _TableBuilder(object):
+    # Collects rows as (column, value) pairs, growing the header as new columns are seen
+
+    def __init__(self, header=()):
+
+        self.header = list(header)
+        self.index = {c: i for i, c in enumerate(self.header)}
+        self.rows = []
+
+    def append(self, items):
+
+        row = [None] * len(self.header)
+        for column, value in items:
+            i = self.index.get(column)
+            if i is None:
+                i = self.index[column] = len(self.header)
+                self.header.append(column)
+                row.append(None)
+            row[i] = value
+        self.rows.append(row)
+
+    def to_petl(self):
+
+        width = len(self.header)
+        return petl.wrap([self.header] + [row + [None] * (width - len(row)) for row in self.rows])
+
+
+def flatten_tables(source, key, max_depth=None, sep='_'):
+    """
+    Flattens a petl table in a single pass, splitting every list found (at any depth of
+    nested dicts) out into a long child table keyed on the ``key`` columns. Dicts inside
+    the lists are flattened too. The columns of each table are the union of all the keys
+    seen, so no sampling is needed.
+
+    `Args:`
+        source: petl table
+        key: list
+            The columns to include in each child table
+        max_depth: int
+            The number of levels of nested dicts to flatten. If ``None``, flattens all
+            levels.
+        sep: str
+            The separator used to join nested column names
+    `Returns:`
+        tuple
+            The flattened petl table and a dict of child petl tables, keyed by the
+            flattened name of the list column
+    """
+
+    it = iter(source)
+    hdr = list(next(it))
+    key_indexes = [hdr.index(k) for k in key]
+
+    parent = _TableBuilder()
+    children = {}
+
+    for row in it:
+        key_items = [(k, row[i]) for k, i in zip(key, key_indexes)]
+        parent_items = []
+
+        for column, value in zip(hdr, row):
+            flat = {}
+            _flatten_value(value, (), 0, max_depth, flat)
+
+            for path, leaf in flat.items():
+                name = _column_name(column, path, sep)
+
+                if not isinstance(leaf, list):
+                    # A null where other rows have a nested dict shouldn't add a column
+                    if leaf is not None or path:
+                        parent_items.append((name, leaf))
+                    continue
+
+                child = children.get(name)
+                if child is None:
+                    child = children[name] = _TableBuilder(key)
+
+                for item in leaf:
+                    if item is None:
+                        continue
+                    item_flat = {}
+                    _flatten_value(item, (), 0, max_depth, item_flat)
+                    child.append(key_items + [(_column_name(name, p, sep), v)
+                                              for p, v in item_flat.items()])
+
+        parent.append(parent_items)
+
+    # Keep any columns which only ever held nulls
+    for column in hdr:
+        if column not in parent.index and column not in children and not any(
+                c.startswith(f'{column}{sep}') for c in parent.header + list(children)):
+            parent.index[column] = len(parent.header)
+            parent.header.append(column)
+
+    return parent.to_petl(), {name: child.to_petl() for name, child in children.items()}
+
+
+class NestedRowsView(petl.Table):
+    """
+    Unpacks the list or dict values in a column into separate rows, in a single pass.
+    Each new row gets a ``uid`` made up of its parent's key and the position of the value
+    within the parent (eg. ``'15_2'``), which is cheap to build and stable across runs.
+
+    Dict values produce a row per key, list values a row per item and other values a
+    single row. ``None`` values are dropped.
+
+    `Args:`
+        source: petl table
+        column: str
+            The column to unpack
+        key: str
+            The column identifying the parent row. If it isn't in the table, the row
+            number is used. When expanding, an existing ``uid`` column is used instead.
+        expand_original: boolean
+            If ``True``, keep all of the columns and pass through rows which don't hold a
+            list or dict. Otherwise keep only the ``key`` column.
+    """
+
+    def __init__(self, source, column, key='id', expand_original=False):
+
+        self.source = source
+        self.column = column
+        self.key = key
+        self.expand_original = expand_original
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = list(next(it))
+        col_index = hdr.index(self.column)
+
+        if self.expand_original and 'uid' in hdr:
+            key_index = hdr.index('uid')
+        elif self.key in hdr:
+            key_index = hdr.index(self.key)
+        else:
+            key_index = None
+
+        if self.expand_original:
+            keep_indexes = [i for i, c in enumerate(hdr) if c not in ('uid', self.column)]
+            yield (('uid',) + tuple(hdr[i] for i in keep_indexes)
+                   + (self.column, f'{self.column}_value'))
+        else:
+            keep_indexes = [key_index] if key_index is not None else []
+            yield ('uid',) + tuple(hdr[i] for i in keep_indexes) + (self.column, 'value')
+
+        for row_number, row in enumerate(it):
+            parent = row[key_index] if key_index is not None else row_number
+            kept = tuple(row[i] for i in keep_indexes)
+            value = row[col_index]
+
+            if isinstance(value, dict):
+                items = value.items()
+            elif isinstance(value, list):
+                items = ((str(i), v) for i, v in enumerate(value))
+            elif self.expand_original:
+                # Pass through rows which don't hold nested values
+                yield (f'{parent}_0',) + kept + (value, None)
+                continue
+            else:
+                items = [('0', value)]
+
+            ordinal = 0
+            for variable, item in items:
+                if item is not None:
+                    yield (f'{parent}_{ordinal}',) + kept + (variable, item)
+                    ordinal += 1
@@ -0,0 +1,168 @@
+"""
+Streaming readers for JSON files, used by ``Table.from_json``.
+
+Unlike ``petl.fromjson``, which loads the whole file with ``json.load``, these read
+the file in chunks and parse one row at a time, so memory use doesn't grow with the
+size of the file.
+"""
+
+import io
+import json
+import re
+
+import petl
+from petl.io.json import iterdicts
+
+# orjson is an optional dependency, which parses JSON several times faster than the
+# standard library.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# The number of characters read from the file at a time when parsing a JSON array
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(file, chunk_size=None):
+    """
+    Incrementally parse a text file holding a top level JSON array, yielding each item
+    as soon as it has been read.
+
+    `Args:`
+        file: file object
+            A file open in text mode
+        chunk_size: int
+            The number of characters to read at a time. Defaults to 1MB.
+    `Returns:`
+        generator
+            The items in the array
+    """
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    retry = False
+    started = False
+    empty = True
+
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+
+        if pos >= len(buf) or retry:
+            if eof:
+                raise ValueError('Unexpected end of file while reading JSON array')
+            # Read at least as much again as is buffered, so items larger than the chunk
+            # size don't get parsed over and over.
+            more = file.read(max(chunk_size, len(buf) - pos))
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            retry = False
+            continue
+
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError('JSON file is not an array')
+            pos += 1
+            started = True
+            continue
+
+        if empty and buf[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # The item is probably split across chunks
+            if eof:
+                raise
+            retry = True
+            continue
+
+        # Make sure the item is followed by a separator, since a number at the end of the
+        # buffer may continue in the next chunk.
+        end = _WHITESPACE.match(buf, end).end()
+        separator = buf[end] if end < len(buf) else None
+
+        if separator == ',':
+            yield item
+            pos = end + 1
+            empty = False
+        elif separator == ']':
+            yield item
+            return
+        elif not eof:
+            retry = True
+        elif separator is None:
+            raise ValueError('Unexpected end of file while reading JSON array')
+        else:
+            raise ValueError(f'Expected "," in JSON array, found "{separator}"')
+
+
+def iter_ndjson(file):
+    """
+    Parse a binary file holding line-delimited JSON, yielding each line's value. Blank
+    lines are skipped.
+
+    `Args:`
+        file: file object
+            A file open in binary mode
+    `Returns:`
+        generator
+    """
+
+    for line in file:
+        line = line.strip()
+        if line:
+            yield _loads(line)
+
+
+class JsonView(petl.Table):
+    """
+    A lazy petl table over a JSON file holding either an array of objects or
+    line-delimited objects. Gzip and bz2 files are decompressed based on their suffix.
+
+    `Args:`
+        source: str or petl source
+            The path, url or petl source of the file
+        header: list
+            The columns of the table. If ``None``, discovered from the first
+            ``sample_size`` rows.
+        line_delimited: bool
+            Whether the file is line-delimited JSON
+        sample_size: int
+            The number of rows to sample to discover the columns
+        missing:
+            The value to use for columns missing from a row
+    """
+
+    def __init__(self, source, header=None, line_delimited=False, sample_size=1000,
+                 missing=None):
+
+        self.source = petl.io.sources.read_source_from_arg(source)
+        self._header = header
+        self.line_delimited = line_delimited
+        self.sample_size = sample_size
+        self.missing = missing
+
+    def __iter__(self):
+
+        with self.source.open('rb') as file:
+            if self.line_delimited:
+                yield from iterdicts(iter_ndjson(file), self._header, self.sample_size,
+                                     self.missing)
+                return
+
+            text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+            try:
+                yield from iterdicts(iter_json_array(text), self._header, self.sample_size,
+                                     self.missing)
+            finally:
+                # Leave closing the file to the source
+                text.detach()
@@ -0,0 +1,46 @@
+"""
+Streaming writer for JSON files, used by ``Table.to_json``.
+
+Unlike ``petl.tojson``, which reads the whole table into memory first, this writes a row
+at a time.
+"""
+
+import json
+
+import petl
+
+
+def write_json(table, file, line_delimited=False):
+    """
+    Write a petl table to a text file as a JSON array of objects, or as line-delimited
+    JSON.
+
+    `Args:`
+        table: petl table
+            The table to write
+        file: file object
+            A file open in text mode
+        line_delimited: bool
+            Whether to write line-delimited JSON (with a row on each line), or a proper
+            JSON array
+    `Returns:`
+        int
+            The number of rows written
+    """
+
+    if not line_delimited:
+        file.write('[')
+
+    i = 0
+    for row in petl.dicts(table):
+        if i:
+            if not line_delimited:
+                file.write(',')
+            file.write('\n')
+        i += 1
+        json.dump(row, file)
+
+    if not line_delimited:
+        file.write(']')
+
+    return i
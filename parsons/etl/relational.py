@@ -0,0 +1,337 @@
+"""
+Hash-based join, dedupe and group by views used by the ``ETL`` mixin.
+
+Each view tries to do its work with an in-memory hash table first. If the
+data held in memory grows past ``buffersize`` rows, the view falls back to
+a sort-based strategy which spills to disk, so memory use stays bounded no
+matter the size of the table.
+"""
+
+import itertools
+import logging
+import operator
+from collections import OrderedDict
+
+import petl
+
+from parsons.etl.external_sort import ExternalSortView
+
+logger = logging.getLogger(__name__)
+
+# The default number of rows that may be held in memory by a hash join, dedupe or
+# group by before falling back to a sort-based strategy that spills to disk.
+HASH_BUFFERSIZE = 1000000
+
+
+def _as_list(columns):
+
+    if columns is None:
+        return None
+
+    if isinstance(columns, str):
+        return [columns]
+
+    return list(columns)
+
+
+def _key_getter(header, columns):
+    # Returns a function which extracts a hashable key from a row
+
+    if columns is None:
+        return tuple
+
+    indexes = [list(header).index(c) for c in columns]
+    if len(indexes) == 1:
+        return operator.itemgetter(indexes[0])
+
+    return operator.itemgetter(*indexes)
+
+
+class _IteratorView(petl.Table):
+    # A single use petl table over a header and an iterator of rows. Used to hand the
+    # rows that remain after a hash strategy overflows to a sort-based fallback.
+
+    def __init__(self, header, rows):
+        self._header = tuple(header)
+        self.rows = rows
+
+    def __iter__(self):
+        yield self._header
+        for row in self.rows:
+            yield tuple(row)
+
+
+class HashJoinView(petl.Table):
+    """
+    Joins two petl tables by building a hash table on the right table and streaming
+    the left table past it. Rows are returned in the order of the left table.
+
+    If the right table has more than ``buffersize`` rows, falls back to a sort-merge
+    join, sorting both tables with an external sort which spills to disk.
+
+    `Args:`
+        left: petl table
+        right: petl table
+        left_on: list
+            The join columns in the left table
+        right_on: list
+            The join columns in the right table
+        how: str
+            One of ``inner``, ``left`` or ``anti``
+        missing:
+            The value to fill non-matched right columns with for ``left`` joins
+        buffersize: int
+            The maximum number of rows to hold in memory
+        tempdir: str
+            The directory to spill to, if needed
+    """
+
+    def __init__(self, left, right, left_on, right_on, how='inner', missing=None,
+                 buffersize=None, tempdir=None):
+
+        self.left = left
+        self.right = right
+        self.left_on = left_on
+        self.right_on = right_on
+        self.how = how
+        self.missing = missing
+        self.buffersize = buffersize or HASH_BUFFERSIZE
+        self.tempdir = tempdir
+
+    def __iter__(self):
+
+        rit = iter(self.right)
+        rhdr = next(rit)
+        rgetkey = _key_getter(rhdr, self.right_on)
+        rkeyind = [list(rhdr).index(c) for c in self.right_on]
+        rvalind = [i for i in range(len(rhdr)) if i not in rkeyind]
+
+        # An anti join only needs the right keys, everything else needs the rows
+        lookup = set() if self.how == 'anti' else {}
+        count = 0
+
+        for row in rit:
+            count += 1
+            if count > self.buffersize:
+                logger.debug(f'Right table exceeds {self.buffersize} rows. Using sort-merge join.')
+                yield from self._sort_merge_join()
+                return
+
+            key = rgetkey(row)
+            if self.how == 'anti':
+                lookup.add(key)
+            else:
+                lookup.setdefault(key, []).append(tuple(row[i] for i in rvalind))
+
+        lit = iter(self.left)
+        lhdr = next(lit)
+        lgetkey = _key_getter(lhdr, self.left_on)
+
+        if self.how == 'anti':
+            yield tuple(lhdr)
+            for row in lit:
+                if lgetkey(row) not in lookup:
+                    yield tuple(row)
+            return
+
+        yield tuple(lhdr) + tuple(rhdr[i] for i in rvalind)
+
+        no_match = [tuple([self.missing] * len(rvalind))]
+        for row in lit:
+            matches = lookup.get(lgetkey(row))
+            if matches is None:
+                if self.how != 'left':
+                    continue
+                matches = no_match
+            for match in matches:
+                yield tuple(row) + match
+
+    def _sort_merge_join(self):
+
+        left = ExternalSortView(self.left, self.left_on, buffersize=self.buffersize,
+                                tempdir=self.tempdir)
+        right = ExternalSortView(self.right, self.right_on, buffersize=self.buffersize,
+                                 tempdir=self.tempdir)
+        kwargs = dict(lkey=self.left_on, rkey=self.right_on, presorted=True)
+
+        if self.how == 'anti':
+            return iter(petl.antijoin(left, right, **kwargs))
+        elif self.how == 'left':
+            return iter(petl.leftjoin(left, right, missing=self.missing, **kwargs))
+        else:
+            return iter(petl.join(left, right, **kwargs))
+
+
+class HashDistinctView(petl.Table):
+    """
+    Removes duplicate rows from a petl table, keeping the first row for each key.
+    Rows are streamed in their original order.
+
+    Once more than ``buffersize`` distinct keys have been seen, the remaining rows
+    which don't match an already seen key are deduplicated with a sort that spills
+    to disk, and are returned sorted by key after the streamed rows.
+
+    `Args:`
+        source: petl table
+        keys: list
+            The columns which identify a duplicate. If ``None``, the entire row is used.
+        buffersize: int
+            The maximum number of keys to hold in memory
+        tempdir: str
+            The directory to spill to, if needed
+    """
+
+    def __init__(self, source, keys=None, buffersize=None, tempdir=None):
+
+        self.source = source
+        self.keys = keys
+        self.buffersize = buffersize or HASH_BUFFERSIZE
+        self.tempdir = tempdir
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = next(it)
+        getkey = _key_getter(hdr, self.keys)
+        yield tuple(hdr)
+
+        seen = set()
+
+        for row in it:
+            key = getkey(row)
+            if key in seen:
+                continue
+
+            if len(seen) >= self.buffersize:
+                logger.debug(f'More than {self.buffersize} distinct keys. Spilling to disk.')
+                rest = (r for r in itertools.chain([row], it) if getkey(r) not in seen)
+                spilled = ExternalSortView(_IteratorView(hdr, rest), self.keys,
+                                           buffersize=self.buffersize, tempdir=self.tempdir)
+                spilled = petl.distinct(spilled, key=self.keys, presorted=True)
+                yield from petl.data(spilled)
+                return
+
+            seen.add(key)
+            yield tuple(row)
+
+
+class HashAggregateView(petl.Table):
+    """
+    Groups the rows of a petl table by one or more columns and aggregates each group,
+    returning one row per group in the order the groups were first seen.
+
+    If the table has more than ``buffersize`` distinct groups, falls back to a
+    sort-based aggregation using an external sort, which spills to disk and returns the
+    groups sorted by key. A table with few groups is always aggregated in memory, however
+    many rows it has, though the values passed to the aggregation functions are held in
+    memory until the table has been read.
+
+    `Args:`
+        source: petl table
+        keys: list
+            The columns to group by
+        aggregation: dict
+            A dict of ``{'new_column': ('source_column', function)}``, where the function
+            takes a list of the group's values for the source column
+        buffersize: int
+            The maximum number of groups to hold in memory
+        tempdir: str
+            The directory to spill to, if needed
+    """
+
+    def __init__(self, source, keys, aggregation, buffersize=None, tempdir=None):
+
+        self.source = source
+        self.keys = keys
+        self.aggregation = aggregation
+        self.buffersize = buffersize or HASH_BUFFERSIZE
+        self.tempdir = tempdir
+
+    def __iter__(self):
+
+        it = iter(self.source)
+        hdr = list(next(it))
+        getkey = _key_getter(hdr, self.keys)
+        value_indexes = [hdr.index(col) for col, _ in self.aggregation.values()]
+
+        groups = OrderedDict()
+
+        for row in it:
+            key = getkey(row)
+            values = groups.get(key)
+            if values is None:
+                if len(groups) >= self.buffersize:
+                    logger.debug(f'Table has more than {self.buffersize} groups. Using '
+                                 f'sort-based group by.')
+                    groups = None
+                    source = ExternalSortView(self.source, self.keys,
+                                              buffersize=self.buffersize, tempdir=self.tempdir)
+                    yield from petl.aggregate(source, self._petl_key(),
+                                              self._petl_aggregation(), presorted=True)
+                    return
+                values = groups[key] = [[] for _ in value_indexes]
+            for lst, i in zip(values, value_indexes):
+                lst.append(row[i])
+
+        yield tuple(self.keys) + tuple(self.aggregation.keys())
+
+        funcs = [func for _, func in self.aggregation.values()]
+        for key, values in groups.items():
+            key = key if len(self.keys) > 1 else (key,)
+            yield tuple(key) + tuple(func(lst) for func, lst in zip(funcs, values))
+
+    def _petl_key(self):
+
+        return self.keys[0] if len(self.keys) == 1 else tuple(self.keys)
+
+    def _petl_aggregation(self):
+        # petl passes a generator of values to the aggregation functions, so wrap them to
+        # receive a list, as they do on the hash path.
+
+        return OrderedDict(
+            (column, (source, lambda values, func=func: func(list(values))))
+            for column, (source, func) in self.aggregation.items())
+
+
+class GroupBy(object):
+    """
+    A Parsons Table grouped by one or more columns. Created by
+    :meth:`~parsons.etl.etl.ETL.group_by`; call ``agg()`` to return the aggregated
+    Parsons Table.
+    """
+
+    def __init__(self, tbl, keys, buffersize=None, tempdir=None):
+
+        self.tbl = tbl
+        self.keys = keys
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+
+    def agg(self, **aggregations):
+        """
+        Aggregate each group into a single row.
+
+        .. code-block:: python
+
+            tbl.group_by('state').agg(voters=('id', len), max_age=('age', max))
+
+        `Args:`
+            \**aggregations: tuple
+                The new column names, each mapped to a tuple of the source column and a
+                function which takes a list of the group's values. If only a source
+                column is given, the values are returned as a list.
+        `Returns:`
+            Parsons Table
+                One row per group, with the group columns followed by the new columns
+        """  # noqa: W605
+
+        from parsons.etl.table import Table
+
+        aggregation = OrderedDict()
+        for column, agg in aggregations.items():
+            if isinstance(agg, str):
+                agg = (agg, list)
+            aggregation[column] = tuple(agg)
+
+        return Table(HashAggregateView(self.tbl.table, self.keys, aggregation,
+                                       buffersize=self.buffersize, tempdir=self.tempdir))
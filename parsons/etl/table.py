@@ -145,7 +145,9 @@ class Table(ETL, ToFrom):
             bool
         """
 
-        if not self.table:
+        # Compare against None, since the truthiness of a petl table is its length, and
+        # counting the rows would load the whole table.
+        if self.table is None:
             return False
 
         try:
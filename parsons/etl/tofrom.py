@@ -1,8 +1,21 @@
 import petl
-import json
 import io
-import gzip
+import logging
+import re
+from parsons.etl.avro_writer import write_avro
+from parsons.etl.csv_writer import write_csv
+from parsons.etl.json_writer import write_json
 from parsons.utilities import files, zip_archive
+from parsons.utilities.compression import (COMPRESSION_TYPES, ParallelCompressedSource,
+                                           open_compressed)
+
+logger = logging.getLogger(__name__)
+
+_SELECT_SQL = re.compile(r'^\s*(select|with)\b', re.IGNORECASE)
+
+# UNLOAD doesn't allow a LIMIT in the outer SELECT. Queries with a LIMIT anywhere are
+# fetched through the leader node, rather than parsing out the outer one.
+_LIMIT_SQL = re.compile(r'\blimit\b', re.IGNORECASE)
 
 
 class ToFrom(object):
@@ -95,12 +108,15 @@ class ToFrom(object):
 
         `Args:`
             local_path: str
-                The path to write the csv locally. If it ends in ".gz" or ".zip", the file will be
-                compressed. If not specified, a temporary file will be created and returned,
-                and that file will be removed automatically when the script is done running.
+                The path to write the csv locally. If it ends in ".gz", ".bz2", ".zst" or ".zip",
+                the file will be compressed. If not specified, a temporary file will be created
+                and returned, and that file will be removed automatically when the script is
+                done running.
             temp_file_compression: str
                 If a temp file is requested (ie. no ``local_path`` is specified), the compression
-                type for that file. Currently "None", "gzip" or "zip" are supported.
+                type for that file. Currently "None", "gzip", "bzip2", "zstd" or "zip" are
+                supported. "gzip", "bzip2" and "zstd" files are compressed in blocks on
+                multiple threads. "zstd" requires the ``zstandard`` package.
                 If a ``local_path`` is specified, this argument is ignored.
             encoding: str
                 The CSV encoding type for `csv.writer()
@@ -113,7 +129,8 @@ class ToFrom(object):
                 If ``zip`` compression (either specified or inferred), the name of csv file
                 within the archive.
             \**csvargs: kwargs
-                ``csv_writer`` optional arguments
+                ``csv_writer`` optional arguments. If none are given, the table is written
+                with a faster batch writer for the default CSV dialect.
 
         `Returns:`
             str
@@ -133,16 +150,35 @@ class ToFrom(object):
             suffix = '.csv' + files.suffix_for_compression_type(temp_file_compression)
             local_path = files.create_temp_file(suffix=suffix)
 
-        # Create normal csv/.gzip
-        petl.tocsv(self.table,
-                   source=local_path,
-                   encoding=encoding,
-                   errors=errors,
-                   write_header=write_header,
-                   **csvargs)
+        self._write_csv(self._csv_write_source(local_path), encoding=encoding, errors=errors,
+                        write_header=write_header, **csvargs)
 
         return local_path
 
+    def _write_csv(self, source, encoding=None, errors='strict', write_header=True, **csvargs):
+
+        # The batch writer only supports the default dialect
+        if csvargs:
+            petl.tocsv(self.table,
+                       source=source,
+                       encoding=encoding,
+                       errors=errors,
+                       write_header=write_header,
+                       **csvargs)
+        else:
+            with source.open('wb') as file:
+                write_csv(self.table, file, encoding=encoding, errors=errors,
+                          write_header=write_header)
+
+    def _csv_write_source(self, local_path):
+        # Compress on multiple threads, rather than with petl's single threaded gzip/bz2 sources
+
+        compression = files.compression_type_for_path(local_path)
+        if compression in COMPRESSION_TYPES:
+            return ParallelCompressedSource(local_path, compression)
+
+        return petl.io.sources.write_source_from_arg(local_path)
+
     def append_csv(self, local_path, encoding=None, errors='strict', **csvargs):
         """
         Appends table to an existing CSV.
@@ -168,15 +204,24 @@ class ToFrom(object):
                 The path of the file
         """  # noqa: W605
 
-        petl.appendcsv(self.table,
-                       source=local_path,
-                       encoding=encoding,
-                       errors=errors,
-                       **csvargs)
+        source = self._csv_write_source(local_path)
+
+        if csvargs:
+            petl.appendcsv(self.table,
+                           source=source,
+                           encoding=encoding,
+                           errors=errors,
+                           **csvargs)
+        else:
+            with source.open('ab') as file:
+                write_csv(self.table, file, encoding=encoding, errors=errors,
+                          write_header=False)
+
         return local_path
 
     def to_zip_csv(self, archive_path=None, csv_name=None, encoding=None,
-                   errors='strict', write_header=True, if_exists='replace', **csvargs):
+                   errors='strict', write_header=True, if_exists='replace',
+                   compression_level=None, zip64=True, **csvargs):
         """
         Outputs table to a CSV in a zip archive. Additional key word arguments are passed to
         ``csv.writer()``. So, e.g., to override the delimiter from the default CSV dialect,
@@ -203,6 +248,13 @@ class ToFrom(object):
                 Include header in output
             if_exists: str
                 If archive already exists, one of 'replace' or 'append'
+            compression_level: int
+                The deflate compression level of the csv, from 0 to 9. If ``None``, the csv
+                is stored uncompressed.
+            zip64: boolean
+                Write ZIP64 headers, which are required if the csv is larger than 2GB. Only
+                set to ``False`` if the csv is known to be small and the archive must be
+                read by a tool without ZIP64 support.
             \**csvargs: kwargs
                 ``csv_writer`` optional arguments
 
@@ -214,13 +266,17 @@ class ToFrom(object):
         if not archive_path:
             archive_path = files.create_temp_file(suffix='.zip')
 
-        cf = self.to_csv(encoding=encoding, errors=errors, write_header=write_header, **csvargs)
-
         if not csv_name:
             csv_name = files.extract_file_name(archive_path, include_suffix=False) + '.csv'
 
-        return zip_archive.create_archive(archive_path, cf, file_name=csv_name,
-                                          if_exists=if_exists)
+        # Stream the rows straight into the archive, rather than writing a csv and copying it
+        with zip_archive.open_archive(archive_path, if_exists=if_exists,
+                                      compression_level=compression_level) as archive:
+            source = zip_archive.ZipEntrySource(archive, csv_name, zip64=zip64)
+            self._write_csv(source, encoding=encoding, errors=errors,
+                            write_header=write_header, **csvargs)
+
+        return archive_path
 
     def to_json(self, local_path=None, temp_file_compression=None, line_delimited=False):
         """
@@ -232,12 +288,14 @@ class ToFrom(object):
 
         `Args:`
             local_path: str
-                The path to write the JSON locally. If it ends in ".gz", it will be
-                compressed first. If not specified, a temporary file will be created and returned,
-                and that file will be removed automatically when the script is done running.
+                The path to write the JSON locally. If it ends in ".gz", ".bz2" or ".zst", it will
+                be compressed first. If not specified, a temporary file will be created and
+                returned, and that file will be removed automatically when the script is done
+                running.
             temp_file_compression: str
                 If a temp file is requested (ie. no ``local_path`` is specified), the compression
-                type for that file. Currently "None" and "gzip" are supported.
+                type for that file. Currently "None", "gzip", "bzip2" and "zstd" are supported,
+                and are compressed in blocks on multiple threads.
                 If a ``local_path`` is specified, this argument is ignored.
             line_delimited: bool
                 Whether the file will be line-delimited JSON (with a row on each line), or a proper
@@ -255,28 +313,46 @@ class ToFrom(object):
         # Note we don't use the much simpler petl.tojson(), since that method reads the whole
         # table into memory before writing to file.
 
-        if files.is_gzip_path(local_path):
-            open_fn = gzip.open
-            mode = 'w+t'
+        compression = files.compression_type_for_path(local_path)
+        if compression in COMPRESSION_TYPES:
+            file = open_compressed(local_path, compression)
         else:
-            open_fn = open
-            mode = 'w'
+            file = open(local_path, 'w')
+
+        with file:
+            write_json(self.table, file, line_delimited=line_delimited)
+
+        return local_path
 
-        with open_fn(local_path, mode) as file:
-            if not line_delimited:
-                file.write('[')
+    def to_avro(self, local_path=None, schema=None):
+        """
+        Outputs table to an Avro file, with a schema built from the Python types in each
+        column. Dicts and lists are written as JSON strings, and decimals with the
+        ``decimal`` logical type.
 
-            i = 0
-            for row in self:
-                if i:
-                    if not line_delimited:
-                        file.write(',')
-                    file.write('\n')
-                i += 1
-                json.dump(row, file)
+        .. warning::
+                If a file already exists at the given location, it will be
+                overwritten.
 
-            if not line_delimited:
-                file.write(']')
+        `Args:`
+            local_path: str
+                The path to write the Avro file locally. If not specified, a temporary file
+                will be created and returned, and that file will be removed automatically
+                when the script is done running.
+            schema: dict
+                The Avro record schema, with one nullable field per column. If not
+                specified, it is built from the types in the first 1,000 rows.
+
+        `Returns:`
+            str
+                The path of the new file
+        """
+
+        if not local_path:
+            local_path = files.create_temp_file(suffix='.avro')
+
+        with open(local_path, 'wb') as file:
+            write_avro(self.table, file, schema=schema)
 
         return local_path
 
@@ -297,7 +373,9 @@ class ToFrom(object):
 
         `Args:`
             remote_path: str
-                The remote path of the file. If it ends in '.gz', the file will be compressed.
+                The remote path of the file. If it ends in '.gz', '.bz2', '.zst' or '.zip',
+                the file will be compressed. Apart from zip archives, which are written to a
+                temp file first, the CSV is streamed to the server as it is written.
             host: str
                 The remote host
             username: str
@@ -317,15 +395,16 @@ class ToFrom(object):
                 ``csv_writer`` optional arguments
         """  # noqa: W605
 
-        from parsons import SFTP
-        sftp = SFTP(host, username, password, port)
-
-        compression = files.compression_type_for_path(remote_path)
+        from parsons.sftp.sftp import SFTP, SFTPFileSource
 
-        local_path = self.to_csv(
-            temp_file_compression=compression, encoding=encoding, errors=errors,
-            write_header=write_header, **csvargs)
-        sftp.put_file(local_path, remote_path)
+        with SFTP(host, username, password, port) as sftp:
+            if files.compression_type_for_path(remote_path) == 'zip':
+                local_path = self.to_csv(temp_file_compression='zip', encoding=encoding,
+                                         errors=errors, write_header=write_header, **csvargs)
+                sftp.put_file(local_path, remote_path)
+            else:
+                self._write_csv(SFTPFileSource(sftp, remote_path), encoding=encoding,
+                                errors=errors, write_header=write_header, **csvargs)
 
     def to_s3_csv(self, bucket, key, aws_access_key_id=None,
                   aws_secret_access_key=None, compression=None, encoding=None,
@@ -338,15 +417,15 @@ class ToFrom(object):
             bucket: str
                 The s3 bucket to upload to
             key: str
-                The s3 key to name the file. If it ends in '.gz' or '.zip', the file will be
-                compressed.
+                The s3 key to name the file. If it ends in '.gz', '.bz2', '.zst' or '.zip', the
+                file will be compressed.
             aws_access_key_id: str
                 Required if not included as environmental variable
             aws_secret_access_key: str
                 Required if not included as environmental variable
             compression: str
-                The compression type for the s3 object. Currently "None", "zip" and "gzip" are
-                supported. If specified, will override the key suffix.
+                The compression type for the s3 object. Currently "None", "zip", "gzip", "bzip2"
+                and "zstd" are supported. If specified, will override the key suffix.
             encoding: str
                 The CSV encoding type for `csv.writer()
                 <https://docs.python.org/2/library/csv.html#csv.writer/>`_
@@ -384,6 +463,9 @@ class ToFrom(object):
                      aws_secret_access_key=aws_secret_access_key)
         self.s3.put_file(bucket, key, local_path, acl=acl)
 
+        # Free up the disk space now, rather than at the end of the script
+        files.close_temp_file(local_path)
+
         if public_url:
             return self.s3.get_url(bucket, key, expires_in=public_url_expires)
         else:
@@ -427,8 +509,9 @@ class ToFrom(object):
                  sortkey1=None, sortkey2=None, wait=True, **civisargs):
         """
         Write the table to a Civis Redshift cluster. Additional key word
-        arguments can passed to `civis.io.dataframe_to_civis()
-        <https://civis-python.readthedocs.io/en/v1.9.0/generated/civis.io.dataframe_to_civis.html#civis.io.dataframe_to_civis>`_ # noqa: E501
+        arguments can passed to :meth:`parsons.CivisClient.table_import`, eg. ``part_rows``
+        and ``max_workers``, or to `civis.io.civis_file_to_table()
+        <https://civis-python.readthedocs.io/en/stable/generated/civis.io.civis_file_to_table.html>`_ # noqa: E501
 
         `Args`
             table: str
@@ -463,9 +546,9 @@ class ToFrom(object):
         from parsons.civis.civisclient import CivisClient
         civis = CivisClient(db=db, api_key=api_key)
         return civis.table_import(
-            self, table, max_errors=None,
-            existing_table_rows=existing_table_rows, diststyle=None,
-            distkey=None, sortkey1=None, sortkey2=None, wait=True, **civisargs)
+            self, table, max_errors=max_errors,
+            existing_table_rows=existing_table_rows, diststyle=diststyle,
+            distkey=distkey, sortkey1=sortkey1, sortkey2=sortkey2, wait=wait, **civisargs)
 
     @classmethod
     def from_csv(cls, local_path, **csvargs):
@@ -534,10 +617,14 @@ class ToFrom(object):
         """
         Create a ``parsons table`` from a json file
 
+        The file is parsed incrementally as the table is read, so large files can be loaded
+        without holding them in memory. If the optional ``orjson`` package is installed, it
+        will be used to parse line-delimited JSON.
+
         `Args:`
             local_path: list
                 A JSON formatted local path, url or ftp. If this is a
-                file path that ends in ".gz", the file will be decompressed first.
+                file path that ends in ".gz" or ".bz2", the file will be decompressed.
             header: list
                 List of columns to use for the destination table. If omitted, columns will
                 be inferred from the initial data in the file.
@@ -549,27 +636,25 @@ class ToFrom(object):
                 See :ref:`parsons-table` for output options.
         """
 
-        if line_delimited:
-            if files.is_gzip_path(local_path):
-                open_fn = gzip.open
-            else:
-                open_fn = open
+        from parsons.etl.json_reader import JsonView
 
-            with open_fn(local_path, 'r') as file:
-                rows = [json.loads(line) for line in file]
-            return cls(rows)
-
-        else:
-            return cls(petl.fromjson(local_path, header=header))
+        return cls(JsonView(local_path, header=header, line_delimited=line_delimited))
 
     @classmethod
     def from_redshift(cls, query, username=None, password=None, host=None,
-                      db=None, port=None):
+                      db=None, port=None, unload_threshold=None):
         """
         Create a ``parsons table`` from a Redshift query.
 
         To pull an entire Redshift table, use a query like ``SELECT * FROM tablename``.
 
+        If an S3 temp bucket is set with the ``S3_TEMP_BUCKET`` env variable and the query
+        plan estimates the results are larger than ``unload_threshold``, the results are
+        unloaded to S3 and downloaded in parallel with
+        :meth:`~parsons.Redshift.unload_query`, rather than fetched through the leader
+        node. Queries with a ``LIMIT`` are never unloaded, and if the unload fails the
+        query is run normally.
+
         `Args:`
             query: str
                 A valid SQL statement
@@ -583,14 +668,36 @@ class ToFrom(object):
                 Required if env variable ``REDSHIFT_DB`` not populated
             port: int
                 Required if env variable ``REDSHIFT_PORT`` not populated. Port 5439 is typical.
+            unload_threshold: int
+                The estimated size of the results, in bytes, above which they are unloaded.
+                Defaults to 500MB. Set to ``0`` to always fetch through the leader node.
 
         `Returns:`
             Parsons Table
                 See :ref:`parsons-table` for output options.
         """
 
+        import psycopg2
         from parsons import Redshift
+        from parsons.databases.redshift.redshift import UNLOAD_THRESHOLD
+
         rs = Redshift(username=username, password=password, host=host, db=db, port=port)
+
+        if unload_threshold is None:
+            unload_threshold = UNLOAD_THRESHOLD
+
+        # Only a single SELECT can be unloaded
+        if (unload_threshold and rs.s3_temp_bucket and _SELECT_SQL.match(query)
+                and not _LIMIT_SQL.search(query)):
+            size = rs.estimate_query_size(query)
+            if size is not None and size > unload_threshold:
+                logger.info(f'Query results estimated at {size} bytes. Unloading to S3.')
+                try:
+                    return rs.unload_query(query)
+                except psycopg2.Error as e:
+                    logger.warning(f'Unable to unload the query results, so running the '
+                                   f'query instead: {e}')
+
         return rs.query(query)
 
     @classmethod
@@ -623,6 +730,40 @@ class ToFrom(object):
 
         return cls(petl.fromcsv(file_obj, **csvargs))
 
+    @classmethod
+    def from_sftp_csv(cls, remote_path, host, username, password, port=22, **csvargs):
+        """
+        Create a ``parsons table`` from a CSV file on an SFTP server. The file is streamed
+        from the server as the table is read, with reads prefetched and no local copy. Each
+        pass over the table reads the file again, on a connection which is closed once the
+        pass is done. Call ``materialize`` on the table to keep it in memory instead.
+
+        `Args:`
+            remote_path: str
+                The remote path of the file. If it ends in '.gz', '.bz2' or '.zst', the file
+                will be decompressed.
+            host: str
+                The remote host
+            username: str
+                The username to access the SFTP server
+            password: str
+                The password to access the SFTP server
+            port: int
+                The port number of the SFTP server
+            \**csvargs: kwargs
+                ``csv_reader`` optional arguments
+        `Returns:`
+            Parsons Table
+                See :ref:`parsons-table` for output options.
+        """  # noqa: W605
+
+        from parsons.sftp.sftp import SFTP, SFTPFileSource
+
+        sftp = SFTP(host, username, password, port)
+        source = SFTPFileSource(sftp, remote_path, prefetch=True, close_sftp=True)
+
+        return cls(petl.fromcsv(source, **csvargs))
+
     @classmethod
     def from_dataframe(cls, dataframe, include_index=False):
         """
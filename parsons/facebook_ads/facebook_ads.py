@@ -1,12 +1,18 @@
 import os
 import collections
-import copy
+import hashlib
+import itertools
 import logging
-from joblib import Parallel, delayed
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from facebook_business.api import FacebookAdsApi
+from facebook_business.session import FacebookSession
 from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.customaudience import CustomAudience
 from parsons.etl.table import Table
+from parsons.etl.column_matcher import ColumnMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +21,44 @@ FBKeySchema = CustomAudience.Schema.MultiKeySchema
 # Max number of custom audience users we're allowed to send in one API call
 MAX_FB_AUDIENCE_API_USERS = 10000
 
+# The default number of batches uploaded at once
+UPLOAD_WORKERS = 4
+
+# Characters stripped from each value before normalizing, as the FB SDK does
+_STRIP_CHARS = " \t\r\n\0\x0B."
+
+
+def _hash_batch(schema, rows):
+    # Normalize and hash a batch of users the same way as the FB SDK does for raw data.
+    # This is a module level function so it can run in a process pool.
+
+    hashed = []
+    for row in rows:
+        user = []
+        for key, value in zip(schema, row):
+            value = CustomAudience.normalize_key(key, str(value).strip(_STRIP_CHARS).lower())
+            if key != FBKeySchema.extern_id:
+                value = hashlib.sha256(value.encode('utf8')).hexdigest()
+            user.append(value)
+        hashed.append(user)
+
+    return hashed
+
+
+def _bounded_map(executor, func, iterable, window):
+    # Like executor.map, but only reads ahead enough of the iterable to keep ``window``
+    # calls in flight, so a large input isn't pulled into memory all at once. Yields each
+    # call's future in order.
+
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft()
+
+    while pending:
+        yield pending.popleft()
+
 
 class FacebookAds(object):
     """
@@ -94,28 +138,18 @@ class FacebookAds(object):
 
         FacebookAdsApi.init(self.app_id, self.app_secret, self.access_token)
         self.ad_account = AdAccount("act_%s" % self.ad_account_id)
+        self._local = threading.local()
 
     @staticmethod
     def _get_match_key_for_column(column):
         # Finds a FB match key for a given table column.
 
-        normalized_col = Table.get_normalized_column_name(column)
-
-        for k, match_list in FacebookAds.KeyMatchMap.items():
-            for match in match_list:
-                if normalized_col == Table.get_normalized_column_name(match):
-                    return k
-        return None
+        return _key_matcher.match(column)
 
     @staticmethod
     def _get_preprocess_key_for_column(column):
-        normalized_col = Table.get_normalized_column_name(column)
 
-        for k, match_list in FacebookAds.PreprocessKeyMatchMap.items():
-            for match in match_list:
-                if normalized_col == Table.get_normalized_column_name(match):
-                    return k
-        return None
+        return _preprocess_key_matcher.match(column)
 
     @staticmethod
     def _preprocess_dob_column(table, column):
@@ -170,8 +204,9 @@ class FacebookAds(object):
                 The prepared table
         """
 
-        # Copy the table to avoid messing up the source table
-        t = copy.deepcopy(users_table)
+        # Wrap the source table's view in a new table, so the source isn't changed. This is
+        # lazy, so unlike a deep copy the rows aren't copied into memory.
+        t = Table(users_table.table)
 
         FacebookAds._preprocess_users_table(t)
 
@@ -210,12 +245,6 @@ class FacebookAds(object):
 
         return t
 
-    @staticmethod
-    def _get_match_schema_and_data(table):
-        # Grab the raw data as a list of tuples
-        data_list = [row for row in table.data]
-        return (table.columns, data_list)
-
     @staticmethod
     def _is_valid_data_source(data_source):
         valid_sources = [
@@ -268,19 +297,38 @@ class FacebookAds(object):
 
         CustomAudience(audience_id).api_delete()
 
-    @staticmethod
-    def _add_batch_to_custom_audience(app_id, app_secret, access_token, audience_id, schema,
-                                      batch, added_so_far, total_rows):
-        # Since this method runs in parallel, we need to re-initialize the Facebook API each time
-        # to avoid SSL-related errors. Basically, the FacebookAdsApi python framework isn't
-        # built to run in parallel.
-        FacebookAdsApi.init(app_id, app_secret, access_token)
-
-        # Note that the FB SDK handles basic normalization and hashing of the data
-        CustomAudience(audience_id).add_users(schema, batch, is_raw=True)
-        logger.info(f"Added {added_so_far+len(batch)}/{total_rows} users to custom audience...")
-
-    def add_users_to_custom_audience(self, audience_id, users_table):
+    def _get_api(self):
+        # Each upload thread gets its own API session, since the FB SDK's session isn't
+        # built to be shared between threads.
+
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            session = FacebookSession(self.app_id, self.app_secret, self.access_token)
+            api = self._local.api = FacebookAdsApi(session)
+        return api
+
+    def _upload_batch(self, audience_id, schema, batch):
+        # Upload one batch of hashed users, recording the result rather than raising, so
+        # one failed batch doesn't stop the rest.
+
+        index, hashed_users = batch
+        result = {'batch': index, 'users': len(hashed_users), 'num_received': None,
+                  'num_invalid_entries': None, 'error': None}
+
+        try:
+            res = CustomAudience(audience_id, api=self._get_api()).add_users(
+                schema, hashed_users, is_raw=True, pre_hashed=True)
+            body = res.json()
+            result['num_received'] = body.get('num_received')
+            result['num_invalid_entries'] = body.get('num_invalid_entries')
+        except Exception as error:
+            logger.error(f"Failed to add batch {index} to custom audience: {error}")
+            result['error'] = str(error)
+
+        return result
+
+    def add_users_to_custom_audience(self, audience_id, users_table, batch_size=None,
+                                     max_workers=None, hash_processes=None):
         """
         Adds user data to a custom audience.
 
@@ -347,40 +395,73 @@ class FacebookAds(object):
         use "United States" instead of "US" for the "country" field, the API will appear to accept
         it, when in reality it is probably ignoring that field. So read the docs if you're worried.
 
+        The table is read in batches of up to 10,000 users, which are normalized and
+        hashed locally in a pool of processes and uploaded a few at a time, so the whole
+        table is never held in memory.
+
         `Args:`
             audience_id: str
                 The ID of the custom audience to delete.
             users_table: obj
                 Parsons table
+            batch_size: int
+                The number of users in each API call. Defaults to FB's limit of 10,000.
+            max_workers: int
+                The number of batches to upload at once. Defaults to the
+                ``PARSONS_NUM_PARALLEL_JOBS`` env var, or 4.
+            hash_processes: int
+                The number of processes to hash users with. Defaults to the number of CPUs.
 
+        `Returns:`
+            Parsons Table
+                One row per batch, with the ``batch`` number, the number of ``users`` sent,
+                the ``num_received`` and ``num_invalid_entries`` reported by FB, and the
+                ``error`` if the upload failed.
         """ # noqa: E501,E261
 
-        logger.info(f"Adding custom audience users from provided table with "
-                    f"{users_table.num_rows} rows")
-
         match_table = FacebookAds.get_match_table_for_users_table(users_table)
         if not match_table.columns:
             raise KeyError("No valid columns found for audience matching. "
                            "See FacebookAds.KeyMatchMap for supported columns")
 
-        num_rows = match_table.num_rows
-        logger.info(f"Found {num_rows} rows with valid FB matching keys")
-        logger.info(f"Using FB matching keys: {match_table.columns}")
+        schema = match_table.columns
+        logger.info(f"Using FB matching keys: {schema}")
 
-        (schema, data) = FacebookAds._get_match_schema_and_data(match_table)
+        batch_size = min(batch_size or MAX_FB_AUDIENCE_API_USERS, MAX_FB_AUDIENCE_API_USERS)
+        max_workers = int(max_workers or os.environ.get('PARSONS_NUM_PARALLEL_JOBS',
+                                                        UPLOAD_WORKERS))
 
-        # Use the FB API to add users, respecting the limit per API call.
-        # Process and upload batches in parallel, to improve performance.
+        rows = iter(match_table.data)
+        batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
 
-        batch_size = MAX_FB_AUDIENCE_API_USERS
+        results = []
+        added = 0
+
+        # Hash batches in a process pool and upload them on a thread pool, keeping only a
+        # few batches in flight at each stage
+        with ProcessPoolExecutor(max_workers=hash_processes) as hashers, \
+                ThreadPoolExecutor(max_workers=max_workers) as uploaders:
+
+            hashed = _bounded_map(hashers, partial(_hash_batch, schema), batches,
+                                  max_workers * 2)
+            indexed = ((i, future.result()) for i, future in enumerate(hashed))
+            uploads = _bounded_map(uploaders, partial(self._upload_batch, audience_id, schema),
+                                   indexed, max_workers)
+
+            for future in uploads:
+                result = future.result()
+                results.append(result)
+                if not result['error']:
+                    added += result['users']
+                    logger.info(f"Added {added} users to custom audience...")
+
+        failed = sum(1 for r in results if r['error'])
+        if failed:
+            logger.error(f"{failed} of {len(results)} batches failed to upload")
+
+        return Table(results)
 
-        parallel_jobs = (
-            delayed(FacebookAds._add_batch_to_custom_audience)(
-                self.app_id, self.app_secret, self.access_token, audience_id, schema,
-                data[i:i+batch_size], i, num_rows
-            )
-            for i in range(0, len(data), batch_size)
-        )
 
-        n_jobs = os.environ.get('PARSONS_NUM_PARALLEL_JOBS', 4)
-        Parallel(n_jobs=n_jobs)(parallel_jobs)
+# Normalized indexes of the column names in the match maps, built once at import
+_key_matcher = ColumnMatcher(FacebookAds.KeyMatchMap)
+_preprocess_key_matcher = ColumnMatcher(FacebookAds.PreprocessKeyMatchMap)
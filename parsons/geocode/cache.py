@@ -0,0 +1,105 @@
+import json
+import re
+import sqlite3
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_address(*parts):
+    """
+    Returns a normalized key for an address, so that addresses which differ only by case,
+    punctuation or spacing share a cache entry.
+
+    `Args:`
+        \*parts: str
+            The parts of the address, eg. street, city, state and zip code
+    `Returns:`
+        str
+    """  # noqa: W605
+
+    return '|'.join(' '.join(_PUNCTUATION.sub(' ', str(p or '')).upper().split())
+                    for p in parts)
+
+
+class GeocodeCache(object):
+    """
+    A persistent cache of geocoding results, stored in a SQLite file. Results are kept
+    separately for each namespace, eg. a combination of Census benchmark and vintage.
+
+    `Args:`
+        path: str
+            The path of the SQLite file. It's created if it doesn't exist. Use
+            ``:memory:`` for a cache which only lasts as long as this object.
+        namespace: str
+            The namespace to store and look up results in
+    """
+
+    def __init__(self, path, namespace=''):
+
+        self.path = path
+        self.namespace = namespace
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS geocodes "
+                          "(namespace TEXT, key TEXT, result TEXT, "
+                          "PRIMARY KEY (namespace, key))")
+        self.conn.commit()
+
+    def get(self, key):
+        """
+        Look up one result.
+
+        `Args:`
+            key: str
+                The address key
+        `Returns:`
+            The cached result, or ``None`` if there isn't one
+        """
+
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Look up several results at once.
+
+        `Args:`
+            keys: list
+                The address keys
+        `Returns:`
+            dict
+                The cached results, by key. Keys without a result are left out.
+        """
+
+        keys = list(set(keys))
+        found = {}
+
+        # Stay under SQLite's limit on the number of query parameters
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT key, result FROM geocodes WHERE namespace = ? "
+                f"AND key IN ({placeholders})", [self.namespace] + chunk)
+            found.update((key, json.loads(result)) for key, result in cursor)
+
+        return found
+
+    def set_many(self, results):
+        """
+        Store several results at once, replacing any existing results for the same keys.
+
+        `Args:`
+            results: dict
+                The results to store, by key. They must be JSON serializable.
+        """
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO geocodes (namespace, key, result) VALUES (?, ?, ?)",
+                [(self.namespace, key, json.dumps(result)) for key, result in results.items()])
+
+    def close(self):
+        """
+        Close the SQLite file.
+        """
+
+        self.conn.close()
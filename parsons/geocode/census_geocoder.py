@@ -1,7 +1,11 @@
 from parsons import Table
+from parsons.geocode.cache import GeocodeCache, normalize_address
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import petl
 import censusgeocode
 import logging
+import requests
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +14,16 @@ logger = logging.getLogger(__name__)
 # the recommendation is less than 1K records.
 BATCH_SIZE = 999
 
+# The number of batches sent to the Census at once
+MAX_IN_FLIGHT = 4
+
+# The number of times a failed batch is retried, waiting twice as long before each retry
+BATCH_RETRIES = 3
+RETRY_WAIT = 2
+
+# The fields the batch geocoder expects, in order
+_BATCH_INPUT_FIELDS = ['id', 'street', 'city', 'state', 'zip']
+
 
 class CensusGeocoder(object):
     """
@@ -22,11 +36,38 @@ class CensusGeocoder(object):
         vintage: str
             The US Census vintage file to utilize. By default the current vintage is used, but
             other options can be found `here <https://geocoding.geo.census.gov/geocoder/vintages?form>`_.
+        cache_path: str
+            The path of a SQLite file in which to cache results, keyed on the normalized
+            address. Addresses which have already been geocoded with the same benchmark and
+            vintage aren't sent to the Census again. By default nothing is cached.
+        url: str
+            The base url of the geocoder, eg. ``http://localhost:8000/geocoder`` for a local
+            stub server in tests. Defaults to the Census geocoder.
     """ # noqa E501
 
-    def __init__(self, benchmark='Public_AR_Current', vintage='Current_Current'):
+    def __init__(self, benchmark='Public_AR_Current', vintage='Current_Current', cache_path=None,
+                 url=None):
 
         self.cg = censusgeocode.CensusGeocode(benchmark=benchmark, vintage=vintage)
+        if url:
+            self.cg._url = url.rstrip('/') + '/{returntype}/{searchtype}'
+
+        self.cache = None
+        if cache_path:
+            self.cache = GeocodeCache(cache_path, namespace=f'{benchmark}|{vintage}')
+
+    def _cached(self, key, geocode):
+        # Internal method to return the cached result for a key, or geocode and cache it
+
+        if self.cache is None:
+            return geocode()
+
+        geo = self.cache.get(key)
+        if geo is None:
+            geo = geocode()
+            self.cache.set_many({key: geo})
+
+        return geo
 
     def geocode_onelineaddress(self, address, return_type='geographies'):
         """
@@ -44,7 +85,8 @@ class CensusGeocoder(object):
             dict
         """
 
-        geo = self.cg.onelineaddress(address, returntype=return_type)
+        key = f'oneline|{return_type}|{normalize_address(address)}'
+        geo = self._cached(key, lambda: self.cg.onelineaddress(address, returntype=return_type))
         self._log_result(geo)
         return geo
 
@@ -70,11 +112,13 @@ class CensusGeocoder(object):
             dict
         """
 
-        geo = self.cg.address(address_line, city=city, state=state, zipcode=zipcode)
+        key = f'address|{return_type}|{normalize_address(address_line, city, state, zipcode)}'
+        geo = self._cached(key, lambda: self.cg.address(address_line, city=city, state=state,
+                                                        zipcode=zipcode, returntype=return_type))
         self._log_result(geo)
         return geo
 
-    def geocode_address_batch(self, table):
+    def geocode_address_batch(self, table, batch_size=None, max_in_flight=None, retries=None):
         """
         Geocode multiple addresses from a parsons table.
 
@@ -91,26 +135,90 @@ class CensusGeocoder(object):
             * - State
             * - Zipcode
 
+        Several batches are sent to the Census at once, and failed batches are retried.
+        Each distinct address is only geocoded once, and if a ``cache_path`` was given,
+        addresses found in the cache aren't sent at all.
+
         `Args:`
             table: Parsons Table
                 A Parsons table
+            batch_size: int
+                The number of addresses in each batch. Defaults to 999.
+            max_in_flight: int
+                The number of batches to send at once. Defaults to 4.
+            retries: int
+                The number of times to retry a failed batch. Defaults to 3.
         `Returns:`
-            A Parsons table
+            A Parsons table, in the same order as the input table
         """
 
-        logger.info(f'Geocoding {table.num_rows} records.')
-        chunked_tables = table.chunk(BATCH_SIZE)
-        batch_count = 1
-        records_processed = 0
+        batch_size = batch_size or BATCH_SIZE
+        max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        retries = BATCH_RETRIES if retries is None else retries
+
+        # Key each row on its normalized address, so repeated addresses are sent once
+        rows = []
+        addresses = {}
+        for row in table.data:
+            key = normalize_address(*row[1:5])
+            rows.append((row[0], key))
+            addresses.setdefault(key, row[1:5])
 
-        geocoded_tbl = Table([[]])
-        for tbl in chunked_tables:
-            geocoded_tbl.concat(Table(petl.fromdicts(self.cg.addressbatch(tbl))))
-            records_processed += tbl.num_rows
-            logger.info(f'{records_processed} of {table.num_rows} records processed.')
-            batch_count += 1
+        logger.info(f'Geocoding {len(rows)} records with {len(addresses)} distinct addresses.')
+
+        results = self.cache.get_many(addresses) if self.cache else {}
+        pending = [key for key in addresses if key not in results]
+        if results:
+            logger.info(f'{len(addresses) - len(pending)} addresses found in the cache.')
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        records_processed = 0
 
-        return geocoded_tbl
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = [executor.submit(self._geocode_batch, batch, addresses, retries)
+                       for batch in batches]
+
+            for future in as_completed(futures):
+                batch_results = future.result()
+                if self.cache:
+                    self.cache.set_many(batch_results)
+                results.update(batch_results)
+                records_processed += len(batch_results)
+                logger.info(f'{records_processed} of {len(pending)} addresses processed.')
+
+        geocoded = [dict(id=row_id, **results.get(key, {})) for row_id, key in rows]
+
+        header = []
+        for result in geocoded:
+            header.extend(k for k in result if k not in header)
+
+        return Table(petl.fromdicts(geocoded, header=header or ['id']))
+
+    def _geocode_batch(self, keys, addresses, retries):
+        # Internal method to send one batch, retrying on failure. Each address's position
+        # in the batch is used as its ID, and results are returned by address key.
+
+        data = [dict(zip(_BATCH_INPUT_FIELDS, (str(i),) + tuple(addresses[key])))
+                for i, key in enumerate(keys)]
+
+        for attempt in range(retries + 1):
+            try:
+                response = self.cg.addressbatch(data)
+                break
+            except requests.exceptions.RequestException as error:
+                if attempt == retries:
+                    raise
+                wait = RETRY_WAIT * 2 ** attempt
+                logger.warning(f'Batch failed ({error}). Retrying in {wait} seconds...')
+                time.sleep(wait)
+
+        results = {}
+        for result in response:
+            result = dict(result)
+            key = keys[int(result.pop('id'))]
+            results[key] = result
+
+        return results
 
     def _log_result(self, dict):
         # Internal method to log the result of the geocode
@@ -4,11 +4,99 @@ from parsons import Table
 from parsons.google.utitities import setup_google_application_credentials
 from parsons.google.google_cloud_storage import GoogleCloudStorage
 from parsons.utilities import check_env
-from parsons.utilities.files import create_temp_file
+from parsons.etl.avro_writer import avro_schema, write_avro
+from parsons.utilities.files import create_temp_file, close_temp_file
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import os
 import petl
 import pickle
 import uuid
 
+# pyarrow is an optional dependency, which caches query results as compact Arrow record
+# batches rather than as pickled Python objects
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Tables which fit in a single Avro file of up to this size are uploaded straight to BigQuery.
+# Larger tables are staged in Google Cloud Storage.
+DIRECT_LOAD_MAX_BYTES = 100 * 1024 * 1024
+
+# The maximum number of rows in each Avro file
+SHARD_ROWS = 1000000
+
+# The number of files uploaded to Google Cloud Storage at once
+UPLOAD_WORKERS = 8
+
+
+def _avro_shards(table_obj, shard_rows):
+    # Writes the table to temp Avro files of up to shard_rows rows, yielding each path once
+    # the file is complete. Always yields at least one file, so empty tables can be loaded.
+
+    schema = avro_schema(table_obj.table)
+    it = iter(table_obj.table)
+    hdr = next(it)
+
+    first_row = next(it, None)
+    while True:
+        path = create_temp_file(suffix='.avro')
+        rows = [] if first_row is None else [first_row]
+        with open(path, 'wb') as file:
+            write_avro(itertools.chain([hdr], rows, itertools.islice(it, shard_rows - 1)),
+                       file, schema=schema)
+        yield path
+
+        first_row = next(it, None)
+        if first_row is None:
+            return
+
+
+def _result_column_batches(results, header):
+    # Yields each page of a RowIterator as a list of rows, or as an Arrow record batch when
+    # pyarrow is installed and the client library can build them
+
+    if pyarrow is not None and hasattr(results, 'to_arrow_iterable'):
+        # Newer client libraries build the record batches without creating a Python object
+        # for each value
+        for batch in results.to_arrow_iterable():
+            if batch.num_rows:
+                yield batch
+        return
+
+    for page in results.pages:
+        # Row.values() deep copies each row, so read the values by index instead. The rows
+        # aren't converted to Arrow here, since that changes the scale of decimals and the
+        # time zone of datetimes.
+        rows = [tuple(row) for row in page]
+        if rows:
+            yield rows
+
+
+class _ColumnBatchesView(petl.Table):
+    # A lazy petl table over a file of pickled batches, each either a list of rows or an
+    # Arrow record batch
+
+    def __init__(self, path, header):
+
+        self.path = path
+        self._header = tuple(header)
+
+    def __iter__(self):
+
+        yield self._header
+        with open(self.path, 'rb') as file:
+            while True:
+                try:
+                    batch = pickle.load(file)
+                except EOFError:
+                    return
+                if pyarrow is not None and isinstance(batch, pyarrow.RecordBatch):
+                    yield from zip(*[column.to_pylist() for column in batch.columns])
+                else:
+                    yield from batch
+
 
 class GoogleBigQuery:
     """
@@ -51,9 +139,16 @@ class GoogleBigQuery:
         self._client = None
 
     def copy(self, table_obj, dataset_name, table_name, if_exists='fail',
-             tmp_gcs_bucket=None, gcs_client=None, job_config=None, **load_kwargs):
+             tmp_gcs_bucket=None, gcs_client=None, job_config=None, shard_rows=None,
+             max_direct_load_bytes=None, **load_kwargs):
         """
-        Copy a :ref:`parsons-table` into Google BigQuery via Google Cloud Storage.
+        Copy a :ref:`parsons-table` into Google BigQuery.
+
+        The table is written as Avro files, with a schema built from the Python types in
+        each column, so BigQuery doesn't have to infer the types. Tables which fit in a
+        single file of up to ``max_direct_load_bytes`` are uploaded straight to BigQuery.
+        Larger tables are split into files of ``shard_rows`` rows, uploaded to Google Cloud
+        Storage in parallel and loaded with a single wildcard URI.
 
         `Args:`
             table_obj: obj
@@ -67,17 +162,22 @@ class GoogleBigQuery:
                 or ``truncate`` the table.
             temp_gcs_bucket: str
                 The name of the Google Cloud Storage bucket to use to stage the data to load
-                into BigQuery. Required if `GCS_TEMP_BUCKET` is not specified.
+                into BigQuery. Required for large tables if `GCS_TEMP_BUCKET` is not
+                specified.
             gcs_client: object
                 The GoogleCloudStorage Connector to use for loading data into Google Cloud Storage.
             job_config: object
-                A LoadJobConfig object to provide to the underlying call to load_table_from_uri
-                on the BigQuery client. The function will create its own if not provided.
+                A LoadJobConfig object to provide to the underlying load call on the BigQuery
+                client. The function will create its own if not provided.
+            shard_rows: int
+                The maximum number of rows in each file. Defaults to 1,000,000.
+            max_direct_load_bytes: int
+                The largest file to upload directly to BigQuery, rather than staging it in
+                Google Cloud Storage. Defaults to 100MB.
             **load_kwargs: kwargs
-                Arguments to pass to the underlying load_table_from_uri call on the BigQuery
-                client.
+                Arguments to pass to the underlying load_table_from_file or
+                load_table_from_uri call on the BigQuery client.
         """
-        tmp_gcs_bucket = check_env.check('GCS_TEMP_BUCKET', tmp_gcs_bucket)
 
         if if_exists not in ['fail', 'truncate', 'append', 'drop']:
             raise ValueError(f'Unexpected value for if_exists: {if_exists}, must be one of '
@@ -87,10 +187,9 @@ class GoogleBigQuery:
 
         if not job_config:
             job_config = bigquery.LoadJobConfig()
-            job_config.autodetect = True
 
-        job_config.skip_leading_rows = 1
-        job_config.source_format = bigquery.SourceFormat.CSV
+        job_config.source_format = bigquery.SourceFormat.AVRO
+        job_config.use_avro_logical_types = True
         job_config.write_disposition = bigquery.WriteDisposition.WRITE_EMPTY
         job_config.create_disposition = bigquery.CreateDisposition.CREATE_IF_NEEDED
 
@@ -106,19 +205,66 @@ class GoogleBigQuery:
             elif if_exists == 'truncate':
                 job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
 
+        table_ref = dataset_ref.table(table_name)
+        max_direct_load_bytes = max_direct_load_bytes or DIRECT_LOAD_MAX_BYTES
+
+        shards = _avro_shards(table_obj, shard_rows or SHARD_ROWS)
+        first = next(shards)
+        second = next(shards, None)
+
+        # Upload a medium sized table straight to BigQuery
+        if second is None and os.path.getsize(first) <= max_direct_load_bytes:
+            try:
+                with open(first, 'rb') as file:
+                    load_job = self.client.load_table_from_file(
+                        file, table_ref, job_config=job_config, **load_kwargs)
+                load_job.result()
+            finally:
+                close_temp_file(first)
+            return
+
+        shards = itertools.chain([first], [second] if second else [], shards)
+        self._copy_via_gcs(shards, table_ref, job_config, tmp_gcs_bucket, gcs_client,
+                           **load_kwargs)
+
+    def _copy_via_gcs(self, shards, table_ref, job_config, tmp_gcs_bucket=None,
+                      gcs_client=None, **load_kwargs):
+        # Upload the files in parallel, while the next files are still being written
+
+        tmp_gcs_bucket = check_env.check('GCS_TEMP_BUCKET', tmp_gcs_bucket)
         gcs_client = gcs_client or GoogleCloudStorage()
-        temp_blob_name = f'{uuid.uuid4()}.csv'
-        temp_blob_uri = gcs_client.upload_table(table_obj, tmp_gcs_bucket, temp_blob_name)
 
-        # load CSV from Cloud Storage into BigQuery
+        prefix = uuid.uuid4()
+        blob_names = []
+
+        def upload(blob_name, path):
+            try:
+                gcs_client.put_blob(tmp_gcs_bucket, blob_name, path)
+            finally:
+                close_temp_file(path)
+
         try:
+            with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+                futures = []
+                for i, path in enumerate(shards):
+                    blob_name = f'{prefix}/{i:06d}.avro'
+                    blob_names.append(blob_name)
+                    futures.append(pool.submit(upload, blob_name, path))
+                for future in futures:
+                    future.result()
+
+            # load the files from Cloud Storage into BigQuery
             load_job = self.client.load_table_from_uri(
-                temp_blob_uri, dataset_ref.table(table_name),
+                f'gs://{tmp_gcs_bucket}/{prefix}/*.avro', table_ref,
                 job_config=job_config, **load_kwargs,
             )
             load_job.result()
         finally:
-            gcs_client.delete_blob(tmp_gcs_bucket, temp_blob_name)
+            for blob_name in blob_names:
+                try:
+                    gcs_client.delete_blob(tmp_gcs_bucket, blob_name)
+                except exceptions.NotFound:
+                    pass
 
     def delete_table(self, dataset_name, table_name):
         """
@@ -134,13 +280,25 @@ class GoogleBigQuery:
         table_ref = dataset_ref.table(table_name)
         self.client.delete_table(table_ref)
 
-    def query(self, sql):
+    def query(self, sql, page_size=None, max_results=None, start_index=None):
         """
         Run a BigQuery query and return the results as a Parsons table.
 
+        The results are fetched a page at a time and cached in a temp file, one batch of
+        rows per page, so they don't all live in memory. When ``pyarrow`` is installed and
+        the BigQuery client library can return Arrow record batches, each page is cached
+        as a record batch, which is smaller and quicker to write than the Python values.
+
         `Args:`
             sql: str
                 A valid BigTable statement
+            page_size: int
+                The number of rows to fetch in each page. Defaults to BigQuery's page size.
+            max_results: int
+                The maximum number of rows to return. Useful along with ``start_index`` to
+                sample a window of the results.
+            start_index: int
+                The index of the first row to return
 
         `Returns:`
             Parsons Table
@@ -149,33 +307,33 @@ class GoogleBigQuery:
         # Run the query
         query_job = self.client.query(sql)
 
+        if start_index:
+            # Wait for the query to finish, then read the window straight from its
+            # destination table
+            error = query_job.exception()
+            if error:
+                raise error
+            results = self.client.list_rows(query_job.destination, start_index=start_index,
+                                            max_results=max_results, page_size=page_size)
+        else:
+            results = query_job.result(page_size=page_size, max_results=max_results)
+
+        # If there are no results, just return None
+        if results.total_rows == 0:
+            return None
+
+        header = [field.name for field in results.schema]
+
         # We will use a temp file to cache the results so that they are not all living
         # in memory. We'll use pickle to serialize the results to file in order to maintain
         # the proper data types (e.g. integer).
         temp_filename = create_temp_file()
 
-        wrote_header = False
         with open(temp_filename, 'wb') as temp_file:
-            results = query_job.result()
-
-            # If there are no results, just return None
-            if results.total_rows == 0:
-                return None
-
-            for row in results:
-                # Make sure we write out the header once and only once
-                if not wrote_header:
-                    wrote_header = True
-                    header = list(row.keys())
-                    pickle.dump(header, temp_file)
-
-                row_data = list(row.values())
-                pickle.dump(row_data, temp_file)
-
-        ptable = petl.frompickle(temp_filename)
-        final_table = Table(ptable)
+            for columns in _result_column_batches(results, header):
+                pickle.dump(columns, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
 
-        return final_table
+        return Table(_ColumnBatchesView(temp_filename, header))
 
     def table_exists(self, dataset_name, table_name):
         """
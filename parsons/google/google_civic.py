@@ -1,9 +1,46 @@
 from parsons.utilities import check_env
+from parsons.geocode.cache import GeocodeCache, normalize_address
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+import threading
+import time
 from parsons import Table
 
 URI = 'https://www.googleapis.com/civicinfo/v2/'
 
+# The number of polling location lookups made at once
+MAX_WORKERS = 8
+
+# The maximum number of polling location requests per second
+MAX_QPS = 20
+
+# The number of polling location results kept in memory
+CACHE_SIZE = 10000
+
+
+class _RateLimiter(object):
+    # Spaces out calls from any number of threads to at most ``qps`` per second
+
+    def __init__(self, qps):
+
+        self.interval = 1.0 / qps if qps else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
+
 
 class GoogleCivic(object):
     """
@@ -11,15 +48,22 @@ class GoogleCivic(object):
         api_key : str
             A valid Google api key. Not required if ``GOOGLE_CIVIC_API_KEY``
             env variable set.
+        cache_path: str
+            The path of a SQLite file in which to cache polling locations, keyed on the
+            election and normalized address, so they are kept between runs. Recent results
+            are always cached in memory.
     `Returns:`
         class
     """
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache_path=None):
 
         self.api_key = check_env.check('GOOGLE_CIVIC_API_KEY', api_key)
         self.uri = URI
 
+        self.cache = GeocodeCache(cache_path, namespace='civic') if cache_path else None
+        self._memory_cache = OrderedDict()
+
     def request(self, url, args=None):
         # Internal request method
 
@@ -74,10 +118,44 @@ class GoogleCivic(object):
 
         return r['pollingLocations']
 
-    def get_polling_locations(self, election_id, table, address_field='address'):
+    def _cache_key(self, election_id, address):
+
+        return f'{election_id}|{normalize_address(address)}'
+
+    def _get_cached_locations(self, keys):
+        # Internal method to look up polling locations in the memory and disk caches
+
+        found = {}
+        for key in keys:
+            if key in self._memory_cache:
+                self._memory_cache.move_to_end(key)
+                found[key] = self._memory_cache[key]
+
+        if self.cache:
+            found.update(self.cache.get_many(k for k in keys if k not in found))
+
+        return found
+
+    def _cache_locations(self, locations, persist=True):
+
+        for key, loc in locations.items():
+            self._memory_cache[key] = loc
+            self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > CACHE_SIZE:
+            self._memory_cache.popitem(last=False)
+
+        if self.cache and persist:
+            self.cache.set_many(locations)
+
+    def get_polling_locations(self, election_id, table, address_field='address',
+                              max_workers=None, max_qps=None):
         """
         Get polling location information for a table of addresses.
 
+        Addresses are normalized, eg. ignoring case and punctuation, so each distinct
+        address is only looked up once. Lookups are made concurrently, and results are
+        cached.
+
         `Args:`
             election_id: int
                 A valid election id. Election ids can be found by running the
@@ -86,21 +164,46 @@ class GoogleCivic(object):
                 A valid US address in a single string.
             address_field: str
                 The name of the column where the address is stored.
+            max_workers: int
+                The number of lookups to make at once. Defaults to 8.
+            max_qps: int
+                The maximum number of requests per second. Defaults to 20.
         `Returns:`
             Parsons Table
                 See :ref:`parsons-table` for output options.
         """
 
-        polling_locations = []
+        limiter = _RateLimiter(max_qps or MAX_QPS)
+
+        addresses = [row[address_field] for row in table]
+        keys = [self._cache_key(election_id, address) for address in addresses]
+
+        # The first spelling of each distinct address is the one looked up
+        to_lookup = {}
+        for key, address in zip(keys, addresses):
+            to_lookup.setdefault(key, address)
+
+        results = self._get_cached_locations(list(to_lookup))
+        self._cache_locations(results, persist=False)
+        for key in results:
+            to_lookup.pop(key)
+
+        def lookup(key, address):
+            limiter.wait()
+            return key, self.get_polling_location(election_id, address)
+
+        with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+            futures = [executor.submit(lookup, key, address)
+                       for key, address in to_lookup.items()]
 
-        # Iterate through the rows of the table
-        for row in table:
-            loc = self.get_polling_location(election_id, row[address_field])
-            # Insert original passed address
-            loc[0]['passed_address'] = row[address_field]
+            for future in as_completed(futures):
+                key, loc = future.result()
+                results[key] = loc
+                self._cache_locations({key: loc})
 
-            # Add to list of lists
-            polling_locations.append(loc[0])
+        # Join the results back to the input rows, inserting the original passed address
+        polling_locations = [dict(results[key][0], passed_address=address)
+                             for key, address in zip(keys, addresses)]
 
         # Unpack values
         tbl = Table(polling_locations)
@@ -1,11 +1,36 @@
 import google
 from google.cloud import storage
+from parsons.etl.avro_writer import write_avro
+from parsons.etl.csv_writer import write_csv
+from parsons.etl.json_writer import write_json
 from parsons.google.utitities import setup_google_application_credentials
 from parsons.utilities import files
+from parsons.utilities.compression import COMPRESSION_TYPES, ParallelCompressedFile
+from concurrent.futures import ThreadPoolExecutor
+import io
 import logging
+import math
+import os
+import threading
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Files at least this large are uploaded in parallel parts and composed into one blob
+COMPOSITE_UPLOAD_THRESHOLD = 150 * 1024 * 1024
+
+# The smallest part of a composite upload
+MIN_COMPOSITE_PART_SIZE = 32 * 1024 * 1024
+
+# The most source blobs a single compose request accepts
+MAX_COMPOSE_PARTS = 32
+
+# Blobs at least this large are downloaded in parallel byte ranges
+SLICED_DOWNLOAD_THRESHOLD = 150 * 1024 * 1024
+
+# The number of parts uploaded or downloaded at once
+TRANSFER_WORKERS = 8
+
 
 class GoogleCloudStorage(object):
     """
@@ -188,10 +213,13 @@ class GoogleCloudStorage(object):
         logger.debug(f'Got {blob_name} object from {bucket_name} bucket.')
         return blob
 
-    def put_blob(self, bucket_name, blob_name, local_path):
+    def put_blob(self, bucket_name, blob_name, local_path, chunk_size=None):
         """
         Puts a blob (aka file) in a bucket
 
+        Files of ``COMPOSITE_UPLOAD_THRESHOLD`` bytes or more are split into parts, which
+        are uploaded in parallel and then composed into a single blob.
+
         `Args:`
             blob_name:
                 The name of blob to be stored in the bucket
@@ -199,22 +227,64 @@ class GoogleCloudStorage(object):
                 The name of the bucket to store the blob
             local_path: str
                 The local path of the file to upload
+            chunk_size: int
+                The number of bytes to send in each request of a resumable upload. Must be a
+                multiple of 256KB. Defaults to the client library's chunk size.
         `Returns:`
             ``None``
         """
 
         bucket = self.get_bucket(bucket_name)
-        blob = storage.Blob(blob_name, bucket)
+        size = os.path.getsize(local_path)
 
-        with open(local_path, "rb") as f:
-            blob.upload_from_file(f)
+        if size >= COMPOSITE_UPLOAD_THRESHOLD:
+            self._composite_upload(bucket, blob_name, local_path, size, chunk_size)
+        else:
+            blob = storage.Blob(blob_name, bucket, chunk_size=chunk_size)
+            with open(local_path, "rb") as f:
+                blob.upload_from_file(f)
 
         logger.info(f'{blob_name} put in {bucket_name} bucket.')
 
-    def download_blob(self, bucket_name, blob_name, local_path=None):
+    def _composite_upload(self, bucket, blob_name, local_path, size, chunk_size=None):
+        # Upload the file in parts on multiple threads, then stitch them together. Compose
+        # takes at most 32 source blobs.
+
+        part_size = max(MIN_COMPOSITE_PART_SIZE, math.ceil(size / MAX_COMPOSE_PARTS))
+        offsets = range(0, size, part_size)
+        prefix = f'{blob_name}.parsons-part-{uuid.uuid4()}'
+        parts = [storage.Blob(f'{prefix}-{i}', bucket, chunk_size=chunk_size)
+                 for i in range(len(offsets))]
+
+        def upload_part(part, offset):
+            # Resumable uploads require the stream to start at position 0
+            part_length = min(part_size, size - offset)
+            with _FileSlice(local_path, offset, part_length) as f:
+                part.upload_from_file(f, size=part_length, client=self.client)
+
+        logger.debug(f'Uploading {blob_name} in {len(parts)} parts.')
+
+        try:
+            with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as pool:
+                for future in [pool.submit(upload_part, part, offset)
+                               for part, offset in zip(parts, offsets)]:
+                    future.result()
+
+            storage.Blob(blob_name, bucket).compose(parts, client=self.client)
+        finally:
+            for part in parts:
+                try:
+                    part.delete(client=self.client)
+                except google.cloud.exceptions.NotFound:
+                    pass
+
+    def download_blob(self, bucket_name, blob_name, local_path=None, chunk_size=None):
         """
         Gets a blob from a bucket
 
+        Blobs of ``SLICED_DOWNLOAD_THRESHOLD`` bytes or more are downloaded in byte ranges
+        on multiple threads.
+
         `Args:`
             bucket_name: str
                 The name of the bucket
@@ -224,6 +294,9 @@ class GoogleCloudStorage(object):
                 The local path where the file will be downloaded. If not specified, a temporary
                 file will be created and returned, and that file will be removed automatically
                 when the script is done running.
+            chunk_size: int
+                The number of bytes to fetch in each request. Must be a multiple of 256KB.
+                Defaults to downloading each range in a single request.
         `Returns:`
             str
                 The path of the downloaded file
@@ -233,15 +306,48 @@ class GoogleCloudStorage(object):
             local_path = files.create_temp_file_for_path('TEMPTHING')
 
         bucket = storage.Bucket(self.client, name=bucket_name)
-        blob = storage.Blob(blob_name, bucket)
+        blob = bucket.get_blob(blob_name, client=self.client)
+        if blob is None:
+            raise google.cloud.exceptions.NotFound(f'{blob_name} not found in {bucket_name}')
+        blob.chunk_size = chunk_size
 
         logger.info(f'Downloading {blob_name} from {bucket_name} bucket.')
         with open(local_path, 'wb') as f:
-            blob.download_to_file(f, client=self.client)
+            # Byte ranges of a blob stored with a content encoding, such as gzip, can't be
+            # decoded separately, so those are always downloaded whole
+            if (blob.size is not None and blob.size >= SLICED_DOWNLOAD_THRESHOLD
+                    and not blob.content_encoding):
+                self._sliced_download(blob, f)
+            else:
+                blob.download_to_file(f, client=self.client)
         logger.info(f'{blob_name} saved to {local_path}.')
 
         return local_path
 
+    def _sliced_download(self, blob, file):
+        # Download byte ranges of the blob on multiple threads, each writing to its own
+        # part of the file
+
+        file.truncate(blob.size)
+        slice_size = math.ceil(blob.size / TRANSFER_WORKERS)
+
+        def download_slice(start):
+            end = min(start + slice_size, blob.size) - 1
+            # Blob objects aren't thread safe, so each slice gets its own, pinned to the
+            # same generation
+            slice_blob = storage.Blob(blob.name, blob.bucket, chunk_size=blob.chunk_size,
+                                      generation=blob.generation)
+            with open(file.name, 'r+b') as f:
+                f.seek(start)
+                slice_blob.download_to_file(f, client=self.client, start=start, end=end)
+
+        logger.debug(f'Downloading {blob.name} in {TRANSFER_WORKERS} slices.')
+
+        with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as pool:
+            for future in [pool.submit(download_slice, start)
+                           for start in range(0, blob.size, slice_size)]:
+                future.result()
+
     def delete_blob(self, bucket_name, blob_name):
         """
         Delete a blob
@@ -259,10 +365,14 @@ class GoogleCloudStorage(object):
         blob.delete()
         logger.info(f'{blob_name} blob in {bucket_name} bucket deleted.')
 
-    def upload_table(self, table, bucket_name, blob_name, data_type='csv', default_acl=None):
+    def upload_table(self, table, bucket_name, blob_name, data_type='csv', default_acl=None,
+                     compression=None, chunk_size=None):
         """
         Load the data from a Parsons table into a blob.
 
+        The table is streamed into a resumable upload as it is written, without writing a
+        temp file first.
+
         `Args:`
             table: obj
                 A :ref:`parsons-table`
@@ -271,24 +381,201 @@ class GoogleCloudStorage(object):
             blob_name: str
                 The name of the blob to upload the data into.
             data_type: str
-                The file format to use when writing the data. One of: `csv` or `json`
+                The file format to use when writing the data. One of: `csv`, `json` or `avro`
+            compression: str
+                The compression type for the blob. One of ``gzip``, ``bzip2`` or ``zstd``.
+                If ``None``, the data is uploaded uncompressed, whatever the blob name. Avro
+                files are always compressed internally, so this is ignored for them.
+            chunk_size: int
+                The number of bytes to send in each request. Must be a multiple of 256KB.
+                Defaults to the client library's chunk size, which is buffered in memory.
         """
         bucket = storage.Bucket(self.client, name=bucket_name)
-        blob = storage.Blob(blob_name, bucket)
+        blob = storage.Blob(blob_name, bucket, chunk_size=chunk_size)
+
+        if compression and compression not in COMPRESSION_TYPES:
+            raise ValueError(f'Unsupported compression type: {compression}. '
+                             f'Must be one of {", ".join(COMPRESSION_TYPES)}')
 
         if data_type == 'csv':
-            local_file = table.to_csv()
+            def write(file):
+                write_csv(table.table, file)
             content_type = 'text/csv'
         elif data_type == 'json':
-            local_file = table.to_json()
+            def write(file):
+                text = io.TextIOWrapper(file, encoding='utf-8')
+                write_json(table.table, text)
+                text.flush()
+                text.detach()
             content_type = 'application/json'
+        elif data_type == 'avro':
+            def write(file):
+                write_avro(table.table, file)
+            content_type = 'application/avro'
+            compression = None
         else:
-            raise ValueError(f'Unknown data_type value ({data_type}): must be one of: csv or json')
+            raise ValueError(f'Unknown data_type value ({data_type}): must be one of: csv, json '
+                             'or avro')
 
-        try:
-            blob.upload_from_filename(local_file, content_type=content_type, client=self.client,
-                                      predefined_acl=default_acl)
-        finally:
-            files.close_temp_file(local_file)
+        def write_compressed(file):
+            if not compression:
+                return write(file)
+            with ParallelCompressedFile(file, compression) as compressed:
+                write(compressed)
+
+        with _PipeReader(write_compressed) as stream:
+            blob.upload_from_file(stream, content_type=content_type, client=self.client,
+                                  predefined_acl=default_acl)
 
         return f'gs://{bucket_name}/{blob_name}'
+
+
+class _FileSlice(io.RawIOBase):
+    """
+    A readable, seekable stream of ``length`` bytes of a file, starting at ``offset``.
+    Positions are relative to the start of the slice.
+    """
+
+    def __init__(self, path, offset, length):
+
+        self._file = open(path, 'rb')
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def readable(self):
+
+        return True
+
+    def seekable(self):
+
+        return True
+
+    def tell(self):
+
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = max(0, min(offset, self._length))
+        return self._position
+
+    def read(self, size=-1):
+
+        remaining = self._length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        self._file.seek(self._offset + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, b):
+
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+
+        self._file.close()
+        super().close()
+
+
+class _PipeReader(io.RawIOBase):
+    """
+    A readable stream of the bytes written by ``write_func``, which is run on a separate
+    thread, writing into a pipe. If ``write_func`` fails, reading raises its error rather
+    than returning a truncated stream, so an upload never completes with partial data.
+
+    A pipe can't be rewound, so the bytes returned by the last read are kept, and the
+    stream can seek back to any position within them. A resumable upload reads one chunk
+    at a time, so a chunk that fails part way through can be sent again.
+    """
+
+    def __init__(self, write_func):
+
+        read_fd, write_fd = os.pipe()
+        self._reader = open(read_fd, 'rb')
+        self._position = 0
+        # The bytes from the start of the last read to the end of the data read from the
+        # pipe so far
+        self._buffer = b''
+        self._buffer_start = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._write, args=(write_func, write_fd),
+                                        daemon=True)
+        self._thread.start()
+
+    def _write(self, write_func, write_fd):
+
+        try:
+            with open(write_fd, 'wb') as f:
+                write_func(f)
+        except Exception as e:
+            self._error = e
+
+    def readable(self):
+
+        return True
+
+    def seekable(self):
+
+        return True
+
+    def tell(self):
+
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Can only seek from the start or current position')
+
+        if not self._buffer_start <= offset <= self._buffer_start + len(self._buffer):
+            raise io.UnsupportedOperation('Can only seek within the bytes of the last read')
+
+        self._position = offset
+        return offset
+
+    def read(self, size=-1):
+
+        # Replay any bytes kept from the last read first
+        data = self._buffer[self._position - self._buffer_start:]
+        if size is not None and size >= 0:
+            data = data[:size]
+
+        if size is None or size < 0 or len(data) < size:
+            wanted = -1 if size is None or size < 0 else size - len(data)
+            new_data = self._reader.read(wanted)
+            if wanted < 0 or len(new_data) < wanted:
+                # We've reached the end of the stream, so make sure the writer succeeded
+                self._thread.join()
+                if self._error:
+                    raise self._error
+            self._buffer = self._buffer[self._position - self._buffer_start:] + new_data
+            data += new_data
+        else:
+            self._buffer = self._buffer[self._position - self._buffer_start:]
+
+        self._buffer_start = self._position
+        self._position += len(data)
+        return data
+
+    def readinto(self, b):
+
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+
+        # Closing the read end stops the writer, if it is still running
+        self._reader.close()
+        super().close()
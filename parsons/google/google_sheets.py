@@ -1,4 +1,5 @@
 import os
+import itertools
 import json
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
@@ -7,6 +8,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Google recommends keeping Sheets API requests under 2MB, so rows are sent in batches of up
+# to this many bytes of JSON
+MAX_REQUEST_BYTES = 1024 * 1024
+
 
 class GoogleSheets(object):
     """
@@ -170,6 +175,9 @@ class GoogleSheets(object):
         Append data from a Parsons table to a Google sheet. Note that the table's columns are
         ignored, as we'll be keeping whatever header row already exists in the Google sheet.
 
+        The rows are sent with the Sheets ``values.append`` API, which finds the end of the
+        existing data itself, so the sheet isn't read first.
+
         `Args:`
             spreadsheet_id: str
                 The ID of the spreadsheet (Tip: Get this from the spreadsheet URL)
@@ -182,32 +190,25 @@ class GoogleSheets(object):
                 Otherwise, values will be entered as strings or numbers only.
         """
 
-        sheet = self._get_sheet(spreadsheet_id, sheet_index)
-
-        # Grab the existing data, so we can figure out where to start adding new data as a batch.
-        # TODO Figure out a way to do a batch append without having to read the whole sheet first.
-        # Maybe use gspread's low-level batch_update().
-        existing_table = self.read_sheet(spreadsheet_id, sheet_index)
-
-        cells = []
-        for row_num, row in enumerate(table.data):
-            for col_num, cell in enumerate(row):
-                # Add 2 to allow for the header row, and for google sheets indexing starting at 1
-                sheet_row_num = existing_table.num_rows + row_num + 2
-                cells.append(gspread.Cell(sheet_row_num, col_num + 1, row[col_num]))
+        spreadsheet = self.gspread_client.open_by_key(spreadsheet_id)
+        sheet = spreadsheet.get_worksheet(sheet_index)
 
-        value_input_option = 'RAW'
-        if user_entered_value:
-            value_input_option = 'USER_ENTERED'
+        params = {
+            'valueInputOption': _value_input_option(user_entered_value),
+            'insertDataOption': 'INSERT_ROWS',
+        }
 
-        # Update the data in one batch
-        sheet.update_cells(cells, value_input_option=value_input_option)
+        for values in _value_batches(table.data):
+            spreadsheet.values_append(_sheet_range(sheet.title), params, {'values': values})
 
     def overwrite_sheet(self, spreadsheet_id, table, sheet_index=0, user_entered_value=False):
         """
         Replace the data in a Google sheet with a Parsons table, using the table's columns as the
         first row.
 
+        The rows are sent with the Sheets ``values.update`` API, in batches sized to fit
+        within the API's request size limit.
+
         `Args:`
             spreadsheet_id: str
                 The ID of the spreadsheet (Tip: Get this from the spreadsheet URL)
@@ -220,21 +221,59 @@ class GoogleSheets(object):
                 Otherwise, values will be entered as strings or numbers only.
         """
 
-        sheet = self._get_sheet(spreadsheet_id, sheet_index)
+        spreadsheet = self.gspread_client.open_by_key(spreadsheet_id)
+        sheet = spreadsheet.get_worksheet(sheet_index)
         sheet.clear()
 
-        value_input_option = 'RAW'
-        if user_entered_value:
-            value_input_option = 'USER_ENTERED'
+        params = {'valueInputOption': _value_input_option(user_entered_value)}
+
+        # Google sheets row numbers start at 1
+        row_num = 1
+        for values in _value_batches(itertools.chain([table.columns], table.data)):
+            spreadsheet.values_update(_sheet_range(sheet.title, row_num), params,
+                                      {'values': values})
+            row_num += len(values)
+
+
+def _value_input_option(user_entered_value):
+
+    return 'USER_ENTERED' if user_entered_value else 'RAW'
+
+
+def _sheet_range(title, row_num=1):
+
+    # Quote the title, escaping any quotes, in case it has spaces or punctuation
+    title = title.replace("'", "''")
+    return f"'{title}'!A{row_num}"
+
+
+def _cell_value(value):
+    # The API only accepts JSON values
+
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    return str(value)
+
+
+def _value_batches(rows, max_bytes=None):
+    # Splits rows into lists of values small enough to send in a single request
+
+    max_bytes = max_bytes or MAX_REQUEST_BYTES
+    batch = []
+    batch_bytes = 0
+
+    for row in rows:
+        values = [_cell_value(value) for value in row]
+        row_bytes = len(json.dumps(values))
 
-        # Add header row
-        sheet.append_row(table.columns, value_input_option=value_input_option)
+        if batch and batch_bytes + row_bytes > max_bytes:
+            yield batch
+            batch = []
+            batch_bytes = 0
 
-        cells = []
-        for row_num, row in enumerate(table.data):
-            for col_num, cell in enumerate(row):
-                # We start at row #2 to keep room for the header row we added above
-                cells.append(gspread.Cell(row_num + 2, col_num + 1, row[col_num]))
+        batch.append(values)
+        batch_bytes += row_bytes
 
-        # Update the data in one batch
-        sheet.update_cells(cells, value_input_option=value_input_option)
+    if batch:
+        yield batch
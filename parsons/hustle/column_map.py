@@ -6,3 +6,14 @@ LEAD_COLUMN_MAP = {'first_name': ['first', 'fn', 'firstname'],
                    'email': ['email_address', 'emailaddress'],
                    'follow_up': ['followup']
                    }
+
+# The lead payload field for each argument name. Columns which don't map to one of these
+# are sent as custom fields.
+LEAD_FIELDS = {'first_name': 'firstName',
+               'last_name': 'lastName',
+               'phone_number': 'phoneNumber',
+               'email': 'email',
+               'follow_up': 'followUp',
+               'notes': 'notes',
+               'tag_ids': 'tagIds'
+               }
@@ -1,15 +1,67 @@
 from parsons import Table
 from requests import request
+from parsons.etl.column_matcher import ColumnMatcher
 from parsons.utilities import check_env, json_format
 import datetime
-from parsons.hustle.column_map import LEAD_COLUMN_MAP
+from parsons.hustle.column_map import LEAD_COLUMN_MAP, LEAD_FIELDS
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
 HUSTLE_URI = 'https://api.hustle.com/v1/'
 PAGE_LIMIT = 1000
 
+# The number of leads created at once by create_leads
+LEAD_WORKERS = 8
+
+# The sustained number of requests per second create_leads makes, and the number it can
+# make in a burst
+RATE_LIMIT = 10
+RATE_BURST = 10
+
+# The number of times a lead is retried after being rate limited or a server error, and
+# the number of seconds to wait before the first retry. The wait doubles each time.
+LEAD_RETRIES = 3
+RETRY_WAIT = 1
+
+# Columns which map to lead arguments: each argument name and its LEAD_COLUMN_MAP aliases
+_LEAD_ARG_COLUMNS = {arg: [arg] + aliases for arg, aliases
+                     in dict(LEAD_COLUMN_MAP, notes=[], tag_ids=['tag_id'], group_id=[]).items()}
+
+
+class _TokenBucket(object):
+    # Allows up to ``burst`` calls at once, refilling at ``rate`` calls per second, shared
+    # by any number of threads
+
+    def __init__(self, rate, burst):
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+
+        if not self.rate:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
 
 class Hustle(object):
     """
@@ -32,7 +84,8 @@ class Hustle(object):
         self.client_id = check_env.check('HUSTLE_CLIENT_ID', client_id)
         self.client_secret = check_env.check('HUSTLE_CLIENT_SECRET', client_secret)
         self.token_expiration = None
-        self._get_auth_token(client_id, client_secret)
+        self._token_lock = threading.Lock()
+        self._get_auth_token(self.client_id, self.client_secret)
 
     def _get_auth_token(self, client_id, client_secret):
         # Generate a temporary authorization token
@@ -52,15 +105,25 @@ class Hustle(object):
         # Tokens are only valid for 7200 seconds. This checks to make sure that it has
         # not expired and generate another one if it has.
 
+        # The token is shared between threads, so only one of them refreshes it. Returns
+        # the current token.
+
         logger.debug("Checking token expiration.")
-        if datetime.datetime.now() >= self.token_expiration:
+        with self._token_lock:
+            if datetime.datetime.now() >= self.token_expiration:
 
-            logger.info("Refreshing authentication token.")
-            self._get_auth_token(self.client_id, self.client_secret)
+                logger.info("Refreshing authentication token.")
+                self._get_auth_token(self.client_id, self.client_secret)
 
-        else:
+            return self.auth_token
+
+    def _refresh_token(self, rejected_token):
+        # Refresh a token the API rejected, unless another thread already has
 
-            pass
+        with self._token_lock:
+            if self.auth_token == rejected_token:
+                logger.info("Refreshing rejected authentication token.")
+                self._get_auth_token(self.client_id, self.client_secret)
 
     def _request(self, endpoint, req_type='GET', args=None, payload=None, raise_on_error=True):
 
@@ -357,7 +420,7 @@ class Hustle(object):
         logger.info(f'Generating lead for {first_name} {last_name}.')
         return self._request(f'groups/{group_id}/leads', req_type="POST", payload=lead)
 
-    def create_leads(self, table, group_id=None):
+    def create_leads(self, table, group_id=None, max_workers=None, rate_limit=None):
         """
         Create multiple leads. All unrecognized fields will be passed as custom fields. Column
         names must map to the following names.
@@ -378,6 +441,17 @@ class Hustle(object):
               - ``email``, ``email_address``, ``emailaddress``
             * - follow_up
               - ``follow_up``, ``followup``
+            * - notes
+              - ``notes``
+            * - tag_ids
+              - ``tag_ids``, ``tag_id``. A list, or a comma separated string, of tag ids.
+            * - group_id
+              - ``group_id``
+
+        Leads are created at the same time on several threads, which share the
+        authentication token and a limit on the rate of requests. Requests which are rate
+        limited, or hit a server error, are retried. A lead which can't be created doesn't
+        stop the others.
 
         `Args:`
             table: Parsons table
@@ -385,39 +459,136 @@ class Hustle(object):
             group_id:
                 The group id to assign the leads. If ``None``, must be passed as a column
                 value.
+            max_workers: int
+                The number of leads to create at once. Defaults to 8.
+            rate_limit: float
+                The maximum number of requests per second, which can be less than 1.
+                Defaults to 10.
         `Returns:`
-            ``None``
+            Parsons Table
+                One row per lead, in the order of ``table``, with the ``row`` index, the
+                ``lead_id`` of the new lead and any ``error``.
         """
 
-        table.map_columns(LEAD_COLUMN_MAP)
-
-        arg_list = ['first_name', 'last_name', 'email', 'phone_number', 'follow_up',
-                    'tag_id', 'group_id']
-
-        for row in table:
-
-            lead = {'group_id': group_id}
+        columns = table.columns
+        build_lead = self._compile_lead_columns(columns, group_id)
+        max_workers = max_workers or LEAD_WORKERS
+
+        if rate_limit is not None and rate_limit <= 0:
+            raise ValueError('rate_limit must be greater than 0.')
+        rate_limit = rate_limit or RATE_LIMIT
+        # A bucket which holds less than one token would never allow a request
+        bucket = _TokenBucket(rate_limit, max(1, min(RATE_BURST, rate_limit)))
+
+        def create(indexed_row):
+            index, row = indexed_row
+            try:
+                lead_group_id, lead = build_lead(row)
+                return {'row': index,
+                        'lead_id': self._post_lead(lead_group_id, lead, bucket),
+                        'error': None}
+            except Exception as error:
+                return {'row': index, 'lead_id': None, 'error': str(error)}
+
+        results = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Only read ahead of the requests far enough to keep the workers busy
+            for indexed_row in enumerate(table.table.data()):
+                pending.append(executor.submit(create, indexed_row))
+                if len(pending) >= max_workers * 2:
+                    results.append(pending.popleft().result())
+
+            while pending:
+                results.append(pending.popleft().result())
+
+        errors = sum(1 for r in results if r['error'])
+        logger.info(f"Created {len(results) - errors} leads, with {errors} errors.")
+
+        return Table(results) if results else Table([['row', 'lead_id', 'error']])
+
+    @staticmethod
+    def _compile_lead_columns(columns, group_id):
+        # Match the columns to lead arguments once, returning a function which turns a row
+        # into its group id and lead payload
+
+        matcher = ColumnMatcher(_LEAD_ARG_COLUMNS, normalize=False)
+        fields = []
+        matched = set()
+        for index, (column, arg) in enumerate(zip(columns, matcher.match_all(columns))):
+            # If several columns match an argument, the first is used
+            if arg in matched:
+                arg = None
+            matched.add(arg)
+            fields.append((index, column, arg))
+
+        if not group_id and 'group_id' not in matched:
+            raise ValueError('Group Id must be passed as an argument or a column value.')
+
+        def build_lead(row):
+            lead = {}
             custom_fields = {}
-
-            # Check for column names that map to arguments, if not assign
-            # to custom fields
-            for k, v in row.items():
-                if k in arg_list:
-                    lead[k] = v
+            lead_group_id = group_id
+
+            for index, column, arg in fields:
+                value = row[index] if index < len(row) else None
+                if arg == 'group_id':
+                    lead_group_id = value or group_id
+                elif arg == 'tag_ids' and isinstance(value, str):
+                    lead['tagIds'] = [t.strip() for t in value.split(',') if t.strip()]
+                elif arg:
+                    lead[LEAD_FIELDS[arg]] = value
                 else:
-                    custom_fields[k] = v
-
-            lead['custom_fields'] = custom_fields
-
-            # Group Id check
-            if not group_id and 'group_id' not in table.columns:
-                raise ValueError('Group Id must be passed as an argument or a column value.')
-            if group_id:
-                lead['group_id'] == group_id
-
-            self.create_lead(**lead)
-
-        logger.info(f"Created {table.num_rows} leads.")
+                    custom_fields[column] = value
+
+            lead['customFields'] = custom_fields
+            lead = json_format.remove_empty_keys(lead)
+
+            for arg in ('first_name', 'phone_number'):
+                if not lead.get(LEAD_FIELDS[arg]):
+                    raise ValueError(f'Missing {arg}.')
+            if not lead_group_id:
+                raise ValueError('Missing group_id.')
+
+            return lead_group_id, lead
+
+        return build_lead
+
+    def _post_lead(self, group_id, lead, bucket):
+        # Create a lead, returning its id
+
+        url = f'{self.uri}groups/{group_id}/leads'
+        wait = RETRY_WAIT
+        retries = 0
+        refreshed = False
+
+        while True:
+            bucket.acquire()
+            token = self._token_check()
+            r = request('POST', url, json=lead, headers={'Authorization': f'Bearer {token}'})
+
+            # The token may have been revoked before it expired. Refreshing it doesn't use
+            # up one of the retries.
+            if r.status_code == 401 and not refreshed:
+                refreshed = True
+                self._refresh_token(token)
+                continue
+
+            if (r.status_code == 429 or r.status_code >= 500) and retries < LEAD_RETRIES:
+                retries += 1
+                try:
+                    delay = float(r.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    delay = wait
+                logger.debug(f'Lead request failed with {r.status_code}. Retrying in {delay}s.')
+                time.sleep(delay)
+                wait *= 2
+                continue
+
+            break
+
+        r.raise_for_status()
+        return r.json()['id']
 
     def update_lead(self, lead_id, first_name=None, last_name=None, email=None,
                     global_opt_out=None, notes=None, follow_up=None, tag_ids=None):
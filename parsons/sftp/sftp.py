@@ -1,12 +1,44 @@
+import bz2
+import gzip
+import logging
+import shutil
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+
 import paramiko
 from parsons.utilities import files
+from parsons.utilities.compression import COMPRESSION_TYPES, ParallelCompressedFile
+
+logger = logging.getLogger(__name__)
+
+# The number of files transferred at once by get_files and put_files, each over its own
+# channel on the shared connection
+TRANSFER_WORKERS = 4
+
+# The number of bytes copied to the local file at a time by get_file
+COPY_SIZE = 1024 * 1024
+
+# The buffer size of files opened with open_file. paramiko's default of 8KB makes many
+# small requests when streaming a large file.
+BUFFER_SIZE = 1024 * 1024
+
+# The seconds between keepalive packets, so an idle connection isn't dropped between polls
+KEEPALIVE_INTERVAL = 30
+
+# Errors raised when the connection to the server has been lost
+_CONNECTION_ERRORS = (paramiko.SSHException, EOFError, socket.error)
 
 
 class SFTP(object):
     """
     Instantiate SFTP Class
 
+    A single connection to the server is opened on first use and kept alive between
+    calls. If the connection drops, it is reopened and the call is retried once. Call
+    ``close`` when done, or use the class as a context manager.
+
     `Args:`
         host: str
             The host name
@@ -32,17 +64,113 @@ class SFTP(object):
         self.password = password
         self.port = port
 
-    @contextmanager
-    def _create_connection(self):
-        # Internal method to create a connection and close when it's out of scope.
-        # Make sure to use this in a ``with`` block, since it's a context manager.
+        self._transport = None
+        self._transport_lock = threading.Lock()
+        # Each thread uses its own SFTP channel on the shared transport
+        self._local = threading.local()
 
-        transport = paramiko.Transport((self.host, self.port))
-        transport.connect(username=self.username, password=self.password)
-        conn = paramiko.SFTPClient.from_transport(transport)
-        yield conn
-        conn.close()
-        transport.close()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the connection to the SFTP server. It will be reopened if the class is used
+        again.
+        """
+
+        with self._transport_lock:
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
+        self._local = threading.local()
+
+    def _get_transport(self):
+        # Internal method to return the open transport, connecting if it hasn't been opened
+        # yet or has been dropped.
+
+        with self._transport_lock:
+            if self._transport is None or not self._transport.is_active():
+                if self._transport is not None:
+                    logger.info('SFTP connection lost. Reconnecting...')
+                    self._transport.close()
+                    self._transport = None
+
+                transport = paramiko.Transport((self.host, self.port))
+                try:
+                    transport.connect(username=self.username, password=self.password)
+                except Exception:
+                    transport.close()
+                    raise
+                transport.set_keepalive(KEEPALIVE_INTERVAL)
+                self._transport = transport
+
+            return self._transport
+
+    def _get_client(self):
+        # Internal method to return this thread's SFTP channel, opening a new one if the
+        # transport has changed.
+
+        transport = self._get_transport()
+        if getattr(self._local, 'transport', None) is not transport:
+            self._local.client = paramiko.SFTPClient.from_transport(transport)
+            self._local.transport = transport
+
+        return self._local.client
+
+    def _close_client(self):
+        # Internal method to close this thread's SFTP channel
+
+        client = getattr(self._local, 'client', None)
+        if client is not None:
+            client.close()
+        self._local.client = None
+        self._local.transport = None
+
+    def _call(self, func, *args):
+        # Internal method to run ``func(client, *args)``. If the connection has been lost,
+        # reconnect and try once more. Other errors, such as a missing file, are raised.
+
+        try:
+            return func(self._get_client(), *args)
+        except _CONNECTION_ERRORS:
+            transport = getattr(self._local, 'transport', None)
+            if transport is not None and transport.is_active():
+                raise
+
+        return func(self._get_client(), *args)
+
+    def _call_many(self, func, args_list, workers=None):
+        # Internal method to run ``func(client, *args)`` for each set of args, on a pool of
+        # threads which each open their own channel.
+
+        args_list = list(args_list)
+        workers = max(1, min(workers or TRANSFER_WORKERS, len(args_list)))
+        queue = iter(args_list)
+        queue_lock = threading.Lock()
+        failed = threading.Event()
+
+        def worker():
+            try:
+                while not failed.is_set():
+                    with queue_lock:
+                        args = next(queue, None)
+                    if args is None:
+                        return
+                    self._call(func, *args)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                self._close_client()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+
+        for future in futures:
+            future.result()
 
     def list_directory(self, remote_path='.'):
         """
@@ -55,10 +183,7 @@ class SFTP(object):
             list
         """
 
-        with self._create_connection() as conn:
-            file_list = conn.listdir(path=remote_path)
-
-        return file_list
+        return self._call(lambda conn: conn.listdir(path=remote_path))
 
     def make_directory(self, remote_path):
         """
@@ -69,8 +194,7 @@ class SFTP(object):
                 The remote path of the directory
         """
 
-        with self._create_connection() as conn:
-            conn.mkdir(remote_path)
+        self._call(lambda conn: conn.mkdir(remote_path))
 
     def remove_directory(self, remote_path):
         """
@@ -81,8 +205,52 @@ class SFTP(object):
                 The remote path of the directory
         """
 
-        with self._create_connection() as conn:
-            conn.rmdir(remote_path)
+        self._call(lambda conn: conn.rmdir(remote_path))
+
+    def open_file(self, remote_path, mode='rb', prefetch=False):
+        """
+        Open a file on the SFTP server, for streaming a file without a local copy. Writes
+        are pipelined, so they don't wait on a round trip to the server for each block.
+        The file should be closed when done.
+
+        `Args:`
+            remote_path: str
+                The remote path of the file
+            mode: str
+                ``rb`` to read the file, ``wb`` to overwrite it or ``ab`` to append to it
+            prefetch: boolean
+                Request the whole file from the server up front, which makes reading all
+                of it much faster. It is downloaded in full even if only part of it is read.
+        `Returns:`
+            file object
+        """
+
+        def _open(conn):
+            remote_file = conn.open(remote_path, mode, bufsize=BUFFER_SIZE)
+            if 'r' in mode:
+                if prefetch:
+                    remote_file.prefetch(remote_file.stat().st_size)
+            else:
+                remote_file.set_pipelined(True)
+            return remote_file
+
+        return self._call(_open)
+
+    @staticmethod
+    def _get(conn, remote_path, local_path):
+        # Download with read-ahead, so many read requests are in flight at once rather
+        # than waiting on a round trip for each block.
+
+        with conn.open(remote_path, 'rb') as remote_file:
+            remote_file.prefetch(remote_file.stat().st_size)
+            with open(local_path, 'wb') as local_file:
+                shutil.copyfileobj(remote_file, local_file, COPY_SIZE)
+
+    @staticmethod
+    def _put(conn, local_path, remote_path):
+        # paramiko pipelines writes, so they don't wait on a round trip for each block
+
+        conn.put(local_path, remote_path)
 
     def get_file(self, remote_path, local_path=None):
         """
@@ -104,11 +272,40 @@ class SFTP(object):
         if not local_path:
             local_path = files.create_temp_file_for_path(remote_path)
 
-        with self._create_connection() as conn:
-            conn.get(remote_path, local_path)
+        self._call(self._get, remote_path, local_path)
 
         return local_path
 
+    def get_files(self, remote_paths, local_paths=None, workers=None):
+        """
+        Download several files from the SFTP server at once
+
+        `Args:`
+            remote_paths: list
+                The remote paths of the files to download
+            local_paths: list
+                The local paths where the files will be downloaded, in the same order as
+                ``remote_paths``. If not specified, temporary files will be created.
+            workers: int
+                The number of files to download at once. Defaults to 4.
+
+        `Returns:`
+            list
+                The paths of the local files
+        """
+
+        remote_paths = list(remote_paths)
+        if local_paths is None:
+            local_paths = [files.create_temp_file_for_path(p) for p in remote_paths]
+        else:
+            local_paths = list(local_paths)
+            if len(local_paths) != len(remote_paths):
+                raise ValueError('remote_paths and local_paths must be the same length')
+
+        self._call_many(self._get, zip(remote_paths, local_paths), workers=workers)
+
+        return local_paths
+
     def put_file(self, local_path, remote_path):
         """
         Put a file on the SFTP server
@@ -118,8 +315,28 @@ class SFTP(object):
             remote_path: str
                 The remote path of the new file
         """
-        with self._create_connection() as conn:
-            conn.put(local_path, remote_path)
+
+        self._call(self._put, local_path, remote_path)
+
+    def put_files(self, local_paths, remote_paths, workers=None):
+        """
+        Put several files on the SFTP server at once
+
+        `Args:`
+            local_paths: list
+                The local paths of the source files
+            remote_paths: list
+                The remote paths of the new files, in the same order as ``local_paths``
+            workers: int
+                The number of files to upload at once. Defaults to 4.
+        """
+
+        local_paths = list(local_paths)
+        remote_paths = list(remote_paths)
+        if len(local_paths) != len(remote_paths):
+            raise ValueError('local_paths and remote_paths must be the same length')
+
+        self._call_many(self._put, zip(local_paths, remote_paths), workers=workers)
 
     def remove_file(self, remote_path):
         """
@@ -130,8 +347,25 @@ class SFTP(object):
                 The remote path of the file
         """
 
-        with self._create_connection() as conn:
-            conn.remove(remote_path)
+        self._call(lambda conn: conn.remove(remote_path))
+
+    def file_exists(self, remote_path):
+        """
+        Check whether a file or directory exists on the SFTP server
+
+        `Args:`
+            remote_path: str
+                The remote path of the file
+        `Returns:`
+            boolean
+        """
+
+        try:
+            self._call(lambda conn: conn.stat(remote_path))
+        except FileNotFoundError:
+            return False
+
+        return True
 
     def get_file_size(self, remote_path):
         """
@@ -145,7 +379,82 @@ class SFTP(object):
                 The file size in MB.
         """
 
-        with self._create_connection() as conn:
-            size = conn.file(remote_path, 'r')._get_size()
+        size = self._call(lambda conn: conn.stat(remote_path).st_size)
 
         return size / 1024
+
+
+class SFTPFileSource(object):
+    """
+    A petl source which reads from or writes to a file on an SFTP server, streaming
+    the data rather than staging it in a local file. Files ending in ``.gz``, ``.bz2``
+    or ``.zst`` are compressed and decompressed on the fly.
+
+    `Args:`
+        sftp: SFTP
+            The SFTP connection
+        remote_path: str
+            The remote path of the file
+        prefetch: boolean
+            Request the whole file up front each time it is read. See
+            :meth:`SFTP.open_file`.
+        close_sftp: boolean
+            Close the SFTP connection whenever the source has no file open, for a source
+            which owns its connection. It is reopened the next time the file is read.
+    """
+
+    def __init__(self, sftp, remote_path, prefetch=False, close_sftp=False):
+
+        self.sftp = sftp
+        self.remote_path = remote_path
+        self.prefetch = prefetch
+        self.close_sftp = close_sftp
+        self.compression = files.compression_type_for_path(remote_path)
+        self._open_count = 0
+        self._open_lock = threading.Lock()
+
+    @contextmanager
+    def open(self, mode='rb'):
+
+        mode = mode.replace('t', '')
+        if not mode.endswith('b'):
+            mode += 'b'
+
+        with self._open_lock:
+            self._open_count += 1
+
+        try:
+            with self.sftp.open_file(self.remote_path, mode,
+                                     prefetch=self.prefetch) as remote_file:
+                if 'r' in mode:
+                    file = self._decompressed(remote_file)
+                elif self.compression in COMPRESSION_TYPES:
+                    file = ParallelCompressedFile(remote_file, self.compression, mode=mode)
+                else:
+                    file = remote_file
+
+                try:
+                    yield file
+                finally:
+                    if file is not remote_file:
+                        file.close()
+        finally:
+            with self._open_lock:
+                self._open_count -= 1
+                if self.close_sftp and not self._open_count:
+                    self.sftp.close()
+
+    def _decompressed(self, remote_file):
+
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=remote_file, mode='rb')
+
+        if self.compression == 'bzip2':
+            return bz2.BZ2File(remote_file, mode='rb')
+
+        if self.compression == 'zstd':
+            # zstandard is an optional dependency, so only import it when needed
+            import zstandard
+            return zstandard.ZstdDecompressor().stream_reader(remote_file)
+
+        return remote_file
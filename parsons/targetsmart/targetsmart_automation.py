@@ -1,6 +1,7 @@
 from parsons.sftp.sftp import SFTP
 from parsons.etl.table import Table
 from parsons.utilities.files import create_temp_file
+from concurrent.futures import ThreadPoolExecutor
 import xml.etree.ElementTree as ET
 import os
 import uuid
@@ -13,6 +14,15 @@ TS_STFP_HOST = 'sftp.targetsmart.com'
 TS_SFTP_PORT = 2222
 TS_SFTP_DIR = 'automation'
 
+# Polling starts with a short interval, which grows by the backoff factor after each
+# check up to the polling interval, so quick jobs are picked up quickly without slower
+# jobs checking too often.
+POLL_INITIAL_INTERVAL = 2
+POLL_BACKOFF = 1.5
+
+# The number of match jobs run at once by match_many
+MATCH_WORKERS = 10
+
 logger = logging.getLogger(__name__)
 
 # Automation matching documentation can be found here:
@@ -109,6 +119,57 @@ class TargetSmartAutomation(object):
         # Return file as a Table
         return tbl
 
+    def match_many(self, tables, job_type, emails=None, call_back=None, remove_files=True,
+                   max_workers=None):
+        """
+        Run several match jobs at once, for example one for each state file. Each job
+        is uploaded, polled and downloaded on its own thread, sharing one SFTP
+        connection.
+
+        Args:
+            tables: list
+                A list of Parsons Tables, or a dict mapping job names to tables
+            job_type: str
+                The match job type. **This is case sensitive.**
+            emails: list
+                A list of emails that will received status notifications
+            call_back: str
+                A callback url to which the status will be posted
+            remove_files: boolean
+                Remove each job's files from the TargetSmart FTP upon completion or
+                failure of its match.
+            max_workers: int
+                The number of jobs to run at once. Defaults to 10.
+        Returns:
+            list or dict
+                The matched tables, in the same order as ``tables``, or a dict mapping
+                job names to matched tables if ``tables`` is a dict. If any job fails,
+                the first error is raised once all of the jobs have finished.
+        """
+
+        if isinstance(tables, dict):
+            jobs = list(tables.items())
+        else:
+            jobs = [(None, table) for table in tables]
+
+        def worker(table, job_name):
+            try:
+                return self.match(table, job_type, job_name=job_name, emails=emails,
+                                  call_back=call_back, remove_files=remove_files)
+            finally:
+                # Close the SFTP channel the job opened on this thread
+                self.sftp._close_client()
+
+        with ThreadPoolExecutor(max_workers=max_workers or MATCH_WORKERS) as executor:
+            futures = [executor.submit(worker, table, job_name) for job_name, table in jobs]
+
+        results = [future.result() for future in futures]
+
+        if isinstance(tables, dict):
+            return dict(zip(tables, results))
+
+        return results
+
     def create_job_xml(self, job_type, job_name, emails=None, status_key=None, call_back=None):
         # Internal method to create a valid job xml
 
@@ -142,34 +203,48 @@ class TargetSmartAutomation(object):
         tree.write(local_path)
         return local_path
 
-    def poll_config_status(self, job_name, polling_interval=20):
-        #  Poll the configuration status
+    def _poll(self, check, polling_interval):
+        # Internal method to call ``check`` until it returns True, backing off from the
+        # initial interval up to ``polling_interval`` seconds between checks.
+
+        interval = min(POLL_INITIAL_INTERVAL, polling_interval)
 
         while True:
+            time.sleep(interval)
+            if check():
+                return True
+            interval = min(interval * POLL_BACKOFF, polling_interval)
+
+    def _file_exists(self, file_name):
+        # Internal method to check for a single file, which is much cheaper than listing
+        # the whole automation directory.
+
+        return self.sftp.file_exists(f'{self.sftp_dir}/{file_name}')
+
+    def poll_config_status(self, job_name, polling_interval=20):
+        #  Poll the configuration status
 
-            time.sleep(polling_interval)
+        def check():
             if self.config_status(job_name):
                 return True
             logger.info(f'Waiting on {job_name} job configuration...')
+            return False
 
-    def config_status(self, job_name):
-        # Check the status of the configuration by parsing the
-        # the files in the SFTP directory.
-
-        for f in self.sftp.list_directory(remote_path=self.sftp_dir):
+        return self._poll(check, polling_interval)
 
-            if f == f'{job_name}.job.xml.good':
-                logger.info(f'Match job {job_name} configured.')
-                return True
+    def config_status(self, job_name):
+        # Check the status of the configuration by looking for the files TargetSmart
+        # writes to the SFTP directory.
 
-            elif f == f'{job_name}.job.xml.bad':
-                logger.info(f'Match job {job_name} configuration error.')
-                #  To Do: Lift up the configuration error.
-                raise ValueError('Job configuration failed. If you provided an email'
-                                 'address, you will be sent more details.')
+        if self._file_exists(f'{job_name}.job.xml.good'):
+            logger.info(f'Match job {job_name} configured.')
+            return True
 
-            else:
-                pass
+        if self._file_exists(f'{job_name}.job.xml.bad'):
+            logger.info(f'Match job {job_name} configuration error.')
+            #  To Do: Lift up the configuration error.
+            raise ValueError('Job configuration failed. If you provided an email'
+                             'address, you will be sent more details.')
 
         return False
 
@@ -179,28 +254,28 @@ class TargetSmartAutomation(object):
         # and does expose some metadata. This happens regardless of anything that
         # we do. However, the actually data is only exposed on the secure SFTP.
 
-        while True:
-
+        def check():
             logger.debug('Match running...')
-            for file_name in self.sftp.list_directory(remote_path=self.sftp_dir):
+            if not self._file_exists(f'{job_name}.finish.xml'):
+                return False
 
-                if file_name == f'{job_name}.finish.xml':
+            xml_file = self.sftp.get_file(f'{self.sftp_dir}/{job_name}.finish.xml')
+            with open(xml_file, 'rb') as x:
+                xml = xmltodict.parse(x, dict_constructor=dict)
 
-                    xml_file = self.sftp.get_file(f'{self.sftp_dir}/{job_name}.finish.xml')
-                    with open(xml_file, 'rb') as x:
-                        xml = xmltodict.parse(x, dict_constructor=dict)
+            if xml['jobcontext']['state'] == 'error':
+                # To Do: Parse these in a pretty way
+                logger.info(f"Match Error: {xml['jobcontext']['errors']}")
+                raise ValueError(f"Match job failed. {xml['jobcontext']['errors']}")
 
-                    if xml['jobcontext']['state'] == 'error':
-                        # To Do: Parse these in a pretty way
-                        logger.info(f"Match Error: {xml['jobcontext']['errors']}")
-                        raise ValueError(f"Match job failed. {xml['jobcontext']['errors']}")
-
-                    elif xml['jobcontext']['state'] == 'success':
-                        logger.info('Match complete.')
+            elif xml['jobcontext']['state'] == 'success':
+                logger.info('Match complete.')
+                return True
 
-                        return True
+            return False
 
-            time.sleep(polling_interval)
+        # The finish file may already be there, so check before waiting
+        return check() or self._poll(check, polling_interval)
 
     def remove_files(self, job_name):
         # Remove all of the files for the match.
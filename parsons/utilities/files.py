@@ -1,3 +1,4 @@
+import bz2
 import errno
 import gzip
 import os
@@ -7,6 +8,8 @@ __all__ = [
     'create_temp_file',
     'create_temp_file_for_path',
     'is_gzip_path',
+    'is_bz2_path',
+    'is_zstd_path',
     'suffix_for_compression_type',
     'compression_type_for_path',
     'string_to_temp_file'
@@ -60,7 +63,7 @@ def create_temp_file_for_path(path):
     # Add the appropriate compression suffix to the file, so other libraries that check the
     # file's extension will know that it is compressed.
     # TODO Make this more robust, maybe even using the entire remote file name as the suffix.
-    suffix = '.gz' if is_gzip_path(path) else None
+    suffix = suffix_for_compression_type(compression_type_for_path(path)) or None
     return create_temp_file(suffix=suffix)
 
 
@@ -99,10 +102,24 @@ def is_zip_path(path):
     return (path[-4:] == '.zip')
 
 
+def is_bz2_path(path):
+    return (path[-4:] == '.bz2')
+
+
+def is_zstd_path(path):
+    return (path[-4:] == '.zst')
+
+
 def suffix_for_compression_type(compression):
     if compression == 'gzip':
         return '.gz'
 
+    if compression == 'bzip2':
+        return '.bz2'
+
+    if compression == 'zstd':
+        return '.zst'
+
     return ''
 
 
@@ -113,12 +130,25 @@ def compression_type_for_path(path):
     if is_zip_path(path):
         return 'zip'
 
+    if is_bz2_path(path):
+        return 'bzip2'
+
+    if is_zstd_path(path):
+        return 'zstd'
+
     return None
 
 
+def _zstd_open(path, mode):
+    # zstandard is an optional dependency, so only import it when needed. Like gzip.open
+    # and bz2.open, a mode of "r" reads bytes.
+    import zstandard
+    return zstandard.open(path, 'rb' if mode == 'r' else mode)
+
+
 def read_file(path):
     """
-    Return the contents of file. Currently support `.gz` compressed files.
+    Return the contents of file. Currently supports `.gz`, `.bz2` and `.zst` compressed files.
 
     `Args:`
         path: str
@@ -131,6 +161,8 @@ def read_file(path):
 
     open_func = {
         'gzip': gzip.open,
+        'bzip2': bz2.open,
+        'zstd': _zstd_open,
         None: open,
     }
     with open_func[compression](path, 'r') as fp:
@@ -32,6 +32,62 @@ def create_archive(archive_path, file_path, file_name=None, if_exists='replace')
     return archive_path
 
 
+class ZipEntrySource(object):
+    """
+    A petl write source which streams into a new file in an open zip archive, so the file
+    doesn't have to be written to disk first and then copied into the archive.
+
+    `Args:`
+        archive: zipfile.ZipFile
+            An archive open for writing or appending
+        file_name: str
+            The name of the file in the archive
+        zip64: boolean
+            Write ZIP64 headers, which are needed if the file is larger than 2GB. The size
+            of a streamed file isn't known up front, so they are written by default. Only
+            turn this off if the file is known to be small and the archive must be read by
+            a tool without ZIP64 support.
+    """
+
+    def __init__(self, archive, file_name, zip64=True):
+
+        self.archive = archive
+        self.file_name = file_name
+        self.zip64 = zip64
+
+    def open(self, mode='wb'):
+
+        if 'r' in mode:
+            raise ValueError('ZipEntrySource is write-only')
+
+        return self.archive.open(self.file_name, 'w', force_zip64=self.zip64)
+
+
+def open_archive(archive_path, if_exists='replace', compression_level=None):
+    """
+    Open an archive for writing.
+
+    `Args:`
+        archive_path: str
+            The file name of zip archive
+        if_exists: str
+            If archive already exists, one of 'replace' or 'append'
+        compression_level: int
+            The deflate compression level, from 0 to 9. If ``None``, files are stored
+            uncompressed.
+    `Returns:`
+        zipfile.ZipFile
+    """
+
+    write_type = 'a' if if_exists == 'append' else 'w'
+
+    if compression_level is None:
+        return zipfile.ZipFile(archive_path, write_type, compression=zipfile.ZIP_STORED)
+
+    return zipfile.ZipFile(archive_path, write_type, compression=zipfile.ZIP_DEFLATED,
+                           compresslevel=compression_level)
+
+
 def unzip_archive(archive_path):
     """
     Unzip an archive.
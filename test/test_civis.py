@@ -1,5 +1,7 @@
+import gzip
 import unittest
 import os
+from unittest import mock
 from parsons import CivisClient
 from parsons.etl.table import Table
 
@@ -47,4 +49,90 @@ class TestCivisClient(unittest.TestCase):
     def test_to_civis(self):
 
         # Test that the to_civis() method works too
-        self.tbl.to_civis('test_parsons.test_table')
\ No newline at end of file
+        self.tbl.to_civis('test_parsons.test_table')
+
+
+class TestCivisClientImport(unittest.TestCase):
+
+    def setUp(self):
+
+        with mock.patch('civis.APIClient'):
+            self.civis = CivisClient(db='db', api_key='key')
+
+        self.tbl = Table([{'id': i, 'name': f'name_{i}'} for i in range(10)])
+
+    @mock.patch('civis.io.civis_file_to_table')
+    @mock.patch('civis.io.file_to_civis')
+    def test_table_import(self, file_to_civis, civis_file_to_table):
+
+        uploaded = {}
+
+        def upload(path, name, client=None):
+            with gzip.open(path, 'rt') as f:
+                uploaded[name] = f.read()
+            return len(uploaded)
+
+        file_to_civis.side_effect = upload
+
+        self.civis.table_import(self.tbl, 'scratch.tbl', part_rows=4, max_workers=2,
+                                existing_table_rows='drop')
+
+        # Every part has its own header
+        self.assertEqual(len(uploaded), 3)
+        rows = []
+        for name in sorted(uploaded):
+            lines = uploaded[name].splitlines()
+            self.assertEqual(lines[0], 'id,name')
+            rows.extend(lines[1:])
+        self.assertEqual(rows, [f'{i},name_{i}' for i in range(10)])
+
+        args, kwargs = civis_file_to_table.call_args
+        self.assertEqual(sorted(args[0]), [1, 2, 3])
+        self.assertEqual(args[1:], ('db', 'scratch.tbl'))
+        self.assertEqual(kwargs['existing_table_rows'], 'drop')
+        self.assertTrue(kwargs['headers'])
+        civis_file_to_table.return_value.result.assert_called_once_with()
+
+    @mock.patch('civis.io._tables.run_job')
+    @mock.patch('civis.io._tables._process_cleaning_results')
+    @mock.patch('civis.io._tables._run_cleaning')
+    @mock.patch('civis.io.file_to_civis')
+    def test_table_import_request(self, file_to_civis, run_cleaning, process_cleaning_results,
+                                  run_job):
+
+        file_to_civis.side_effect = [11, 12, 13]
+        # Civis's preprocessing detects the headers, delimiter and compression of the files
+        process_cleaning_results.return_value = ([21, 22, 23], True, 'gzip', 'comma', None)
+
+        self.civis.table_import(self.tbl, 'scratch.tbl', part_rows=4)
+
+        # All of the parts are imported in a single request
+        self.assertEqual(run_cleaning.call_args[0][0], [11, 12, 13])
+        args, kwargs = self.civis.client.imports.post_files_csv.call_args
+        self.assertEqual(args[0], {'file_ids': [21, 22, 23]})
+        self.assertEqual(args[1]['table'], 'tbl')
+        self.assertEqual(kwargs['compression'], 'gzip')
+
+    @mock.patch('civis.io.civis_file_to_table')
+    @mock.patch('civis.io.file_to_civis', return_value=1)
+    def test_table_import_empty(self, file_to_civis, civis_file_to_table):
+
+        self.civis.table_import(Table([['id', 'name']]), 'scratch.tbl')
+
+        self.assertEqual(file_to_civis.call_count, 1)
+        self.assertEqual(civis_file_to_table.call_args[0][0], [1])
+
+    @mock.patch('civis.io.civis_to_csv')
+    def test_query_stream(self, civis_to_csv):
+
+        def export(path, sql, database, **kwargs):
+            with gzip.open(path, 'wt') as f:
+                f.write('id,name\n1,Jim\n2,John\n')
+            return mock.MagicMock()
+
+        civis_to_csv.side_effect = export
+
+        tbl = self.civis.query('select * from scratch.tbl', stream=True)
+
+        self.assertEqual(tbl.to_dicts(), [{'id': '1', 'name': 'Jim'}, {'id': '2', 'name': 'John'}])
+        self.assertEqual(civis_to_csv.call_args[1]['compression'], 'gzip')
@@ -23,6 +23,23 @@ class TestCrowdTangle(unittest.TestCase):
         exp_tbl = self.ct.unpack(Table(expected_posts['result']['posts']))
         assert_matching_tables(posts, exp_tbl)
 
+    @requests_mock.Mocker()
+    def test_get_posts_shape(self, m):
+
+        m.get(self.ct.uri + '/posts', json=expected_posts)
+        posts = self.ct.get_posts()
+        source = expected_posts['result']['posts']
+
+        # Nested dicts are flattened into columns, and lists are kept as they are, one row
+        # per post
+        self.assertEqual(posts.num_rows, len(source))
+        self.assertIn('statistics_actual_likeCount', posts.columns)
+        self.assertNotIn('statistics', posts.columns)
+        self.assertEqual(posts[0]['statistics_actual_likeCount'],
+                         source[0]['statistics']['actual']['likeCount'])
+        self.assertEqual(posts[0]['media'], source[0]['media'])
+        self.assertEqual(posts[0]['expandedLinks'], source[0]['expandedLinks'])
+
     @requests_mock.Mocker()
     def test_get_leaderboard(self, m):
 
@@ -31,6 +48,10 @@ class TestCrowdTangle(unittest.TestCase):
         exp_tbl = self.ct.unpack(Table(expected_leaderboard['result']['accountStatistics']))
         assert_matching_tables(leaderboard, exp_tbl)
 
+        # Keys missing from the first row are still flattened
+        self.assertIn('breakdown_status_postCount', leaderboard.columns)
+        self.assertNotIn('breakdown_status', leaderboard.columns)
+
     @requests_mock.Mocker()
     def test_get_links(self, m):
 
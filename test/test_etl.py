@@ -1,10 +1,19 @@
 import unittest
+from unittest.mock import patch
 import petl
 from parsons.etl.table import Table
 import os
 import shutil
+import csv
+import datetime
+from decimal import Decimal
+import io
+import zipfile
+import fastavro
 from test.utils import assert_matching_tables
 from parsons.utilities import zip_archive
+from parsons.etl.avro_writer import avro_schema
+from parsons.etl.column_matcher import ColumnMatcher, edit_distance
 
 
 class TestParsonsTable(unittest.TestCase):
@@ -53,6 +62,17 @@ class TestParsonsTable(unittest.TestCase):
         tbl = Table(ptbl)
         self.assertEqual(tbl.num_rows, nrows)
 
+    def test_from_petl_is_lazy(self):
+
+        # Test that creating a Table only reads the header of a petl table
+        class HeaderOnlyView(petl.Table):
+            def __iter__(self):
+                yield ('a', 'b')
+                raise AssertionError('Table data was read')
+
+        tbl = Table(HeaderOnlyView())
+        self.assertEqual(tbl.columns, ['a', 'b'])
+
     def test_from_invalid_list(self):
 
         # Tests that a table can't be created from a list of invalid items
@@ -179,6 +199,27 @@ class TestParsonsTable(unittest.TestCase):
         self._assert_expected_csv(path, self.tbl)
         os.remove(path)
 
+    def test_to_csv_matches_csv_module(self):
+        path = 'tmp/test.csv'
+        tbl = Table([('a', 'b', 'c'),
+                     (1, 'x, y', None),
+                     (2.5, 'say "hi"', datetime.date(2020, 1, 2)),
+                     (True, 'two\nlines', datetime.datetime(2020, 1, 2, 3, 4)),
+                     (None, '', {'key': 'value'})])
+        tbl.to_csv(path)
+
+        buf = io.StringIO()
+        csv.writer(buf).writerows(tbl.table)
+        with open(path, newline='') as f:
+            self.assertEqual(f.read(), buf.getvalue())
+        os.remove(path)
+
+    def test_to_from_csv_bz2(self):
+        path = 'tmp/test.csv.bz2'
+        self.tbl.to_csv(path)
+        self._assert_expected_csv(path, self.tbl)
+        os.remove(path)
+
     def test_to_from_temp_csv(self):
         path = self.tbl.to_csv()
         self._assert_expected_csv(path, self.tbl)
@@ -229,6 +270,30 @@ class TestParsonsTable(unittest.TestCase):
             os.unlink('myzip.zip')
             os.unlink('myzip.csv')
 
+    def test_to_zip_csv_compressed(self):
+        path = 'tmp/myzip.zip'
+        self.tbl.to_zip_csv(path, csv_name='first.csv', compression_level=9)
+        self.tbl.to_zip_csv(path, csv_name='second.csv', if_exists='append', zip64=False,
+                            delimiter='|')
+
+        with zipfile.ZipFile(path) as z:
+            self.assertEqual(z.getinfo('first.csv').compress_type, zipfile.ZIP_DEFLATED)
+            result_tbl = Table.from_csv_string(z.read('first.csv').decode())
+            assert_matching_tables(self.tbl, result_tbl)
+            self.assertEqual(z.read('second.csv').splitlines()[0], b'first|last')
+        os.remove(path)
+
+    def test_to_zip_csv_zip64(self):
+        # ZIP64 headers are written by default, so an entry can grow past 2GB
+        path = 'tmp/myzip64.zip'
+        with patch('zipfile.ZIP64_LIMIT', 10):
+            self.tbl.to_zip_csv(path)
+
+        with zipfile.ZipFile(path) as z:
+            result_tbl = Table.from_csv_string(z.read('myzip64.csv').decode())
+            assert_matching_tables(self.tbl, result_tbl)
+        os.remove(path)
+
     def test_to_civis(self):
 
         # Not really sure the best way to do this at the moment.
@@ -250,6 +315,12 @@ class TestParsonsTable(unittest.TestCase):
         assert_matching_tables(self.tbl, result_tbl)
         os.remove(path)
 
+    def test_to_from_temp_json_bz2(self):
+        path = self.tbl.to_json(temp_file_compression='bzip2')
+        assert path.endswith('.json.bz2')
+        result_tbl = Table.from_json(path)
+        assert_matching_tables(self.tbl, result_tbl)
+
     def test_to_from_temp_json(self):
         path = self.tbl.to_json()
         result_tbl = Table.from_json(path)
@@ -276,6 +347,22 @@ class TestParsonsTable(unittest.TestCase):
         assert_matching_tables(self.tbl, result_tbl)
         os.remove(path)
 
+    def test_from_json_streaming(self):
+        path = 'tmp/test.json'
+        tbl = Table(self.lst + [{'a': 16, 'b': None, 'c': 'x, ]'}])
+        tbl.to_json(path)
+
+        # Parse the file a few characters at a time, so rows are split across chunks
+        with patch('parsons.etl.json_reader.CHUNK_SIZE', 7):
+            assert_matching_tables(tbl, Table.from_json(path))
+
+        # Test that the header can be given
+        result_tbl = Table.from_json(path, header=['c', 'a'])
+        self.assertEqual(result_tbl.columns, ['c', 'a'])
+        self.assertEqual(result_tbl[0], {'c': 3, 'a': 1})
+        # The view still has petl's header method
+        self.assertEqual(result_tbl.table.header(), ('c', 'a'))
+
     def test_columns(self):
         # Test that columns are listed correctly
         self.assertEqual(self.tbl.columns, ['first', 'last'])
@@ -394,6 +481,58 @@ class TestParsonsTable(unittest.TestCase):
         test_table.unpack_dict('b', prepend=False)
         self.assertEqual(test_table.columns, ['a', 'nest1', 'nest2'])
 
+        # Test that the column name is prepended, and that null values are unpacked
+        test_table = Table([{'a': 1, 'b': {'nest1': 1, 'nest2': 2}}, {'a': 2, 'b': None}])
+        test_table.unpack_dict('b')
+        self.assertEqual(test_table.columns, ['a', 'b_nest1', 'b_nest2'])
+        self.assertEqual(test_table[1], {'a': 2, 'b_nest1': None, 'b_nest2': None})
+
+    def test_flatten(self):
+
+        tbl = Table([{'id': 1, 'address': {'city': 'Austin', 'geo': {'lat': 30.3}}, 'tags': [1]},
+                     {'id': 2, 'address': None, 'tags': None}])
+
+        # Test that all levels of nested dicts are flattened in place
+        flat = Table(tbl.table).flatten()
+        self.assertEqual(flat.columns, ['id', 'address_city', 'address_geo_lat', 'tags'])
+        self.assertEqual(flat[0], {'id': 1, 'address_city': 'Austin', 'address_geo_lat': 30.3,
+                                   'tags': [1]})
+        self.assertEqual(flat[1], {'id': 2, 'address_city': None, 'address_geo_lat': None,
+                                   'tags': None})
+
+        # Test max depth and the separator
+        flat = Table(tbl.table).flatten(max_depth=1, sep='.')
+        self.assertEqual(flat.columns, ['id', 'address.city', 'address.geo', 'tags'])
+
+        # Test that keys outside of the sample are found when scanning the whole table
+        tbl = Table([{'id': 1, 'address': {'city': 'Austin'}}, {'id': 2, 'address': {'zip': 1}}])
+        self.assertEqual(Table(tbl.table).flatten(sample_size=1).columns, ['id', 'address_city'])
+        self.assertEqual(Table(tbl.table).flatten(sample_size=None).columns,
+                         ['id', 'address_city', 'address_zip'])
+
+    def test_flatten_tables(self):
+
+        tbl = Table([{'id': 1,
+                      'name': {'first': 'Jane', 'phones': ['512-699-3334']},
+                      'emails': [{'type': 'home', 'address': 'jane@mail.com'}, None]},
+                     {'id': 2,
+                      'name': None,
+                      'emails': [{'type': 'work', 'address': 'bob@work.com', 'primary': True}]}])
+
+        children = tbl.flatten_tables('id')
+
+        self.assertEqual(tbl.to_dicts(), [{'id': 1, 'name_first': 'Jane'},
+                                          {'id': 2, 'name_first': None}])
+
+        self.assertEqual(sorted(children.keys()), ['emails', 'name_phones'])
+        self.assertEqual(children['name_phones'].to_dicts(),
+                         [{'id': 1, 'name_phones': '512-699-3334'}])
+        self.assertEqual(children['emails'].to_dicts(), [
+            {'id': 1, 'emails_type': 'home', 'emails_address': 'jane@mail.com',
+             'emails_primary': None},
+            {'id': 2, 'emails_type': 'work', 'emails_address': 'bob@work.com',
+             'emails_primary': True}])
+
     def test_unpack_list(self):
 
         test_table = Table([{'a': 1, 'b': [1, 2, 3]}])
@@ -439,6 +578,13 @@ class TestParsonsTable(unittest.TestCase):
         # Check that the uids are unique, indicating that each row is unique
         self.assertEqual(len({row['uid'] for row in standalone}), 11)
 
+        # Check that the uids are built from the key and the position of the value
+        self.assertEqual(standalone[0], {'uid': '1_0', 'id': 1, 'nested': 'A', 'value': 1})
+        self.assertEqual(standalone[10], {'uid': '5_3', 'id': 5, 'nested': '3', 'value': 'list!'})
+
+        # Check that the column was removed from the original
+        self.assertEqual(test_table.columns, ['id', 'extra'])
+
     def test_unpack_nested_columns_as_rows_expanded(self):
 
         test_table = Table([
@@ -460,6 +606,16 @@ class TestParsonsTable(unittest.TestCase):
         # Check that the uids are unique, indicating that each row is unique
         self.assertEqual(len({row['uid'] for row in expanded}), 12)
 
+        # Check that rows without nested values are passed through
+        self.assertEqual(expanded[6], {'uid': '3_0', 'id': 3, 'extra': 'hi', 'nested': 'string!',
+                                       'nested_value': None})
+
+        # Check that unpacking again extends the existing uids
+        expanded_again = Table([{'uid': '1_0', 'nested': ['a', 'b']}])
+        expanded_again = expanded_again.unpack_nested_columns_as_rows('nested',
+                                                                      expand_original=True)
+        self.assertEqual([row['uid'] for row in expanded_again], ['1_0_0', '1_0_1'])
+
     def test_cut(self):
 
         # Test that the cut works correctly
@@ -626,6 +782,37 @@ class TestParsonsTable(unittest.TestCase):
         tbl.match_columns(desired_tbl.columns)
         assert_matching_tables(desired_tbl, tbl)
 
+    def test_to_avro(self):
+        path = 'tmp/test.avro'
+        tbl = Table([('id', 'name', 'signup', 'first name', 'amount'),
+                     (1, 'Bob', datetime.date(2020, 1, 2), {'a': 1}, Decimal('1234.5')),
+                     (2.5, None, None, None, Decimal('-0.01'))])
+        tbl.to_avro(path)
+
+        with open(path, 'rb') as f:
+            reader = fastavro.reader(f)
+            fields = {field['name']: field['type'] for field in reader.writer_schema['fields']}
+            records = list(reader)
+
+        self.assertEqual(fields['id'], ['null', 'double'])
+        self.assertEqual(fields['first_name'], ['null', 'string'])
+        self.assertEqual(fields['amount'], ['null', {'type': 'bytes', 'logicalType': 'decimal',
+                                                     'precision': 6, 'scale': 2}])
+        self.assertEqual(records, [
+            {'id': 1.0, 'name': 'Bob', 'signup': datetime.date(2020, 1, 2),
+             'first_name': '{"a": 1}', 'amount': Decimal('1234.50')},
+            {'id': 2.5, 'name': None, 'signup': None, 'first_name': None,
+             'amount': Decimal('-0.01')}])
+        os.remove(path)
+
+    def test_avro_schema_sample_size(self):
+        tbl = Table([('id',), (1,), ('a',)])
+
+        self.assertEqual(avro_schema(tbl.table, sample_size=1)['fields'][0]['type'],
+                         ['null', 'long'])
+        self.assertEqual(avro_schema(tbl.table, sample_size=None)['fields'][0]['type'],
+                         ['null', 'string'])
+
     def test_to_dicts(self):
         self.assertEqual(self.lst, Table(self.lst).to_dicts())
         self.assertEqual(self.lst_dicts, self.tbl.to_dicts())
@@ -667,6 +854,26 @@ class TestParsonsTable(unittest.TestCase):
 
         assert_matching_tables(input_tbl, expected_tbl)
 
+        # Two columns can't be mapped to the same name
+        tbl = Table([['fn', 'first'], ['J', 'J']])
+        self.assertRaises(ValueError, tbl.map_columns, column_map)
+
+    def test_match_columns_ignore_extra(self):
+
+        tbl = Table([['x', 'LAST NAME', 'first name'], [1, 'Doe', 'Jane']])
+        tbl.match_columns(['first_name', 'middle_name', 'last_name'], if_extra_columns='ignore')
+        self.assertEqual(tbl.columns, ['first_name', 'middle_name', 'last_name', 'x'])
+        self.assertEqual(list(tbl.data[0]), ['Jane', None, 'Doe', 1])
+
+    def test_rename_columns(self):
+
+        tbl = Table([['a', 'b', 'c'], [1, 2, 3]])
+        tbl.rename_columns({'a': 'x', 'c': 'z'})
+        self.assertEqual(tbl.columns, ['x', 'b', 'z'])
+        self.assertEqual(tbl.first, 1)
+
+        self.assertRaises(ValueError, tbl.rename_columns, {'x': 'b'})
+
     def test_get_column_max_with(self):
 
         tbl = Table([['a', 'b'], ['wide_text', False], ['text', 2]])
@@ -676,3 +883,154 @@ class TestParsonsTable(unittest.TestCase):
 
         # Doesn't break for non-strings
         self.assertEqual(tbl.get_column_max_width('b'), 5)
+
+    def test_get_columns_max_width(self):
+
+        tbl = Table([['a', 'b', 'c'], ['wide_text', False, 'x'], ['text', 2]])
+
+        self.assertEqual(tbl.get_columns_max_width(), {'a': 9, 'b': 5, 'c': 1})
+        self.assertEqual(tbl.get_columns_max_width(['b']), {'b': 5})
+
+    def test_join(self):
+
+        voters = Table([['id', 'name'], [1, 'Jane'], [2, 'Bob'], [3, 'Ann']])
+        emails = Table([['voter_id', 'email'], [3, 'ann@mail.com'], [1, 'jane@mail.com'],
+                        [1, 'jane@work.com']])
+
+        expected = [{'id': 1, 'name': 'Jane', 'email': 'jane@mail.com'},
+                    {'id': 1, 'name': 'Jane', 'email': 'jane@work.com'},
+                    {'id': 3, 'name': 'Ann', 'email': 'ann@mail.com'}]
+
+        # Hash join keeps the order of the left table
+        tbl = Table(voters.table).join(emails, 'id', right_on='voter_id')
+        self.assertEqual(tbl.to_dicts(), expected)
+
+        # Test that it spills to a sort-merge join if the right table is too big
+        tbl = Table(voters.table).join(emails, 'id', right_on='voter_id', buffersize=1)
+        self.assertEqual(tbl.to_dicts(), expected)
+
+    def test_left_join(self):
+
+        voters = Table([['id', 'name'], [1, 'Jane'], [2, 'Bob']])
+        emails = Table([['id', 'email'], [1, 'jane@mail.com']])
+
+        expected = [{'id': 1, 'name': 'Jane', 'email': 'jane@mail.com'},
+                    {'id': 2, 'name': 'Bob', 'email': None}]
+
+        self.assertEqual(Table(voters.table).left_join(emails, 'id').to_dicts(), expected)
+        self.assertEqual(
+            Table(voters.table).left_join(emails, 'id', buffersize=1).to_dicts(), expected)
+
+    def test_anti_join(self):
+
+        voters = Table([['id', 'name'], [1, 'Jane'], [2, 'Bob'], [3, 'Ann']])
+        opt_outs = Table([['id'], [1], [3]])
+
+        expected = [{'id': 2, 'name': 'Bob'}]
+
+        self.assertEqual(Table(voters.table).anti_join(opt_outs, 'id').to_dicts(), expected)
+        self.assertEqual(
+            Table(voters.table).anti_join(opt_outs, 'id', buffersize=1).to_dicts(), expected)
+
+    def test_deduplicate(self):
+
+        tbl = Table([['id', 'name'], [3, 'Ann'], [1, 'Jane'], [3, 'Annie'], [2, 'Bob'],
+                     [1, 'Jane']])
+
+        # Dedupe on the whole row
+        self.assertEqual(Table(tbl.table).deduplicate().num_rows, 4)
+
+        # Dedupe on a key, keeping the first row in order
+        expected = [{'id': 3, 'name': 'Ann'}, {'id': 1, 'name': 'Jane'}, {'id': 2, 'name': 'Bob'}]
+        self.assertEqual(Table(tbl.table).deduplicate('id').to_dicts(), expected)
+
+        # Test that rows past the memory limit are still deduplicated
+        expected = [{'id': 3, 'name': 'Ann'}, {'id': 1, 'name': 'Jane'}, {'id': 2, 'name': 'Bob'}]
+        self.assertEqual(Table(tbl.table).deduplicate('id', buffersize=2).to_dicts(), expected)
+
+    def test_group_by(self):
+
+        tbl = Table([['state', 'age'], ['TX', 30], ['MA', 40], ['TX', 50]])
+
+        expected = [{'state': 'TX', 'count': 2, 'max_age': 50, 'ages': [30, 50]},
+                    {'state': 'MA', 'count': 1, 'max_age': 40, 'ages': [40]}]
+
+        grouped = tbl.group_by('state').agg(count=('age', len), max_age=('age', max), ages='age')
+        self.assertEqual(grouped.to_dicts(), expected)
+
+        # Test the sort-based fallback, which returns the groups sorted
+        grouped = tbl.group_by('state', buffersize=1).agg(
+            count=('age', len), max_age=('age', max), ages='age')
+        self.assertEqual(grouped.to_dicts(), list(reversed(expected)))
+
+        # The fallback depends on the number of groups, not rows, so a table with more rows
+        # than the buffer but few groups is still grouped in memory, in first seen order
+        grouped = tbl.group_by('state', buffersize=2).agg(
+            count=('age', len), max_age=('age', max), ages='age')
+        self.assertEqual(grouped.to_dicts(), expected)
+
+    def test_sort(self):
+
+        tbl = Table([['a', 'b'], [3, 'x'], [1, 'y'], [None, 'z'], [2, 'w'], [1, 'v']])
+
+        # Sorted in memory. The sort is stable and puts None first, like petl.
+        expected = [[None, 'z'], [1, 'y'], [1, 'v'], [2, 'w'], [3, 'x']]
+        self.assertEqual([list(row) for row in Table(tbl.table).sort('a').data], expected)
+
+        # Sorted in runs spilled to disk, merged in multiple passes
+        with patch('parsons.etl.external_sort.MERGE_FAN_IN', 2):
+            sorted_tbl = Table(tbl.table).sort('a', buffersize=1, tempdir='tmp')
+            self.assertEqual([list(row) for row in sorted_tbl.data], expected)
+
+        # Reverse sort on all columns
+        expected = [[3, 'x'], [2, 'w'], [1, 'y'], [1, 'v'], [None, 'z']]
+        sorted_tbl = Table(tbl.table).sort(reverse=True, buffersize=2)
+        self.assertEqual([list(row) for row in sorted_tbl.data], expected)
+
+        # The header is available without sorting the table
+        self.assertEqual(Table(tbl.table).sort('a').columns, ['a', 'b'])
+
+
+class TestColumnMatcher(unittest.TestCase):
+
+    def setUp(self):
+
+        self.matcher = ColumnMatcher({'first_name': ['fn', 'first', 'first name'],
+                                      'last_name': ['ln', 'last', 'surname']})
+
+    def test_match(self):
+
+        self.assertEqual(self.matcher.match('First Name'), 'first_name')
+        self.assertEqual(self.matcher.match('FN'), 'first_name')
+        self.assertEqual(self.matcher.match('sur-name'), 'last_name')
+        self.assertIsNone(self.matcher.match('dob'))
+        # Target names in a dict only match the aliases they are given
+        self.assertIsNone(self.matcher.match('Last Name'))
+
+        self.assertEqual(self.matcher.match_all(['LN', 'dob']), ['last_name', None])
+        self.assertEqual(self.matcher.rename_map(['first_name', 'LAST', 'dob']),
+                         {'LAST': 'last_name'})
+
+    def test_match_without_normalizing(self):
+
+        matcher = ColumnMatcher(['first_name'], normalize=False)
+        self.assertEqual(matcher.match('first_name'), 'first_name')
+        self.assertIsNone(matcher.match('First Name'))
+
+    def test_fuzzy_match(self):
+
+        matcher = ColumnMatcher({'first_name': ['fn', 'first', 'first name'],
+                                 'last_name': ['ln', 'last', 'surname']}, max_distance=2)
+
+        self.assertEqual(matcher.match('frist_name'), 'first_name')
+        self.assertEqual(matcher.match('surnme'), 'last_name')
+        self.assertIsNone(matcher.match('phone'))
+        # Repeated lookups are cached
+        self.assertEqual(matcher.match('frist_name'), 'first_name')
+
+    def test_edit_distance(self):
+
+        self.assertEqual(edit_distance('kitten', 'sitting'), 3)
+        self.assertEqual(edit_distance('', 'abc'), 3)
+        self.assertEqual(edit_distance('abc', 'abc'), 0)
+        self.assertEqual(edit_distance('kitten', 'sitting', max_distance=1), 2)
@@ -1,8 +1,10 @@
 import unittest
 import warnings
 import os
+from unittest import mock
 
-from parsons.facebook_ads.facebook_ads import FacebookAds
+from facebook_business.adobjects.customaudience import CustomAudience
+from parsons.facebook_ads.facebook_ads import FacebookAds, _hash_batch
 from parsons.etl.table import Table
 
 users_table = Table([
@@ -72,6 +74,8 @@ class TestFacebookAdsUtilities(unittest.TestCase):
 
     def test_get_preprocess_key_for_column(self):
         self.assertEqual('DOB YYYYMMDD', FacebookAds._get_preprocess_key_for_column('vb_voterbase_dob'))
+        # The key itself isn't one of its aliases
+        self.assertIsNone(FacebookAds._get_preprocess_key_for_column('DOB YYYYMMDD'))
 
     def test_get_match_table_for_users_table(self):
         # This tests basic column matching, as well as the more complex cases like:
@@ -97,13 +101,52 @@ class TestFacebookAdsUtilities(unittest.TestCase):
         self.assertEqual("", row1["DOBD"])
 
 
-    def test_get_match_schema_and_data(self):
-        match_table = Table([
-            {"FN": "Bob", "LN": "Smith"},
-            {"FN": "Sue", "LN": "Doe"},
-        ])
-        (schema, data) = FacebookAds._get_match_schema_and_data(match_table)
-        self.assertEqual(["FN", "LN"], schema)
-        self.assertEqual(("Bob", "Smith"), data[0])
-        self.assertEqual(("Sue", "Doe"), data[1])
+    def test_get_match_table_leaves_source_table(self):
+        columns = users_table.columns
+        FacebookAds.get_match_table_for_users_table(users_table)
+        self.assertEqual(columns, users_table.columns)
 
+    def test_hash_batch_matches_sdk(self):
+        schema = ["FN", "LN", "PHONE", "GEN", "DOBM"]
+        rows = [(" JoSH ", "Smith-Jones", "(123) 456-7890", "Male", "4"),
+                ("", "", "", "", "")]
+        expected = CustomAudience.format_params(schema, rows, is_raw=True)['payload']['data']
+        self.assertEqual(expected, _hash_batch(schema, rows))
+
+
+class TestFacebookAdsUpload(unittest.TestCase):
+
+    def setUp(self):
+
+        self.fb_ads = FacebookAds(app_id='id', app_secret='secret', access_token='token',
+                                  ad_account_id='123')
+        self.users = Table([{"first": f"Name{i}", "last": "Smith"} for i in range(25)])
+
+    @mock.patch.object(CustomAudience, 'add_users')
+    def test_add_users_to_custom_audience(self, add_users):
+
+        add_users.return_value.json.return_value = {
+            'num_received': 10, 'num_invalid_entries': 0}
+
+        results = self.fb_ads.add_users_to_custom_audience('999', self.users, batch_size=10,
+                                                           max_workers=2, hash_processes=2)
+
+        self.assertEqual(add_users.call_count, 3)
+        self.assertEqual(list(results.table.values('batch')), [0, 1, 2])
+        self.assertEqual(list(results.table.values('users')), [10, 10, 5])
+        self.assertEqual(list(results.table.values('error')), [None, None, None])
+
+        schema, hashed = add_users.call_args_list[0][0]
+        self.assertEqual(schema, ["FN", "LN"])
+        self.assertEqual(hashed[0], _hash_batch(schema, [("Name0", "Smith")])[0])
+        self.assertTrue(add_users.call_args_list[0][1]['pre_hashed'])
+
+    @mock.patch.object(CustomAudience, 'add_users')
+    def test_add_users_to_custom_audience_failed_batch(self, add_users):
+
+        add_users.side_effect = [mock.MagicMock(), Exception('Bad batch'), mock.MagicMock()]
+
+        results = self.fb_ads.add_users_to_custom_audience('999', self.users, batch_size=10,
+                                                           max_workers=1, hash_processes=1)
+
+        self.assertEqual(list(results.table.values('error')), [None, 'Bad batch', None])
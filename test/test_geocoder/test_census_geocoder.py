@@ -1,8 +1,15 @@
 import unittest
 import os
+import csv
+import shutil
+import io
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest import mock
 from parsons import CensusGeocoder, Table
 import petl
+import requests
 from test_responses import *
 from test.utils import assert_matching_tables
 
@@ -59,7 +66,15 @@ class TestCensusGeocoder(unittest.TestCase):
 
         tbl = Table(batch)
 
-        self.cg.cg.addressbatch = mock.MagicMock(return_value=batch_resp)
+        # Answer each batch from the canned responses, by address
+        by_address = {r['address']: r for r in batch_resp}
+
+        def addressbatch(data):
+            return [dict(by_address[', '.join(d[f] for f in ('street', 'city', 'state', 'zip'))],
+                         id=d['id'])
+                    for d in data]
+
+        self.cg.cg.addressbatch = mock.MagicMock(side_effect=addressbatch)
         geo = self.cg.geocode_address_batch(tbl)
         assert_matching_tables(geo, Table(petl.fromdicts(batch_resp)))
 
@@ -69,3 +84,126 @@ class TestCensusGeocoder(unittest.TestCase):
         self.cg.cg.address = mock.MagicMock(return_value=coord_resp)
         geo = self.cg.get_coordinates_data('38.8884212', '-77.0441907')
         self.assertEqual(geo, coord_resp)
+
+
+class CensusStubHandler(BaseHTTPRequestHandler):
+    # A local stand in for the Census batch geocoder. Addresses on "Nowhere" streets
+    # don't match.
+
+    requests = []
+
+    def do_POST(self):
+
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body)
+        address_file = [part for part in message.get_payload()
+                        if part.get_param('name', header='content-disposition') == 'addressFile']
+        rows = list(csv.reader(io.StringIO(address_file[0].get_payload(decode=True).decode())))
+        CensusStubHandler.requests.append(rows)
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for row_id, street, city, state, zipcode in rows:
+            address = f'{street}, {city}, {state}, {zipcode}'
+            if 'nowhere' in street.lower():
+                writer.writerow([row_id, address, 'No_Match'])
+            else:
+                writer.writerow([row_id, address, 'Match', 'Exact', address.upper(),
+                                 '-87.6943,41.897907', '605058427', 'L', '17', '031',
+                                 '242600', '4008'])
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(out.getvalue().encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCensusGeocoderBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.server = HTTPServer(('localhost', 0), CensusStubHandler)
+        cls.url = f'http://localhost:{cls.server.server_port}/geocoder'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+
+        CensusStubHandler.requests = []
+        os.mkdir('tmp')
+        self.cache_path = 'tmp/geocode_cache.db'
+        self.tbl = Table([['id', 'street', 'city', 'state', 'zip'],
+                          ['1', '908 N Washtenaw', 'Chicago', 'IL', '60622'],
+                          ['2', '1405 Wilshire Blvd', 'Austin', 'TX', '78722'],
+                          ['3', '908 n. washtenaw', 'CHICAGO', 'IL', '60622'],
+                          ['4', '1 Nowhere St', 'Austin', 'TX', '78722'],
+                          ['5', '100 Main St', 'Springfield', 'IL', '62701']])
+
+    def tearDown(self):
+
+        shutil.rmtree('tmp')
+
+    def test_geocode_address_batch(self):
+
+        cg = CensusGeocoder(url=self.url)
+        geo = cg.geocode_address_batch(self.tbl, batch_size=2, max_in_flight=2)
+
+        # Repeated addresses are only sent once
+        self.assertEqual(sorted(len(r) for r in CensusStubHandler.requests), [2, 2])
+
+        self.assertEqual(list(geo.table.values('id')), ['1', '2', '3', '4', '5'])
+        self.assertEqual(list(geo.table.values('match')), [True, True, True, False, True])
+        self.assertEqual(list(geo.table.values('tract'))[0], '242600')
+        self.assertEqual(list(geo.table.values('address'))[0], list(geo.table.values('address'))[2])
+
+    def test_geocode_address_batch_cache(self):
+
+        cg = CensusGeocoder(url=self.url, cache_path=self.cache_path)
+        first = cg.geocode_address_batch(self.tbl)
+        self.assertEqual(len(CensusStubHandler.requests), 1)
+
+        # Only the new address is sent
+        changed = Table([['id', 'street', 'city', 'state', 'zip'],
+                         ['1', '908 N Washtenaw', 'Chicago', 'IL', '60622'],
+                         ['6', '200 Main St', 'Springfield', 'IL', '62701']])
+        cg = CensusGeocoder(url=self.url, cache_path=self.cache_path)
+        second = cg.geocode_address_batch(changed)
+
+        self.assertEqual(CensusStubHandler.requests[1],
+                         [['0', '200 Main St', 'Springfield', 'IL', '62701']])
+        self.assertEqual(second.first, first.first)
+        self.assertEqual(list(second.table.values('parsed'))[0],
+                         list(first.table.values('parsed'))[0])
+        self.assertEqual(list(second.table.values('id')), ['1', '6'])
+
+    @mock.patch('parsons.geocode.census_geocoder.RETRY_WAIT', 0)
+    def test_geocode_address_batch_retries(self):
+
+        cg = CensusGeocoder(url=self.url)
+        addressbatch = cg.cg.addressbatch
+        attempts = []
+
+        def flaky_addressbatch(data):
+            attempts.append(data)
+            if len(attempts) < 3:
+                raise requests.exceptions.ConnectionError()
+            return addressbatch(data)
+
+        cg.cg.addressbatch = flaky_addressbatch
+        geo = cg.geocode_address_batch(self.tbl)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(geo.num_rows, 5)
+
+        # Give up once the retries are used up
+        attempts.clear()
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          cg.geocode_address_batch, self.tbl, retries=1)
@@ -1,20 +1,37 @@
+import datetime
 import os
+import pickle
 import unittest
 import unittest.mock as mock
+from decimal import Decimal
+import fastavro
 from google.cloud import bigquery
 from google.cloud import exceptions
 from parsons.google.google_bigquery import GoogleBigQuery
 from parsons import Table
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 
 # Test class to fake the RowIterator interface for BigQuery job results
 class FakeResults:
-    def __init__(self, data):
+    def __init__(self, data, page_size=1):
         self.data = data
         self.total_rows = len(data)
+        self.page_size = page_size
+
+        names = list(data[0].keys()) if data else []
+        self.schema = [bigquery.SchemaField(name, 'STRING') for name in names]
+        self.field_to_index = {name: i for i, name in enumerate(names)}
 
-    def __iter__(self):
-        return iter(self.data)
+    @property
+    def pages(self):
+        rows = [bigquery.Row(tuple(row.values()), self.field_to_index) for row in self.data]
+        for i in range(0, len(rows), self.page_size):
+            yield iter(rows[i:i + self.page_size])
 
 
 class TestGoogleBigQuery(unittest.TestCase):
@@ -36,6 +53,62 @@ class TestGoogleBigQuery(unittest.TestCase):
         self.assertEqual(result.columns, ['one', 'two'])
         self.assertEqual(result[0], {'one': 1, 'two': 2})
 
+    def test_query__paged(self):
+        data = [{'one': i, 'two': str(i)} for i in range(5)]
+        bq = self._build_mock_client_for_querying(data)
+
+        result = bq.query('select * from table', page_size=2, max_results=10)
+
+        self.assertEqual(result.columns, ['one', 'two'])
+        self.assertEqual(result.to_dicts(), data)
+        # The cached results can be read more than once
+        self.assertEqual(result.num_rows, 5)
+        bq.client.query.return_value.result.assert_called_with(page_size=2, max_results=10)
+
+    def test_query__pages_cached_as_rows(self):
+        tz = datetime.timezone(datetime.timedelta(hours=-5))
+        data = [{'one': Decimal('1.50'), 'two': datetime.datetime(2020, 1, 1, tzinfo=tz)},
+                {'one': Decimal('2'), 'two': None}]
+        bq = self._build_mock_client_for_querying(data)
+
+        result = bq.query('select * from table')
+
+        # Without to_arrow_iterable, each page is cached as plain rows, so values come
+        # back exactly as the client library returned them
+        self.assertEqual(result.to_dicts(), data)
+        self.assertEqual(str(result[0]['one']), '1.50')
+        self.assertEqual(result[0]['two'].tzinfo, tz)
+        with open(result.table.path, 'rb') as file:
+            self.assertEqual(pickle.load(file), [tuple(data[0].values())])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_query__arrow_iterable(self):
+        data = [{'one': i, 'two': str(i)} for i in range(3)]
+        results = FakeResults(data)
+        results.to_arrow_iterable = lambda: iter([
+            pyarrow.RecordBatch.from_pydict({'one': [0, 1], 'two': ['0', '1']}),
+            pyarrow.RecordBatch.from_pydict({'one': [2], 'two': ['2']})])
+        bq = self._build_mock_client_for_querying([])
+        bq.client.query.return_value.result.return_value = results
+
+        result = bq.query('select * from table')
+
+        self.assertEqual(result.to_dicts(), data)
+
+    def test_query__window(self):
+        bq = self._build_mock_client_for_querying([])
+        bq.client.query.return_value.exception.return_value = None
+        bq.client.list_rows.return_value = FakeResults([{'one': 3}])
+
+        result = bq.query('select * from table', max_results=1, start_index=3)
+
+        self.assertEqual(result.to_dicts(), [{'one': 3}])
+        list_rows_kwargs = bq.client.list_rows.call_args[1]
+        self.assertEqual(list_rows_kwargs['start_index'], 3)
+        self.assertEqual(list_rows_kwargs['max_results'], 1)
+        # The results aren't fetched from the start
+        bq.client.query.return_value.result.assert_not_called()
+
     def test_query__no_results(self):
         query_string = 'select * from table'
 
@@ -49,75 +122,90 @@ class TestGoogleBigQuery(unittest.TestCase):
         self.assertEqual(result, None)
 
     def test_copy(self):
+        # set up object under test
+        tbl = self.default_table
+        bq = self._build_mock_client_for_copying(table_exists=False)
+        loaded = []
+
+        def load_table_from_file(file, *args, **kwargs):
+            loaded.append(list(fastavro.reader(file)))
+            return mock.MagicMock()
+
+        bq.client.load_table_from_file.side_effect = load_table_from_file
+
+        # call the method being tested
+        bq.copy(tbl, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket)
+
+        # check that the table was uploaded directly, as a typed Avro file
+        self.assertEqual(bq.client.load_table_from_file.call_count, 1)
+        self.assertEqual(bq.client.load_table_from_uri.call_count, 0)
+        self.assertEqual(loaded, [[{'num': 1, 'ltr': 'a'}, {'num': 2, 'ltr': 'b'}]])
+
+        job_config = bq.client.load_table_from_file.call_args[1]['job_config']
+        self.assertEqual(job_config.source_format, bigquery.SourceFormat.AVRO)
+        self.assertEqual(job_config.write_disposition,
+                         bigquery.WriteDisposition.WRITE_EMPTY)
+
+    def test_copy__sharded(self):
         # setup dependencies / inputs
-        tmp_blob_uri = 'gs://tmp/file'
+        gcs_client = self._build_mock_cloud_storage_client()
+        uploaded = {}
+
+        def put_blob(bucket, blob_name, path):
+            with open(path, 'rb') as file:
+                uploaded[blob_name] = list(fastavro.reader(file))
+
+        gcs_client.put_blob.side_effect = put_blob
 
         # set up object under test
-        gcs_client = self._build_mock_cloud_storage_client(tmp_blob_uri)
-        tbl = self.default_table
         bq = self._build_mock_client_for_copying(table_exists=False)
 
         # call the method being tested
-        bq.copy(tbl, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket,
-                gcs_client=gcs_client)
+        bq.copy(self.default_table, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket,
+                gcs_client=gcs_client, shard_rows=1)
 
-        # check that the method did the right things
-        self.assertEqual(gcs_client.upload_table.call_count, 1)
-        upload_call_args = gcs_client.upload_table.call_args
-        self.assertEqual(upload_call_args[0][0], tbl)
-        self.assertEqual(upload_call_args[0][1], self.tmp_gcs_bucket)
-        tmp_blob_name = upload_call_args[0][2]
+        # check that each row was uploaded in its own file
+        self.assertEqual([uploaded[name] for name in sorted(uploaded)],
+                         [[{'num': 1, 'ltr': 'a'}], [{'num': 2, 'ltr': 'b'}]])
 
         self.assertEqual(bq.client.load_table_from_uri.call_count, 1)
         load_call_args = bq.client.load_table_from_uri.call_args
-        self.assertEqual(load_call_args[0][0], tmp_blob_uri)
+        prefix = list(uploaded)[0].split('/')[0]
+        self.assertEqual(load_call_args[0][0], f'gs://{self.tmp_gcs_bucket}/{prefix}/*.avro')
 
-        job_config = load_call_args[1]['job_config']
-        self.assertEqual(job_config.write_disposition,
-                         bigquery.WriteDisposition.WRITE_EMPTY)
-
-        # make sure we cleaned up the temp file
-        self.assertEqual(gcs_client.delete_blob.call_count, 1)
-        delete_call_args = gcs_client.delete_blob.call_args
-        self.assertEqual(delete_call_args[0][0], self.tmp_gcs_bucket)
-        self.assertEqual(delete_call_args[0][1], tmp_blob_name)
+        # make sure we cleaned up the temp files
+        self.assertEqual(gcs_client.delete_blob.call_count, 2)
+        deleted = [c[0][1] for c in gcs_client.delete_blob.call_args_list]
+        self.assertEqual(sorted(deleted), sorted(uploaded))
 
     def test_copy__if_exists_truncate(self):
-        gcs_client = self._build_mock_cloud_storage_client()
         # set up object under test
         bq = self._build_mock_client_for_copying()
 
         # call the method being tested
         bq.copy(self.default_table, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket,
-                if_exists='truncate', gcs_client=gcs_client)
+                if_exists='truncate')
 
         # check that the method did the right things
-        call_args = bq.client.load_table_from_uri.call_args
+        call_args = bq.client.load_table_from_file.call_args
         job_config = call_args[1]['job_config']
         self.assertEqual(job_config.write_disposition,
                          bigquery.WriteDisposition.WRITE_TRUNCATE)
 
-        # make sure we cleaned up the temp file
-        self.assertEqual(gcs_client.delete_blob.call_count, 1)
-
     def test_copy__if_exists_append(self):
-        gcs_client = self._build_mock_cloud_storage_client()
         # set up object under test
         bq = self._build_mock_client_for_copying()
 
         # call the method being tested
         bq.copy(self.default_table, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket,
-                if_exists='append', gcs_client=gcs_client)
+                if_exists='append')
 
         # check that the method did the right things
-        call_args = bq.client.load_table_from_uri.call_args
+        call_args = bq.client.load_table_from_file.call_args
         job_config = call_args[1]['job_config']
         self.assertEqual(job_config.write_disposition,
                          bigquery.WriteDisposition.WRITE_APPEND)
 
-        # make sure we cleaned up the temp file
-        self.assertEqual(gcs_client.delete_blob.call_count, 1)
-
     def test_copy__if_exists_fail(self):
         # set up object under test
         bq = self._build_mock_client_for_copying()
@@ -128,20 +216,16 @@ class TestGoogleBigQuery(unittest.TestCase):
                     gcs_client=self._build_mock_cloud_storage_client())
 
     def test_copy__if_exists_drop(self):
-        gcs_client = self._build_mock_cloud_storage_client()
         # set up object under test
         bq = self._build_mock_client_for_copying()
 
         # call the method being tested
         bq.copy(self.default_table, 'dataset', 'table', tmp_gcs_bucket=self.tmp_gcs_bucket,
-                if_exists='drop', gcs_client=gcs_client)
+                if_exists='drop')
 
         # check that we tried to delete the table
         self.assertEqual(bq.client.delete_table.call_count, 1)
 
-        # make sure we cleaned up the temp file
-        self.assertEqual(gcs_client.delete_blob.call_count, 1)
-
     def test_copy__bad_if_exists(self):
         gcs_client = self._build_mock_cloud_storage_client()
 
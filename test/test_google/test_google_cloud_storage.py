@@ -1,5 +1,16 @@
 import unittest
-from parsons import GoogleCloudStorage
+import unittest.mock as mock
+import base64
+import gzip
+import io
+import json
+import re
+import threading
+from urllib.parse import unquote, urlparse
+import google_crc32c
+from google.auth.credentials import AnonymousCredentials
+from parsons import GoogleCloudStorage, Table
+from parsons.google.google_cloud_storage import _PipeReader
 from parsons.utilities import files
 from google.cloud import storage
 import os
@@ -104,3 +115,211 @@ class TestGoogleStorageBuckets(unittest.TestCase):
         # Check that it was deleted.
         self.cloud.delete_blob(TEMP_BUCKET_NAME, file_name)
         self.assertFalse(self.cloud.blob_exists(TEMP_BUCKET_NAME, file_name))
+
+
+class FakeBlob:
+    # Stores uploads in a dict shared by all of the fake blobs
+
+    store = {}
+
+    def __init__(self, name, bucket=None, chunk_size=None, generation=None,
+                 content_encoding=None):
+        self.name = name
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.generation = generation
+        self.content_encoding = content_encoding
+        self.ranges = []
+
+    @property
+    def size(self):
+        return len(self.store[self.name])
+
+    def upload_from_file(self, f, size=None, **kwargs):
+        self.store[self.name] = f.read() if size is None else f.read(size)
+
+    def download_to_file(self, f, start=None, end=None, **kwargs):
+        self.ranges.append((start, end))
+        data = self.store[self.name]
+        f.write(data if start is None else data[start:end + 1])
+
+    def compose(self, sources, **kwargs):
+        self.store[self.name] = b''.join(self.store[s.name] for s in sources)
+
+    def delete(self, **kwargs):
+        del self.store[self.name]
+
+
+@mock.patch('parsons.google.google_cloud_storage.storage.Blob', FakeBlob)
+class TestGoogleStorageTransfers(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'foo'
+        with mock.patch('parsons.google.google_cloud_storage.storage.Client'):
+            self.cloud = GoogleCloudStorage()
+        self.cloud.get_bucket = mock.MagicMock()
+        FakeBlob.store.clear()
+
+    @mock.patch('parsons.google.google_cloud_storage.COMPOSITE_UPLOAD_THRESHOLD', 10)
+    @mock.patch('parsons.google.google_cloud_storage.MIN_COMPOSITE_PART_SIZE', 4)
+    @mock.patch('parsons.google.google_cloud_storage.SLICED_DOWNLOAD_THRESHOLD', 10)
+    def test_put_and_download_blob_in_parts(self):
+
+        path = files.string_to_temp_file('A little string, in parts')
+        self.cloud.put_blob(TEMP_BUCKET_NAME, 'blob.txt', path)
+
+        # The parts were composed and then deleted
+        self.assertEqual(list(FakeBlob.store), ['blob.txt'])
+        self.assertEqual(FakeBlob.store['blob.txt'], b'A little string, in parts')
+
+        with mock.patch('parsons.google.google_cloud_storage.storage.Bucket') as bucket:
+            bucket.return_value.get_blob.return_value = FakeBlob('blob.txt')
+            path = self.cloud.download_blob(TEMP_BUCKET_NAME, 'blob.txt')
+
+        with open(path, 'r') as f:
+            self.assertEqual(f.read(), 'A little string, in parts')
+
+    @mock.patch('parsons.google.google_cloud_storage.SLICED_DOWNLOAD_THRESHOLD', 10)
+    def test_download_encoded_blob(self):
+
+        FakeBlob.store['blob.txt.gz'] = b'A little string, gzipped'
+        blob = FakeBlob('blob.txt.gz', content_encoding='gzip')
+
+        with mock.patch('parsons.google.google_cloud_storage.storage.Bucket') as bucket:
+            bucket.return_value.get_blob.return_value = blob
+            self.cloud.download_blob(TEMP_BUCKET_NAME, 'blob.txt.gz')
+
+        # Ranges of an encoded blob can't be decoded, so it is downloaded whole
+        self.assertEqual(blob.ranges, [(None, None)])
+
+    def test_upload_table(self):
+
+        tbl = Table([{'first': 'Bob', 'last': 'Smith'}, {'first': 'Sue', 'last': 'Doe'}])
+
+        with mock.patch('parsons.google.google_cloud_storage.storage.Bucket'):
+            self.cloud.upload_table(tbl, TEMP_BUCKET_NAME, 'table.csv.gz', compression='gzip')
+            self.cloud.upload_table(tbl, TEMP_BUCKET_NAME, 'table.json', data_type='json')
+            # Compression is only used when asked for, whatever the blob name
+            self.cloud.upload_table(tbl, TEMP_BUCKET_NAME, 'plain.csv.gz')
+
+        self.assertEqual(gzip.decompress(FakeBlob.store['table.csv.gz']),
+                         b'first,last\r\nBob,Smith\r\nSue,Doe\r\n')
+        self.assertEqual(FakeBlob.store['plain.csv.gz'], b'first,last\r\nBob,Smith\r\nSue,Doe\r\n')
+        self.assertEqual(json.loads(FakeBlob.store['table.json']), tbl.to_dicts())
+
+    def test_upload_table_write_error(self):
+
+        def write_csv(table, file):
+            file.write(b'first\r\n')
+            raise ValueError('Bad row')
+
+        # The upload fails, rather than completing with a partial file
+        with mock.patch('parsons.google.google_cloud_storage.storage.Bucket'), \
+                mock.patch('parsons.google.google_cloud_storage.write_csv', write_csv):
+            with self.assertRaises(ValueError):
+                self.cloud.upload_table(Table([{'first': 'Bob'}]), TEMP_BUCKET_NAME, 'table.csv')
+        self.assertNotIn('table.csv', FakeBlob.store)
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(body or {}).encode()
+        self.request = mock.MagicMock()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeTransport:
+    # Serves the resumable upload, compose and delete requests of a real storage client
+    # from a dict of blobs
+
+    is_mtls = False
+
+    def __init__(self):
+        self.blobs = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def _resource(self, name):
+        data = self.blobs[name]
+        crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode()
+        return {'name': name, 'bucket': TEMP_BUCKET_NAME, 'size': str(len(data)),
+                'crc32c': crc32c}
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        with self.lock:
+            if 'uploadType=resumable' in url:
+                upload_id = str(len(self.uploads))
+                self.uploads[upload_id] = [json.loads(data)['name'], b'']
+                return FakeResponse(200, headers={'location': f'https://upload/{upload_id}'})
+
+            if url.startswith('https://upload/'):
+                upload = self.uploads[url.rsplit('/', 1)[1]]
+                upload[1] += data
+                end, total = re.match(r'bytes \d+-(\d+)/(\S+)', headers['content-range']).groups()
+                if total != '*' and int(end) + 1 == int(total):
+                    self.blobs[upload[0]] = upload[1]
+                    return FakeResponse(200, self._resource(upload[0]))
+                return FakeResponse(308, headers={'range': f'bytes=0-{end}'})
+
+            name = unquote(urlparse(url).path).split('/o/', 1)[1]
+            if method == 'POST' and name.endswith('/compose'):
+                name = name[:-len('/compose')]
+                sources = json.loads(data)['sourceObjects']
+                self.blobs[name] = b''.join(self.blobs[s['name']] for s in sources)
+                return FakeResponse(200, self._resource(name))
+            if method == 'DELETE':
+                if self.blobs.pop(name, None) is None:
+                    return FakeResponse(404)
+                return FakeResponse(204)
+
+        raise ValueError(f'Unexpected request: {method} {url}')
+
+
+class TestGoogleStorageClientTransfers(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'foo'
+        with mock.patch('parsons.google.google_cloud_storage.storage.Client'):
+            self.cloud = GoogleCloudStorage()
+        self.cloud.client = storage.Client(project='project', credentials=AnonymousCredentials())
+        self.transport = FakeTransport()
+        self.cloud.client._http_internal = self.transport
+        self.cloud.get_bucket = self.cloud.client.bucket
+
+    @mock.patch('parsons.google.google_cloud_storage.COMPOSITE_UPLOAD_THRESHOLD', 10)
+    @mock.patch('parsons.google.google_cloud_storage.MIN_COMPOSITE_PART_SIZE', 4)
+    @mock.patch('google.cloud.storage.blob._MAX_MULTIPART_SIZE', 0)
+    def test_put_blob_in_resumable_parts(self):
+
+        path = files.string_to_temp_file('A little string, in parts')
+        self.cloud.put_blob(TEMP_BUCKET_NAME, 'blob.txt', path)
+
+        # Each part was sent as its own resumable upload, then composed and deleted
+        self.assertEqual(len(self.transport.uploads), 7)
+        self.assertEqual(self.transport.blobs, {'blob.txt': b'A little string, in parts'})
+
+
+class TestPipeReader(unittest.TestCase):
+
+    def test_seek_within_last_read(self):
+
+        with _PipeReader(lambda f: f.write(b'0123456789')) as stream:
+            self.assertEqual(stream.read(4), b'0123')
+            self.assertEqual(stream.read(4), b'4567')
+
+            # A failed chunk can be read again
+            stream.seek(4)
+            self.assertEqual(stream.read(2), b'45')
+            self.assertEqual(stream.read(), b'6789')
+            self.assertEqual(stream.tell(), 10)
+
+            # Bytes before the last read are gone
+            with self.assertRaises(io.UnsupportedOperation):
+                stream.seek(0)
@@ -1,4 +1,6 @@
 import unittest
+import unittest.mock as mock
+import datetime
 import gspread
 import warnings
 import os
@@ -114,3 +116,40 @@ class TestGoogleSheets(unittest.TestCase):
         for i in range(new_table.num_rows):
             self.assertEqual(new_table.data[i], result_table.data[i])
 
+
+
+class TestGoogleSheetsValues(unittest.TestCase):
+
+    def setUp(self):
+
+        with mock.patch('parsons.google.google_sheets.ServiceAccountCredentials'), \
+                mock.patch('gspread.authorize') as authorize:
+            self.google_sheets = GoogleSheets(google_keyfile_dict={})
+
+        self.spreadsheet = authorize.return_value.open_by_key.return_value
+        self.spreadsheet.get_worksheet.return_value.title = "Bob's sheet"
+        self.table = Table([{'first': 'Bob', 'joined': datetime.date(2020, 1, 2)},
+                            {'first': 'Sue', 'joined': None}])
+
+    def test_append_to_sheet(self):
+
+        self.google_sheets.append_to_sheet('abc', self.table, user_entered_value=True)
+
+        # The sheet isn't read, and the rows are sent in one request
+        self.spreadsheet.get_worksheet.return_value.get_all_records.assert_not_called()
+        self.spreadsheet.values_append.assert_called_once_with(
+            "'Bob''s sheet'!A1",
+            {'valueInputOption': 'USER_ENTERED', 'insertDataOption': 'INSERT_ROWS'},
+            {'values': [['Bob', '2020-01-02'], ['Sue', None]]})
+
+    def test_overwrite_sheet_in_batches(self):
+
+        with mock.patch('parsons.google.google_sheets.MAX_REQUEST_BYTES', 20):
+            self.google_sheets.overwrite_sheet('abc', self.table)
+
+        self.spreadsheet.get_worksheet.return_value.clear.assert_called_once()
+        calls = self.spreadsheet.values_update.call_args_list
+        self.assertEqual([c[0][0] for c in calls],
+                         ["'Bob''s sheet'!A1", "'Bob''s sheet'!A2", "'Bob''s sheet'!A3"])
+        self.assertEqual([c[0][2]['values'] for c in calls],
+                         [[['first', 'joined']], [['Bob', '2020-01-02']], [['Sue', None]]])
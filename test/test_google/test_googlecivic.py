@@ -1,4 +1,7 @@
+import os
+import shutil
 import unittest
+from unittest import mock
 import requests_mock
 from parsons import GoogleCivic, Table
 from googlecivic_responses import *
@@ -45,3 +48,58 @@ class TestGoogleCivic(unittest.TestCase):
         tbl = self.gc.get_polling_locations(2000, address_tbl)
 
         assert_matching_tables(tbl, expected_tbl)
+
+    @requests_mock.Mocker()
+    def test_get_poll_locations_deduplicated(self, m):
+
+        m.get(self.gc.uri + 'voterinfo', json=voterinfo_resp)
+
+        address_tbl = Table([['address'],
+                             ['900 N Washtenaw, Chicago, IL 60622'],
+                             ['900 n. washtenaw chicago IL 60622'],
+                             ['900 N Washtenaw, Chicago, IL 60622']])
+
+        tbl = self.gc.get_polling_locations(2000, address_tbl, max_qps=1000)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(tbl.num_rows, 3)
+        self.assertEqual(list(tbl.table.values('passed_address')),
+                         list(address_tbl.table.values('address')))
+
+        # Results are kept in memory between calls
+        self.gc.get_polling_locations(2000, address_tbl)
+        self.assertEqual(m.call_count, 1)
+
+        # But not between elections
+        self.gc.get_polling_locations(2001, address_tbl)
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_get_poll_locations_disk_cache(self, m):
+
+        m.get(self.gc.uri + 'voterinfo', json=voterinfo_resp)
+        os.mkdir('tmp')
+        self.addCleanup(shutil.rmtree, 'tmp')
+
+        address_tbl = Table([['address'], ['900 N Washtenaw, Chicago, IL 60622']])
+
+        gc = GoogleCivic(api_key='FAKEKEY', cache_path='tmp/civic.db')
+        first = gc.get_polling_locations(2000, address_tbl)
+
+        gc = GoogleCivic(api_key='FAKEKEY', cache_path='tmp/civic.db')
+        second = gc.get_polling_locations(2000, address_tbl)
+
+        self.assertEqual(m.call_count, 1)
+        assert_matching_tables(first, second)
+
+    @mock.patch('parsons.google.google_civic.time')
+    def test_rate_limiter(self, mock_time):
+
+        from parsons.google.google_civic import _RateLimiter
+
+        mock_time.monotonic.return_value = 100.0
+        limiter = _RateLimiter(4)
+        for _ in range(3):
+            limiter.wait()
+
+        self.assertEqual([c[0][0] for c in mock_time.sleep.call_args_list], [0.25, 0.5])
@@ -3,7 +3,9 @@ import requests_mock
 from test.utils import assert_matching_tables
 from test.test_hustle import expected_json
 from parsons import Table, Hustle
-from parsons.hustle.hustle import HUSTLE_URI
+from parsons.hustle.hustle import HUSTLE_URI, _TokenBucket
+from unittest import mock
+import time
 
 CLIENT_ID = 'FAKE_ID'
 CLIENT_SECRET = 'FAKE_SECRET'
@@ -65,7 +67,98 @@ class TestHustle(unittest.TestCase):
         tbl = Table([['phone_number', 'ln', 'first_name', 'address'],
                      ['4435705355', 'Johnson', 'Lyndon', '123 Main Street'],
                      ['4435705354', 'Richards', 'Ann', '124 Main Street']])
-        self.hustle.create_leads(tbl, group_id='cMCH0hxwGt')
+        results = self.hustle.create_leads(tbl, group_id='cMCH0hxwGt')
+
+        self.assertEqual(results.to_dicts(),
+                         [{'row': 0, 'lead_id': 'yK5jo2tlms', 'error': None},
+                          {'row': 1, 'lead_id': 'yK5jo2tlms', 'error': None}])
+
+        payloads = sorted((r.json() for r in m.request_history), key=lambda p: p['firstName'])
+        self.assertEqual(payloads[0], {'firstName': 'Ann',
+                                       'lastName': 'Richards',
+                                       'phoneNumber': '4435705354',
+                                       'customFields': {'address': '124 Main Street'}})
+
+        # The input table is left alone
+        self.assertEqual(tbl.columns, ['phone_number', 'ln', 'first_name', 'address'])
+
+    @requests_mock.Mocker()
+    def test_create_leads_errors(self, m):
+
+        m.post(HUSTLE_URI + 'groups/group_a/leads', json=expected_json.leads_tbl_01)
+        m.post(HUSTLE_URI + 'groups/group_b/leads', status_code=400, json={'error': 'bad'})
+
+        tbl = Table([['phone', 'fn', 'group_id', 'tag_id'],
+                     ['4435705355', 'Lyndon', 'group_a', 'a, b'],
+                     ['4435705354', 'Ann', 'group_b', None],
+                     [None, 'Bob', 'group_a', None]])
+        results = self.hustle.create_leads(tbl, max_workers=2).to_dicts()
+
+        self.assertEqual(results[0]['lead_id'], 'yK5jo2tlms')
+        self.assertIn('400', results[1]['error'])
+        self.assertEqual(results[2]['error'], 'Missing phone_number.')
+
+        self.assertEqual(m.request_history[0].json()['tagIds'], ['a', 'b'])
+
+        self.assertRaises(ValueError, self.hustle.create_leads, Table([['phone', 'fn']]))
+
+    @requests_mock.Mocker()
+    def test_create_leads_retries(self, m):
+
+        refreshed = dict(expected_json.auth_token, access_token='new_token')
+        m.post(HUSTLE_URI + 'oauth/token', json=refreshed)
+        m.post(HUSTLE_URI + 'groups/cMCH0hxwGt/leads',
+               [{'status_code': 401, 'json': {}},
+                {'status_code': 429, 'json': {}, 'headers': {'Retry-After': '0'}},
+                {'status_code': 201, 'json': expected_json.leads_tbl_01}])
+
+        tbl = Table([['phone_number', 'first_name'], ['4435705355', 'Lyndon']])
+        results = self.hustle.create_leads(tbl, group_id='cMCH0hxwGt')
+
+        self.assertEqual(results[0]['lead_id'], 'yK5jo2tlms')
+        self.assertEqual(self.hustle.auth_token, 'new_token')
+        self.assertEqual(m.request_history[-1].headers['Authorization'], 'Bearer new_token')
+
+    @requests_mock.Mocker()
+    def test_create_leads_refresh_after_retries(self, m):
+
+        m.post(HUSTLE_URI + 'oauth/token', json=expected_json.auth_token)
+        m.post(HUSTLE_URI + 'groups/cMCH0hxwGt/leads',
+               [{'status_code': 429, 'json': {}, 'headers': {'Retry-After': '0'}}] * 3 +
+               [{'status_code': 401, 'json': {}},
+                {'status_code': 201, 'json': expected_json.leads_tbl_01}])
+
+        tbl = Table([['phone_number', 'first_name'], ['4435705355', 'Lyndon']])
+        results = self.hustle.create_leads(tbl, group_id='cMCH0hxwGt')
+
+        # Refreshing the token doesn't use up a retry
+        self.assertEqual(results[0]['lead_id'], 'yK5jo2tlms')
+
+    @requests_mock.Mocker()
+    def test_create_leads_slow_rate_limit(self, m):
+
+        m.post(HUSTLE_URI + 'groups/cMCH0hxwGt/leads', json=expected_json.leads_tbl_01)
+        tbl = Table([['phone_number', 'first_name'], ['4435705355', 'Lyndon']])
+
+        # A rate below one request per second still allows a request
+        results = self.hustle.create_leads(tbl, group_id='cMCH0hxwGt', rate_limit=0.5)
+        self.assertEqual(results[0]['lead_id'], 'yK5jo2tlms')
+
+        with self.assertRaises(ValueError):
+            self.hustle.create_leads(tbl, group_id='cMCH0hxwGt', rate_limit=-1)
+
+    def test_token_bucket(self):
+
+        bucket = _TokenBucket(rate=10, burst=2)
+        with mock.patch('time.sleep') as sleep:
+            bucket.acquire()
+            bucket.acquire()
+            sleep.assert_not_called()
+
+        # The burst is used up, so the next call waits for a token
+        start = time.monotonic()
+        bucket.acquire()
+        self.assertGreater(time.monotonic() - start, 0.05)
 
     @requests_mock.Mocker()
     def test_update_lead(self, m):
@@ -7,6 +7,10 @@ import os
 import re
 import warnings
 import datetime
+from unittest import mock
+import threading
+import gzip
+import psycopg2
 from test.utils import validate_list
 
 
@@ -188,6 +192,347 @@ class TestRedshift(unittest.TestCase):
 # These tests interact directly with the Redshift database
 
 
+class TestRedshiftCatalogCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rs = Redshift(username='test', password='test', host='test', db='test', port=123)
+
+        self.columns = Table([
+            ['ordinal_position', 'column_name', 'data_type', 'max_length', 'max_precision',
+             'max_scale', 'is_nullable'],
+            [1, 'id', 'integer', None, 32, 0, 'NO'],
+            [2, 'name', 'character varying', 10, None, None, 'YES']])
+
+    def test_get_columns_cached(self):
+
+        with mock.patch.object(self.rs, 'query', return_value=self.columns) as query:
+            first = self.rs.get_columns('schema', 'tbl')
+            second = self.rs.get_columns('schema', 'tbl')
+
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(list(first), ['id', 'name'])
+        self.assertEqual(first['name']['max_length'], 10)
+        self.assertFalse(first['id']['is_nullable'])
+
+    def test_get_object_type_cached(self):
+
+        tbl = Table([{'objname': 'schema.tbl', 'object_name': 'view'}])
+        with mock.patch.object(self.rs, 'query', return_value=tbl) as query:
+            self.assertTrue(self.rs.is_view('schema.tbl'))
+            self.assertFalse(self.rs.is_table('schema.tbl'))
+
+        self.assertEqual(query.call_count, 1)
+
+    def test_cache_expires(self):
+
+        rs = Redshift(username='test', password='test', host='test', db='test', port=123,
+                      catalog_cache_ttl=0)
+
+        with mock.patch.object(rs, 'query', return_value=self.columns) as query:
+            rs.get_columns('schema', 'tbl')
+            rs.get_columns('schema', 'tbl')
+
+        self.assertEqual(query.call_count, 2)
+
+    def test_ddl_clears_cache(self):
+
+        connection = mock.MagicMock()
+        connection.cursor.return_value.description = None
+
+        with mock.patch.object(self.rs, 'query', return_value=self.columns) as query:
+            self.rs.get_columns('schema', 'tbl')
+
+            # Selects leave the cache alone
+            self.rs.query_with_connection('select 1', connection)
+            self.rs.get_columns('schema', 'tbl')
+            self.assertEqual(query.call_count, 1)
+
+            self.rs.query_with_connection('alter table schema.tbl add column x int', connection)
+            self.rs.get_columns('schema', 'tbl')
+            self.assertEqual(query.call_count, 2)
+
+    def test_rollback_clears_cache(self):
+
+        with mock.patch.object(self.rs, 'query', return_value=self.columns) as query, \
+                mock.patch('psycopg2.connect') as connect:
+
+            # A lookup inside a transaction which is then rolled back isn't kept
+            with self.assertRaises(ValueError):
+                with self.rs.connection():
+                    self.rs.get_columns('schema', 'tbl')
+                    raise ValueError('Failed')
+            connect.return_value.commit.assert_not_called()
+            connect.return_value.close.assert_called_once()
+
+            self.rs.get_columns('schema', 'tbl')
+            self.assertEqual(query.call_count, 2)
+
+            # As is one followed by a failed statement
+            connection = mock.MagicMock()
+            connection.cursor.return_value.execute.side_effect = psycopg2.Error('Failed')
+            with self.assertRaises(psycopg2.Error):
+                self.rs.query_with_connection('select 1', connection)
+
+            self.rs.get_columns('schema', 'tbl')
+            self.assertEqual(query.call_count, 3)
+
+    def test_describe_schema(self):
+
+        tbl = Table([
+            ['table_name', 'table_type', 'ordinal_position', 'column_name', 'data_type',
+             'max_length', 'max_precision', 'max_scale', 'is_nullable'],
+            ['tbl', 'BASE TABLE', 1, 'id', 'integer', None, 32, 0, 'NO'],
+            ['tbl', 'BASE TABLE', 2, 'name', 'character varying', 10, None, None, 'YES'],
+            ['vw', 'VIEW', 1, 'id', 'integer', None, 32, 0, 'YES']])
+
+        with mock.patch.object(self.rs, 'query', return_value=tbl) as query:
+            schema = self.rs.describe_schema('schema')
+
+            self.assertEqual(schema['tbl']['type'], 'table')
+            self.assertEqual(schema['vw']['type'], 'view')
+            self.assertEqual(list(schema['tbl']['columns']), ['id', 'name'])
+
+            # The lookups below are answered from the cache
+            self.assertEqual(self.rs.get_columns('schema', 'tbl'), schema['tbl']['columns'])
+            self.assertTrue(self.rs.is_table('schema.tbl'))
+            self.assertTrue(self.rs.is_view('schema.vw'))
+            self.assertTrue(self.rs.table_exists_with_connection('schema.vw', None))
+            self.assertFalse(self.rs.table_exists_with_connection('schema.vw', None,
+                                                                  view=False))
+
+        self.assertEqual(query.call_count, 1)
+
+
+    def test_alter_varchar_column_widths(self):
+
+        cols = {
+            'id': {'data_type': 'integer', 'max_length': None},
+            'name': {'data_type': 'character varying', 'max_length': 4},
+            'city': {'data_type': 'character varying', 'max_length': 20},
+        }
+        tbl = Table([['ID', 'Name', 'City'], [1, 'Jim', 'Boston'], [2, 'Joanna', 'Lowell']])
+
+        with mock.patch.object(self.rs, 'get_columns', return_value=cols), \
+                mock.patch.object(self.rs, 'connection') as connection, \
+                mock.patch.object(self.rs, 'query_with_connection') as query:
+
+            planned = self.rs.alter_varchar_column_widths(tbl, 'schema.tbl', dry_run=True)
+            self.assertEqual(planned.to_dicts(),
+                             [{'column': 'name', 'current_width': 4, 'new_width': 6}])
+            query.assert_not_called()
+
+            altered = self.rs.alter_varchar_column_widths(tbl, 'schema.tbl')
+            self.assertEqual(altered.to_dicts(), planned.to_dicts())
+
+        # Every ALTER runs on the same connection
+        self.assertEqual(connection.call_count, 1)
+        query.assert_called_once_with(
+            'ALTER TABLE schema.tbl ALTER COLUMN name TYPE varchar(6)',
+            connection.return_value.__enter__.return_value)
+
+        # The Parsons table is left alone
+        self.assertEqual(tbl.columns, ['ID', 'Name', 'City'])
+
+
+class SerializationError(psycopg2.Error):
+    pass
+
+
+class TestRedshiftMaintenanceJob(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rs = Redshift(username='test', password='test', host='test', db='test', port=123)
+
+    def test_run_order_and_concurrency(self):
+
+        started = []
+        both_running = threading.Barrier(2, timeout=5)
+
+        def step(name, wait=False):
+            started.append(name)
+            if wait:
+                # Only passes if the two independent steps run at the same time
+                both_running.wait()
+
+        job = self.rs.maintenance_job(max_workers=2)
+        job.add('a', step, 'a', wait=True)
+        job.add('b', step, 'b', wait=True)
+        job.add('c', step, 'c', depends_on=['a', 'b'])
+        results = job.run()
+
+        self.assertEqual(started[-1], 'c')
+        self.assertEqual(results.columns, ['name', 'status', 'attempts', 'started', 'finished',
+                                           'seconds', 'error'])
+        self.assertEqual(list(results.table.values('status')), ['succeeded'] * 3)
+
+    def test_retry_and_skip(self):
+
+        calls = []
+
+        def flaky():
+            calls.append('flaky')
+            if len(calls) < 2:
+                raise SerializationError('ERROR: 1023 DETAIL: Serializable isolation violation')
+
+        def broken():
+            raise ValueError('broken')
+
+        job = self.rs.maintenance_job(max_workers=2)
+        job.add('flaky', flaky)
+        job.add('broken', broken)
+        job.add('after_broken', lambda: None, depends_on=['broken'])
+        job.add('after_after', lambda: None, depends_on=['after_broken', 'flaky'])
+
+        with mock.patch('parsons.databases.redshift.rs_maintenance.RETRY_WAIT', 0):
+            results = {row['name']: row for row in job.run()}
+
+        self.assertEqual(results['flaky']['status'], 'succeeded')
+        self.assertEqual(results['flaky']['attempts'], 2)
+        self.assertEqual(results['broken']['status'], 'failed')
+        self.assertEqual(results['broken']['error'], 'broken')
+        self.assertEqual(results['broken']['attempts'], 1)
+        self.assertEqual(results['after_broken']['status'], 'skipped')
+        self.assertEqual(results['after_after']['status'], 'skipped')
+
+    def test_sql_steps(self):
+
+        with mock.patch.object(self.rs, 'query') as query, \
+                mock.patch.object(self.rs, 'connection') as connection, \
+                mock.patch.object(self.rs, 'query_with_connection') as query_with_connection:
+
+            # The WLM slot lookup
+            query.return_value = [{'slots': 3}]
+
+            job = self.rs.maintenance_job()
+            job.add('insert', 'insert into schema.tbl select 1')
+            job.add_vacuum('vacuum', 'schema.tbl', depends_on=['insert'])
+            job.add_analyze('analyze', 'schema.tbl', depends_on=['vacuum'])
+            job.run()
+
+            self.assertEqual(job._get_max_workers(), 3)
+
+        query.assert_any_call('insert into schema.tbl select 1')
+        conn = connection.return_value.__enter__.return_value
+        conn.set_session.assert_called_with(autocommit=True)
+        self.assertEqual([c[0][0] for c in query_with_connection.call_args_list],
+                         ['VACUUM schema.tbl;', 'ANALYZE schema.tbl;'])
+
+    def test_add_validation(self):
+
+        job = self.rs.maintenance_job()
+        job.add('a', 'select 1')
+
+        self.assertRaises(ValueError, job.add, 'a', 'select 1')
+        self.assertRaises(ValueError, job.add, 'b', 'select 1', depends_on=['missing'])
+
+
+class TestRedshiftUnloadQuery(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rs = Redshift(username='test', password='test', host='test', db='test', port=123,
+                           s3_temp_bucket='temp-bucket')
+
+        # The unloaded files, by key
+        self.parts = {
+            'part_0001.gz': b'id,name,joined\n3,Sarah,__parsons_null__\n',
+            'part_0000.gz': b'id,name,joined\n1,Jim,2020-01-02\n2,,2020-01-03\n'
+                            b'__parsons_null__,__parsons_null__,2020-01-04\n',
+            'part_0002.gz': b'',
+        }
+
+    def mock_s3(self):
+
+        s3 = mock.MagicMock()
+        remaining = dict(self.parts)
+
+        def list_keys(bucket, prefix):
+            return {f'{prefix}{key}': {} for key in remaining}
+
+        def download_file(bucket, key, local_path):
+            with open(local_path, 'wb') as f:
+                f.write(gzip.compress(self.parts[key.rsplit('/', 1)[-1]]))
+
+        def remove_file(bucket, key):
+            remaining.pop(key.rsplit('/', 1)[-1])
+
+        s3.list_keys.side_effect = list_keys
+        s3.client.download_file.side_effect = download_file
+        s3.remove_file.side_effect = remove_file
+        s3.remaining = remaining
+        return s3
+
+    def test_estimate_query_size(self):
+
+        plan = Table([{'QUERY PLAN': 'XN Seq Scan on tbl  (cost=0.00..1.50 rows=150 width=20)'}])
+        with mock.patch.object(self.rs, 'query', return_value=plan) as query:
+            self.assertEqual(self.rs.estimate_query_size('select * from tbl'), 3000)
+
+        query.assert_called_once_with('EXPLAIN select * from tbl')
+
+    def test_unload_query(self):
+
+        s3 = self.mock_s3()
+        with mock.patch('parsons.aws.s3.S3', return_value=s3), \
+                mock.patch.object(self.rs, 'unload') as unload, \
+                mock.patch.object(self.rs, '_query_types', return_value=[23, 1043, 1082]) \
+                as query_types:
+            tbl = self.rs.unload_query("select * from tbl where name != 'x' order by id;")
+
+        # The values are converted back to the column types, keeping empty strings
+        self.assertEqual(tbl.to_dicts(), [
+            {'id': 1, 'name': 'Jim', 'joined': datetime.date(2020, 1, 2)},
+            {'id': 2, 'name': '', 'joined': datetime.date(2020, 1, 3)},
+            {'id': None, 'name': None, 'joined': datetime.date(2020, 1, 4)},
+            {'id': 3, 'name': 'Sarah', 'joined': None}])
+
+        query_types.assert_called_once_with("select * from tbl where name != 'x' order by id")
+        args, kwargs = unload.call_args
+        self.assertEqual(args[0], "select * from tbl where name != ''x'' order by id")
+        self.assertEqual(args[1], 'temp-bucket')
+        self.assertFalse(kwargs['parallel'])
+        self.assertEqual(kwargs['data_type'], 'csv')
+
+        # The files are removed from S3
+        self.assertEqual(s3.remaining, {})
+
+    def test_from_redshift(self):
+
+        env = {'REDSHIFT_USERNAME': 'test', 'REDSHIFT_PASSWORD': 'test',
+               'REDSHIFT_HOST': 'test', 'REDSHIFT_DB': 'test', 'REDSHIFT_PORT': '123',
+               'S3_TEMP_BUCKET': 'temp-bucket'}
+
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(Redshift, 'estimate_query_size', return_value=1000), \
+                mock.patch.object(Redshift, 'unload_query') as unload_query, \
+                mock.patch.object(Redshift, 'query') as query:
+
+            Table.from_redshift('select * from tbl')
+            query.assert_called_once_with('select * from tbl')
+            unload_query.assert_not_called()
+
+            Table.from_redshift('select * from tbl', unload_threshold=100)
+            unload_query.assert_called_once_with('select * from tbl')
+
+            # Statements other than a select are never unloaded
+            Table.from_redshift('delete from tbl', unload_threshold=100)
+            self.assertEqual(unload_query.call_count, 1)
+
+            # Nor are queries with a LIMIT, which UNLOAD rejects
+            Table.from_redshift('select * from tbl limit 10', unload_threshold=100)
+            self.assertEqual(unload_query.call_count, 1)
+            query.assert_called_with('select * from tbl limit 10')
+
+            # If the unload fails, the query is run instead
+            unload_query.side_effect = psycopg2.Error('Unload failed')
+            Table.from_redshift('select * from big', unload_threshold=100)
+            self.assertEqual(unload_query.call_count, 2)
+            query.assert_called_with('select * from big')
+
+
 @unittest.skipIf(not os.environ.get('LIVE_TEST'), 'Skipping because not running live test')
 class TestRedshiftDB(unittest.TestCase):
 
@@ -677,7 +1022,7 @@ class TestRedshiftDB(unittest.TestCase):
                             [6, 'Joanna']])
 
         # Base table 'Name' column has a width of 5. This should expand it to 6.
-        self.rs.alter_table_widths(append_tbl, f'{self.temp_schema}.test')
+        self.rs.alter_varchar_column_widths(append_tbl, f'{self.temp_schema}.test')
         self.assertEqual(self.rs.get_columns(self.temp_schema, 'test')['name']['max_length'], 6)
 
 if __name__ == "__main__":
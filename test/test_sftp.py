@@ -1,5 +1,8 @@
+import io
 import pytest
 import os
+import zipfile
+from unittest import mock
 from parsons import SFTP, Table
 from parsons.utilities import files
 from test.utils import mark_live_test, assert_matching_tables
@@ -102,3 +105,179 @@ def test_table_to_sftp_csv(live_sftp, simple_table, compression):
 # test_put_file_compressed
 # def test_remove_file
 # def test_remove_directory
+
+
+#
+# Mocked connection tests
+#
+
+class RemoteWriteFile(io.BytesIO):
+    # A fake remote file, which is saved when closed
+
+    def __init__(self, remote_files, path):
+        super().__init__()
+        self.remote_files = remote_files
+        self.path = path
+
+    def set_pipelined(self, pipelined=True):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.remote_files[self.path] = self.getvalue()
+        super().close()
+
+
+@pytest.fixture
+def mock_paramiko(monkeypatch):
+    # Replace paramiko's transport and client, recording the remote files
+    from parsons.sftp import sftp as sftp_module
+
+    remote_files = {'a.csv': b'a,b\r\n1,2\r\n', 'b.csv': b'c\r\n3\r\n'}
+    transports = []
+
+    def make_transport(address):
+        transport = mock.MagicMock()
+        transport.is_active.return_value = True
+        transports.append(transport)
+        return transport
+
+    def make_client(transport):
+        client = mock.MagicMock()
+
+        def open_file(path, mode, bufsize=-1):
+            if 'r' not in mode:
+                return RemoteWriteFile(remote_files, path)
+            if path not in remote_files:
+                raise FileNotFoundError(path)
+            f = io.BytesIO(remote_files[path])
+            f.prefetch = mock.MagicMock()
+            f.stat = lambda: mock.MagicMock(st_size=len(remote_files[path]))
+            return f
+
+        def put(local_path, remote_path):
+            with open(local_path, 'rb') as f:
+                remote_files[remote_path] = f.read()
+
+        client.open.side_effect = open_file
+        client.put.side_effect = put
+        client.listdir.side_effect = lambda path: sorted(remote_files)
+
+        def stat(path):
+            if path not in remote_files:
+                raise FileNotFoundError(path)
+            return mock.MagicMock(st_size=len(remote_files[path]))
+
+        client.stat.side_effect = stat
+        return client
+
+    monkeypatch.setattr(sftp_module.paramiko, 'Transport', make_transport)
+    monkeypatch.setattr(sftp_module.paramiko.SFTPClient, 'from_transport', make_client)
+
+    return remote_files, transports
+
+
+def test_connection_reused(mock_paramiko):
+    remote_files, transports = mock_paramiko
+    sftp = SFTP('host', 'user', 'pass')
+
+    for _ in range(3):
+        assert sftp.list_directory() == ['a.csv', 'b.csv']
+    local_path = sftp.get_file('a.csv')
+
+    assert len(transports) == 1
+    with open(local_path, 'rb') as f:
+        assert f.read() == remote_files['a.csv']
+
+    sftp.close()
+    transports[0].close.assert_called()
+
+
+def test_reconnect_after_connection_lost(mock_paramiko):
+    remote_files, transports = mock_paramiko
+    sftp = SFTP('host', 'user', 'pass')
+    sftp.list_directory()
+
+    # The first transport drops
+    transports[0].is_active.return_value = False
+    assert sftp.list_directory() == ['a.csv', 'b.csv']
+    assert len(transports) == 2
+
+
+def test_missing_file_not_retried(mock_paramiko):
+    remote_files, transports = mock_paramiko
+    sftp = SFTP('host', 'user', 'pass')
+
+    with pytest.raises(FileNotFoundError):
+        sftp.get_file('missing.csv')
+    assert len(transports) == 1
+
+
+def test_get_and_put_files(mock_paramiko, tmp_path):
+    remote_files, transports = mock_paramiko
+    sftp = SFTP('host', 'user', 'pass')
+
+    local_paths = sftp.get_files(['a.csv', 'b.csv'], workers=2)
+    for remote_path, local_path in zip(['a.csv', 'b.csv'], local_paths):
+        with open(local_path, 'rb') as f:
+            assert f.read() == remote_files[remote_path]
+
+    sftp.put_files(local_paths, ['c.csv', 'd.csv'])
+    assert remote_files['c.csv'] == remote_files['a.csv']
+    assert remote_files['d.csv'] == remote_files['b.csv']
+    assert len(transports) == 1
+
+    with pytest.raises(ValueError):
+        sftp.put_files(local_paths, ['c.csv'])
+
+
+@pytest.mark.parametrize('remote_path', ['out.csv', 'out.csv.gz', 'out.csv.bz2'])
+def test_to_and_from_sftp_csv(mock_paramiko, simple_table, remote_path):
+    remote_files, transports = mock_paramiko
+
+    simple_table.to_sftp_csv(remote_path, 'host', 'user', 'pass')
+    assert remote_path in remote_files
+
+    tbl = Table.from_sftp_csv(remote_path, 'host', 'user', 'pass')
+    assert_matching_tables(simple_table, tbl)
+
+
+def test_from_sftp_csv_streams(mock_paramiko, monkeypatch):
+    remote_files, transports = mock_paramiko
+    monkeypatch.setattr(files, 'create_temp_file_for_path',
+                        mock.MagicMock(side_effect=AssertionError('No local copy')))
+
+    tbl = Table.from_sftp_csv('a.csv', 'host', 'user', 'pass')
+    assert tbl.columns == ['a', 'b']
+    assert tbl.num_rows == 1
+
+    # Each pass streams the file with prefetching, on a connection closed after the pass
+    assert transports
+    for transport in transports:
+        transport.close.assert_called()
+
+
+def test_to_sftp_csv_zip(mock_paramiko, simple_table):
+    remote_files, transports = mock_paramiko
+
+    simple_table.to_sftp_csv('out.zip', 'host', 'user', 'pass')
+
+    with zipfile.ZipFile(io.BytesIO(remote_files['out.zip'])) as archive:
+        csv_name, = archive.namelist()
+        assert_matching_tables(simple_table,
+                               Table.from_csv_string(archive.read(csv_name).decode()))
+
+
+def test_to_sftp_csv_matches_to_csv(mock_paramiko, simple_table):
+    remote_files, transports = mock_paramiko
+
+    simple_table.to_sftp_csv('out.csv', 'host', 'user', 'pass', delimiter='|')
+    with open(simple_table.to_csv(delimiter='|'), 'rb') as f:
+        assert remote_files['out.csv'] == f.read()
+
+
+def test_file_exists(mock_paramiko):
+    sftp = SFTP('host', 'user', 'pass')
+
+    assert sftp.file_exists('a.csv')
+    assert not sftp.file_exists('missing.csv')
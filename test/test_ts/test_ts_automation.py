@@ -1,6 +1,8 @@
 from parsons.targetsmart.targetsmart_automation import TargetSmartAutomation
-from parsons import SFTP
+from parsons import SFTP, Table
+import os
 import unittest
+from unittest import mock
 from test.utils import mark_live_test
 
 class TestTargetSmartAutomation(unittest.TestCase):
@@ -70,4 +72,61 @@ class TestTargetSmartAutomation(unittest.TestCase):
 
         # Check that file is not there
         dir_list = self.sftp.list_directory(f'{self.ts.sftp_dir}/')
-        self.assertNotIn(f'{self.job_name}.txt', dir_list)
\ No newline at end of file
+        self.assertNotIn(f'{self.job_name}.txt', dir_list)
+
+class TestTargetSmartAutomationPolling(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ts = TargetSmartAutomation(sftp_username='user', sftp_password='pass')
+        self.ts.sftp = mock.MagicMock()
+        self.remote_files = set()
+        self.ts.sftp.file_exists.side_effect = (
+            lambda path: path.split('/')[-1] in self.remote_files)
+
+    @mock.patch('parsons.targetsmart.targetsmart_automation.time.sleep')
+    def test_poll_config_status_backs_off(self, sleep):
+
+        checks = iter([False, False, False, True])
+        self.ts.config_status = lambda job_name: next(checks)
+
+        self.assertTrue(self.ts.poll_config_status('job', polling_interval=4))
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [2, 3, 4, 4])
+
+    def test_config_status(self):
+
+        self.assertFalse(self.ts.config_status('job'))
+        self.ts.sftp.list_directory.assert_not_called()
+
+        self.remote_files.add('job.job.xml.good')
+        self.assertTrue(self.ts.config_status('job'))
+
+        self.remote_files = {'job.job.xml.bad'}
+        self.assertRaises(ValueError, self.ts.config_status, 'job')
+
+    @mock.patch('parsons.targetsmart.targetsmart_automation.time.sleep')
+    def test_match_status(self, sleep):
+
+        self.remote_files.add('job.finish.xml')
+        self.ts.sftp.get_file.return_value = 'test/test_ts/match_good.xml'
+        self.assertTrue(self.ts.match_status('job'))
+        sleep.assert_not_called()
+
+        self.ts.sftp.get_file.return_value = 'test/test_ts/match_bad.xml'
+        self.assertRaises(ValueError, self.ts.match_status, 'job')
+
+    def test_match_many(self):
+
+        tables = {f'job-{i}': Table([{'id': i}]) for i in range(5)}
+        self.ts.match = mock.MagicMock(
+            side_effect=lambda table, job_type, job_name=None, **kwargs: table)
+        self.ts.sftp._close_client = mock.MagicMock()
+
+        results = self.ts.match_many(tables, 'job_type', max_workers=3)
+        self.assertEqual(results, tables)
+        self.assertEqual(self.ts.match.call_count, 5)
+        # Each job closes the SFTP channel it opened on its thread
+        self.assertEqual(self.ts.sftp._close_client.call_count, 5)
+
+        results = self.ts.match_many(list(tables.values()), 'job_type')
+        self.assertEqual(results, list(tables.values()))
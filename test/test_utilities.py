@@ -1,4 +1,6 @@
 import unittest
+import bz2
+import gzip
 import os
 import pytest
 import shutil
@@ -8,6 +10,7 @@ from parsons.utilities import date_convert
 from parsons.utilities import files
 from parsons.utilities import check_env
 from parsons.utilities import json_format
+from parsons.utilities import compression
 
 
 """
@@ -49,12 +52,60 @@ def test_suffix_for_compression_type():
     assert files.suffix_for_compression_type(None) == ''
     assert files.suffix_for_compression_type('') == ''
     assert files.suffix_for_compression_type('gzip') == '.gz'
+    assert files.suffix_for_compression_type('bzip2') == '.bz2'
+    assert files.suffix_for_compression_type('zstd') == '.zst'
 
 
 def test_compression_type_for_path():
     assert files.compression_type_for_path('some/file') == None
     assert files.compression_type_for_path('some/file.csv') == None
     assert files.compression_type_for_path('some/file.csv.gz') == 'gzip'
+    assert files.compression_type_for_path('some/file.csv.bz2') == 'bzip2'
+    assert files.compression_type_for_path('some/file.csv.zst') == 'zstd'
+
+@pytest.mark.parametrize('compression_type,open_func', [('gzip', gzip.open), ('bzip2', bz2.open)])
+def test_parallel_compressed_file(compression_type, open_func):
+    path = files.create_temp_file()
+    data = b''.join(b'%d,some data\n' % i for i in range(10000))
+
+    # Use a small block size, so the file is written as many compressed blocks
+    with compression.ParallelCompressedFile(path, compression_type, workers=3,
+                                            block_size=1000) as f:
+        f.write(data[:5])
+        f.write(data[5:])
+
+    with open_func(path, 'rb') as f:
+        assert f.read() == data
+
+    # An empty file is still valid
+    with compression.ParallelCompressedFile(path, compression_type):
+        pass
+
+    with open_func(path, 'rb') as f:
+        assert f.read() == b''
+
+
+def test_parallel_compressed_file_invalid_type():
+    with pytest.raises(ValueError):
+        compression.ParallelCompressedFile(files.create_temp_file(), 'lzma')
+
+
+def test_parallel_compressed_file_failed_block():
+
+    path = files.create_temp_file(suffix='.gz')
+    file = compression.ParallelCompressedFile(path, 'gzip', workers=2, block_size=4)
+    file._compress = mock.Mock(side_effect=ValueError('bad block'))
+    raw = file._file
+
+    with pytest.raises(ValueError):
+        with file:
+            file.write(b'some data to compress')
+
+    # The workers and the file are still cleaned up
+    assert file.closed
+    assert raw.closed
+    assert file._executor._shutdown
+
 
 def test_empty_file():
 
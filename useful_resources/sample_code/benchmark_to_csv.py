@@ -0,0 +1,72 @@
+"""
+Compares the throughput of Table.to_csv, which uses the batch CSV writer for the
+default dialect, against writing the same table with petl.tocsv.
+
+    python useful_resources/sample_code/benchmark_to_csv.py --rows 1000000
+"""
+
+import argparse
+import datetime
+import os
+import time
+
+import petl
+from petl.io.sources import GzipSource
+
+from parsons import Table
+from parsons.utilities import files
+
+
+def build_table(num_rows):
+    # A mix of the column types typically staged for a COPY
+    start = datetime.datetime(2020, 1, 1)
+    rows = [(i,
+             f'First{i % 1000}',
+             'Smith, Jr.' if i % 20 == 0 else 'Smith',
+             i * 1.25,
+             None if i % 3 else 'DC',
+             (start + datetime.timedelta(days=i % 365)).date(),
+             i % 2 == 0)
+            for i in range(num_rows)]
+    header = ('id', 'first_name', 'last_name', 'score', 'state', 'signup_date', 'active')
+    return Table([header] + rows)
+
+
+def time_it(name, func, num_rows):
+    start = time.perf_counter()
+    path = func()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path) / 1024 / 1024
+    print(f'{name:<24} {elapsed:8.2f}s {num_rows / elapsed:12,.0f} rows/s {size:8.1f}MB')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    tbl = build_table(args.rows)
+
+    def petl_csv():
+        path = files.create_temp_file(suffix='.csv')
+        petl.tocsv(tbl.table, path)
+        return path
+
+    def petl_gzip():
+        path = files.create_temp_file(suffix='.csv.gz')
+        petl.tocsv(tbl.table, GzipSource(path))
+        return path
+
+    print(f'Writing {args.rows:,} rows')
+    plain = [time_it('petl.tocsv', petl_csv, args.rows),
+             time_it('Table.to_csv', tbl.to_csv, args.rows)]
+    time_it('petl.tocsv gzip', petl_gzip, args.rows)
+    time_it('Table.to_csv gzip', lambda: tbl.to_csv(temp_file_compression='gzip'), args.rows)
+
+    with open(plain[0], 'rb') as expected, open(plain[1], 'rb') as actual:
+        assert expected.read() == actual.read(), 'The outputs differ'
+
+
+if __name__ == '__main__':
+    main()